@@ -2,4 +2,9 @@
 FastAPI Application Package
 """
 
+from dotenv import load_dotenv
+
+# Load .env once, before any module reads its settings at import time
+load_dotenv()
+
 __version__ = "1.0.0"
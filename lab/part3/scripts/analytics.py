@@ -0,0 +1,144 @@
+"""
+Inventory Analytics Module
+Summaries built from the per price bucket aggregates that triggers keep in
+items_stats / items_stats_delta, plus the background task that folds the
+deltas so reads stay O(buckets) instead of O(items)
+"""
+
+import asyncio
+import os
+import time
+from datetime import datetime, timezone
+
+from app.queries import LOW_STOCK_THRESHOLD
+from app.repository import repository
+
+
+def summarize(rows):
+    """
+    Whole-inventory totals from per-bucket rows
+
+    Args:
+        rows: Rows of SELECT_INVENTORY_STATS
+
+    Returns:
+        dict: Item count, quantity, value, average price and low stock count
+    """
+    item_count = sum(row["item_count"] for row in rows)
+    price_sum = sum(row["price_sum"] for row in rows)
+    return {
+        "item_count": item_count,
+        "total_quantity": sum(row["total_quantity"] for row in rows),
+        "total_value": float(sum(row["total_value"] for row in rows)),
+        "average_price": round(float(price_sum) / item_count, 2) if item_count else None,
+        "low_stock_count": sum(row["low_stock_count"] for row in rows),
+        "low_stock_threshold": LOW_STOCK_THRESHOLD,
+        "pending_deltas": sum(row["pending"] for row in rows)
+    }
+
+
+def histogram(rows, edges):
+    """
+    Item count and value per price bucket, empty buckets included
+
+    Bucket 0 holds prices below edges[0], bucket i prices in
+    [edges[i-1], edges[i]) and the last bucket everything above.
+
+    Args:
+        rows: Rows of SELECT_INVENTORY_STATS
+        edges: Bucket edges from repository.price_bucket_edges()
+
+    Returns:
+        list: One dict per bucket, in price order
+    """
+    by_bucket = {row["bucket"]: row for row in rows}
+    buckets = []
+    for bucket in range(len(edges) + 1):
+        row = by_bucket.get(bucket)
+        buckets.append({
+            "bucket": bucket,
+            "min_price": edges[bucket - 1] if bucket > 0 else 0.0,
+            "max_price": edges[bucket] if bucket < len(edges) else None,
+            "item_count": row["item_count"] if row else 0,
+            "total_quantity": row["total_quantity"] if row else 0,
+            "total_value": float(row["total_value"]) if row else 0.0
+        })
+    return buckets
+
+
+class StatsFolder:
+    """
+    Periodically moves rows from items_stats_delta into items_stats
+
+    Triggers append one small delta row per bucket touched by each write
+    statement, so writers never contend on the aggregate rows. Reads sum
+    items_stats with the pending deltas, which this task keeps short.
+    Every worker runs one; an advisory lock in fold_items_stats() makes
+    concurrent folds a no-op.
+    """
+
+    def __init__(self, interval=5.0):
+        """
+        Args:
+            interval: Seconds between folds
+        """
+        self.interval = interval
+        self._task = None
+        self.folds = 0
+        self.rows_folded = 0
+        self.last_fold_at = None
+        self.last_fold_seconds = None
+        self.error = None
+
+    async def fold(self):
+        """Fold pending deltas once and record the outcome"""
+        start = time.perf_counter()
+        try:
+            self.rows_folded += await repository.fold_inventory_stats()
+            self.folds += 1
+            self.error = None
+        except Exception as e:
+            self.error = str(e) or type(e).__name__
+            print(f"Inventory stats fold error: {self.error}")
+        self.last_fold_seconds = time.perf_counter() - start
+        self.last_fold_at = datetime.now(timezone.utc)
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            await self.fold()
+
+    def start(self):
+        """Start folding in the background on the running event loop"""
+        if self._task is None and self.interval > 0:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        """Cancel the background task"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self):
+        """
+        Fold counters for this worker
+
+        Returns:
+            dict: Folds run, delta rows folded and the last fold
+        """
+        return {
+            "interval": self.interval,
+            "folds": self.folds,
+            "rows_folded": self.rows_folded,
+            "last_fold_at": self.last_fold_at.isoformat() if self.last_fold_at else None,
+            "last_fold_ms": round(self.last_fold_seconds * 1000, 3) if self.last_fold_seconds is not None else None,
+            "error": self.error
+        }
+
+
+# Started with the app; ANALYTICS_FOLD_INTERVAL=0 turns it off
+stats_folder = StatsFolder(interval=float(os.getenv('ANALYTICS_FOLD_INTERVAL', '5')))
@@ -0,0 +1,590 @@
+"""
+Async Database Access Module
+Runs blocking psycopg2 calls on a bounded thread pool so that async
+endpoints never block the event loop while a query is running
+
+Reads (fetch_*, stream_rows, copy_out) made while serving a GET request
+may go to a read replica (see replicas.py); run_in_db and db_session
+always use the primary.
+"""
+
+import asyncio
+import itertools
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+
+import psycopg2.extensions
+
+from app.database import get_db_connection, close_db_connection, get_pool, statements
+from app.metrics import metrics
+from app.replicas import RETRY_ON_PRIMARY, reading, replica_router
+
+_executor = None
+_executor_pid = None
+_executor_threads = 0
+_executor_lock = threading.Lock()
+
+# In-flight accounting (only touched from the event loop thread)
+_in_flight = 0
+_in_flight_max = 0
+
+# Unique names for server-side cursors
+_stream_ids = itertools.count(1)
+
+
+def get_executor():
+    """
+    Return this process's database thread pool, creating it on first use
+
+    The pool has one thread per pooled connection, primary and replica
+    pools together (DB_THREADS overrides this), so a thread never blocks
+    waiting for a connection while every server has one free. Requests
+    beyond that queue inside the executor while the event loop keeps
+    serving other work.
+
+    Returns:
+        ThreadPoolExecutor: Executor used for all database calls
+    """
+    global _executor, _executor_pid, _executor_threads
+    pid = os.getpid()
+    if _executor is not None and _executor_pid == pid:
+        return _executor
+    with _executor_lock:
+        if _executor is None or _executor_pid != pid:
+            workers = int(os.getenv('DB_THREADS', '0')) or get_pool().max_size * (1 + len(replica_router.replicas))
+            _executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="db")
+            _executor_pid = pid
+            _executor_threads = workers
+    return _executor
+
+
+def shutdown_executor():
+    """Wait for queued database calls to finish and stop the threads"""
+    global _executor
+    if _executor is not None and _executor_pid == os.getpid():
+        _executor.shutdown(wait=True)
+        _executor = None
+
+
+def executor_stats():
+    """
+    Return in-flight call counts for this process
+
+    Returns:
+        dict: Current and peak number of awaited database calls
+    """
+    return {
+        "threads": _executor_threads,
+        "in_flight": _in_flight,
+        "in_flight_max": _in_flight_max
+    }
+
+
+def _call_with_connection(pool, func, args):
+    """Borrow a connection, run func(connection, *args) and give it back"""
+    if not replica_router.enabled:
+        connection = get_db_connection(pool)
+        try:
+            return _timed(func, connection, *args)
+        finally:
+            close_db_connection(connection)
+
+    # With replicas, record latency and errors per server
+    start = time.perf_counter()
+    error = None
+    try:
+        connection = get_db_connection(pool)
+        try:
+            return _timed(func, connection, *args)
+        finally:
+            close_db_connection(connection)
+    except Exception as e:
+        error = e
+        raise
+    finally:
+        replica_router.record(pool.name if pool else "primary", time.perf_counter() - start, error)
+
+
+def _timed(func, *args):
+    """Run func(*args) and record its duration as database time"""
+    start = time.perf_counter()
+    try:
+        return func(*args)
+    finally:
+        metrics.observe(
+            "db_query_duration_seconds",
+            (("operation", func.__name__.strip("_")),),
+            time.perf_counter() - start
+        )
+
+
+async def run_in_db(func, *args):
+    """
+    Run func(connection, *args) on a database thread
+
+    The connection is borrowed from the pool inside the worker thread and
+    returned afterwards, with any open transaction rolled back. Functions
+    that write must commit themselves.
+
+    Args:
+        func: Callable taking a connection as its first argument
+        *args: Extra positional arguments for func
+
+    Returns:
+        Whatever func returns
+    """
+    return await _run_on(None, func, args)
+
+
+async def _run_on(pool, func, args):
+    """run_in_db on a given pool (None: the primary's)"""
+    global _in_flight, _in_flight_max
+    loop = asyncio.get_running_loop()
+    _in_flight += 1
+    if _in_flight > _in_flight_max:
+        _in_flight_max = _in_flight
+    try:
+        return await loop.run_in_executor(get_executor(), _call_with_connection, pool, func, args)
+    finally:
+        _in_flight -= 1
+
+
+def _choose_replica():
+    """
+    Replica for a read made by the current request, or None for the primary
+
+    Returns:
+        tuple: (ReadRoute or None, Replica or None)
+    """
+    route = reading.get()
+    if not replica_router.enabled or route is None:
+        return route, None
+    return route, replica_router.choose(route)
+
+
+async def run_read(func, *args):
+    """
+    Run a read-only func(connection, *args), on a replica when allowed
+
+    While a GET request is being served (replicas.reading), the call goes
+    to the server that request's first read picked: a replica within
+    REPLICA_MAX_LAG, else the primary. A call that fails on a replica for
+    lack of a usable connection is retried once on the primary, where the
+    rest of the request then reads too.
+
+    Args:
+        func: Callable taking a connection as its first argument; must
+            not write
+        *args: Extra positional arguments for func
+
+    Returns:
+        Whatever func returns
+    """
+    route, replica = _choose_replica()
+    if replica is not None:
+        try:
+            return await _run_on(replica.pool(), func, args)
+        except RETRY_ON_PRIMARY as e:
+            replica_router.failed(route, replica, e)
+    return await _run_on(None, func, args)
+
+
+def _fetch_all(connection, query, params):
+    cursor = connection.cursor()
+    try:
+        statements.execute(cursor, query, params)
+        return cursor.fetchall()
+    finally:
+        cursor.close()
+
+
+def _fetch_rows(connection, query, params):
+    cursor = connection.cursor(cursor_factory=psycopg2.extensions.cursor)
+    try:
+        statements.execute(cursor, query, params)
+        return cursor.fetchall()
+    finally:
+        cursor.close()
+
+
+def _fetch_one(connection, query, params):
+    cursor = connection.cursor()
+    try:
+        statements.execute(cursor, query, params)
+        return cursor.fetchone()
+    finally:
+        cursor.close()
+
+
+async def fetch_all(query, params=None):
+    """
+    Execute a query and return all rows without blocking the event loop
+
+    Args:
+        query: SQL text with %s placeholders
+        params: Query parameters
+
+    Returns:
+        list: Rows as dictionaries
+    """
+    return await run_read(_fetch_all, query, params)
+
+
+async def fetch_rows(query, params=None):
+    """
+    Execute a query and return all rows as plain tuples
+
+    Tuples skip the per-row dictionary that RealDictCursor builds, for
+    callers that encode rows themselves (see serialization.RowEncoder).
+
+    Args:
+        query: SQL text with %s placeholders
+        params: Query parameters
+
+    Returns:
+        list: Rows as tuples in SELECT column order
+    """
+    return await run_read(_fetch_rows, query, params)
+
+
+async def fetch_one(query, params=None):
+    """
+    Execute a query and return the first row without blocking the event loop
+
+    Args:
+        query: SQL text with %s placeholders
+        params: Query parameters
+
+    Returns:
+        dict: First row, or None if the query returned nothing
+    """
+    return await run_read(_fetch_one, query, params)
+
+
+def _ping_primary(timeout):
+    connection = get_db_connection(timeout=timeout)
+    try:
+        cursor = connection.cursor()
+        try:
+            # Rolled back with the transaction when the connection goes back
+            cursor.execute("SET LOCAL statement_timeout = %s", (max(1, int(timeout * 1000)),))
+            cursor.execute("SELECT 1")
+            cursor.fetchone()
+        finally:
+            cursor.close()
+    finally:
+        close_db_connection(connection)
+
+
+async def ping_primary(timeout):
+    """
+    Run SELECT 1 on the primary, bounded on the server side too
+
+    Waiting for a pool connection, opening one and the query itself each
+    give up after timeout seconds, so a hung server does not hold the
+    thread and connection much longer than the caller waits.
+
+    Args:
+        timeout: Seconds the check may take
+    """
+    loop = asyncio.get_running_loop()
+    await loop.run_in_executor(get_executor(), _ping_primary, timeout)
+
+
+def _prepare_connection(connection):
+    try:
+        statements.prepare_all(connection)
+    finally:
+        close_db_connection(connection)
+
+
+async def warm_up_connections(count):
+    """
+    Open pooled connections and prepare every registered statement on them
+
+    The connections are borrowed in parallel, so they are opened at the
+    same time and each one starts a database thread on the way. They go
+    back to the pool idle and ready for the first requests.
+
+    Args:
+        count: Number of connections to warm up
+
+    Returns:
+        int: Connections warmed up
+    """
+    loop = asyncio.get_running_loop()
+    executor = get_executor()
+    connections = await asyncio.gather(
+        *(loop.run_in_executor(executor, get_db_connection) for _ in range(count)),
+        return_exceptions=True
+    )
+    ready = [connection for connection in connections if not isinstance(connection, BaseException)]
+    results = await asyncio.gather(
+        *(loop.run_in_executor(executor, _prepare_connection, connection) for connection in ready),
+        return_exceptions=True
+    )
+    for result in list(connections) + list(results):
+        if isinstance(result, BaseException):
+            raise result
+    return len(ready)
+
+
+def _open_stream(query, params, name, pool):
+    """Borrow a connection and open a server-side cursor on it"""
+    connection = get_db_connection(pool)
+    try:
+        cursor = connection.cursor(name=name, cursor_factory=psycopg2.extensions.cursor)
+        cursor.execute(query, params)
+        return connection, cursor
+    except Exception:
+        close_db_connection(connection)
+        raise
+
+
+def _close_stream(connection, cursor):
+    """Close a server-side cursor and return its connection"""
+    try:
+        cursor.close()
+    except Exception:
+        pass
+    close_db_connection(connection)
+
+
+async def stream_rows(query, params=None, batch_size=1000):
+    """
+    Yield query results in batches from a server-side (named) cursor
+
+    Only one batch is held in memory at a time, so memory use does not grow
+    with the result set. The connection stays checked out until the
+    generator finishes or is closed.
+
+    Args:
+        query: SQL text with %s placeholders
+        params: Query parameters
+        batch_size: Rows fetched per round trip
+
+    Yields:
+        list: Up to batch_size rows as tuples in SELECT column order
+    """
+    loop = asyncio.get_running_loop()
+    executor = get_executor()
+    name = f"stream_{os.getpid()}_{next(_stream_ids)}"
+    route, replica = _choose_replica()
+    opened = None
+    if replica is not None:
+        try:
+            opened = await loop.run_in_executor(executor, _timed, _open_stream, query, params, name, replica.pool())
+        except RETRY_ON_PRIMARY as e:
+            replica_router.failed(route, replica, e)
+    if opened is None:
+        opened = await loop.run_in_executor(executor, _timed, _open_stream, query, params, name, None)
+    connection, cursor = opened
+    try:
+        while True:
+            rows = await loop.run_in_executor(executor, _timed, cursor.fetchmany, batch_size)
+            if not rows:
+                break
+            yield rows
+    finally:
+        # Not awaited: a cancelled request must still release the connection
+        executor.submit(_close_stream, connection, cursor)
+
+
+class _CopySink:
+    """
+    File-like target for COPY TO STDOUT that hands chunks to the event loop
+
+    psycopg2 calls write() once per COPY row with the raw bytes from the
+    server; they are appended to a buffer and passed on in chunk_size
+    pieces through a bounded asyncio queue. A full queue blocks the
+    database thread, so a slow client slows the COPY down instead of
+    growing memory.
+
+    The connection is only cancelled while it is still attached (active),
+    under the same lock the database thread detaches it with, so a cancel
+    never reaches a connection already back in the pool.
+    """
+
+    def __init__(self, loop, chunks, chunk_size):
+        self.loop = loop
+        self.chunks = chunks
+        self.chunk_size = chunk_size
+        self.buffer = bytearray()
+        self.connection = None
+        self.active = False
+        self.cancelled = False
+        self._lock = threading.Lock()
+
+    def attach(self, connection):
+        with self._lock:
+            self.connection = connection
+            self.active = True
+
+    def detach(self):
+        with self._lock:
+            self.active = False
+            self.connection = None
+
+    def cancel_query(self):
+        """Cancel the running COPY on the server, if it still holds the connection"""
+        with self._lock:
+            if self.active:
+                self.connection.cancel()
+
+    def put(self, item):
+        # Blocks this (database) thread while the queue is full, until the
+        # consumer goes away
+        future = asyncio.run_coroutine_threadsafe(self.chunks.put(item), self.loop)
+        while True:
+            try:
+                return future.result(timeout=0.1)
+            except FutureTimeoutError:
+                if self.cancelled:
+                    future.cancel()
+                    return
+
+    def write(self, data):
+        if self.cancelled:
+            return
+        self.buffer += data
+        if len(self.buffer) >= self.chunk_size:
+            self.flush()
+
+    def flush(self):
+        if self.buffer and not self.cancelled:
+            chunk = bytes(self.buffer)
+            self.buffer.clear()
+            self.put(chunk)
+
+
+def _run_copy_out(sql, params, options, sink, pool):
+    """Borrow a connection and COPY the query's rows into sink"""
+    connection = None
+    try:
+        connection = get_db_connection(pool)
+        sink.attach(connection)
+        if not sink.cancelled:
+            cursor = connection.cursor()
+            try:
+                # Timestamps come out in UTC, whatever the server default is
+                cursor.execute("SET LOCAL TimeZone = 'UTC'")
+                query = cursor.mogrify(sql, params).decode()
+                _timed(_copy_out, cursor, f"COPY ({query}) TO STDOUT WITH ({options})", sink)
+            finally:
+                cursor.close()
+        sink.flush()
+        if not sink.cancelled:
+            sink.put(None)
+    except Exception as e:
+        if not sink.cancelled:
+            sink.put(e)
+    finally:
+        sink.detach()
+        close_db_connection(connection)
+
+
+def _copy_out(cursor, sql, sink):
+    cursor.copy_expert(sql, sink)
+
+
+async def copy_out(sql, params, options, chunk_size=65536, max_chunks=8):
+    """
+    Stream a query's rows as COPY TO STDOUT output, in chunks of bytes
+
+    The rows go from the server's COPY stream into the response without
+    being parsed into tuples, dicts or models. At most max_chunks chunks
+    wait between the database thread and the consumer, so memory use
+    stays constant however large the result is. If the consumer stops
+    early, the running COPY is cancelled on the server and the
+    connection goes back to the pool.
+
+    Args:
+        sql: SELECT with %s placeholders
+        params: Query parameters
+        options: COPY options, e.g. "FORMAT csv, HEADER"
+        chunk_size: Bytes per yielded chunk (the last one may be smaller)
+        max_chunks: Chunks buffered ahead of the consumer
+
+    Yields:
+        bytes: COPY output
+    """
+    loop = asyncio.get_running_loop()
+    chunks = asyncio.Queue(maxsize=max_chunks)
+    sink = _CopySink(loop, chunks, chunk_size)
+    # On a replica when allowed; not retried, since output may be sent already
+    replica = _choose_replica()[1]
+    pool = replica.pool() if replica is not None else None
+    loop.run_in_executor(get_executor(), _run_copy_out, sql, params, options, sink, pool)
+    finished = False
+    try:
+        while True:
+            chunk = await chunks.get()
+            if chunk is None:
+                finished = True
+                break
+            if isinstance(chunk, Exception):
+                finished = True
+                raise chunk
+            yield chunk
+    finally:
+        if not finished:
+            sink.cancelled = True
+            # Not awaited: opens a short connection to the server
+            loop.run_in_executor(None, sink.cancel_query)
+            # Unblock a database thread waiting on the full queue (put()
+            # also gives up on its own once it sees cancelled)
+            while not chunks.empty():
+                chunks.get_nowait()
+
+
+class DbSession:
+    """
+    A pooled connection held across several awaited steps
+
+    Every step runs on a database thread, one at a time, so a multi-step
+    transaction (e.g. several COPY batches followed by one COMMIT) can be
+    driven from async code. Use through db_session().
+    """
+
+    def __init__(self, connection):
+        self.connection = connection
+
+    async def run(self, func, *args):
+        """
+        Run func(connection, *args) on a database thread
+
+        Returns:
+            Whatever func returns
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(get_executor(), _timed, func, self.connection, *args)
+
+    async def commit(self):
+        """Commit the session's transaction on a database thread"""
+        await self.run(_commit)
+
+
+def _commit(connection):
+    connection.commit()
+
+
+class db_session:
+    """
+    Async context manager that borrows a connection for a DbSession
+
+    The connection goes back to the pool on exit (uncommitted work is
+    rolled back), even when the request is cancelled.
+    """
+
+    async def __aenter__(self):
+        loop = asyncio.get_running_loop()
+        connection = await loop.run_in_executor(get_executor(), get_db_connection)
+        self.session = DbSession(connection)
+        return self.session
+
+    async def __aexit__(self, exc_type, exc, tb):
+        # Not awaited: a cancelled request must still release the connection
+        get_executor().submit(close_db_connection, self.session.connection)
+        return False
@@ -0,0 +1,234 @@
+"""
+API Key Authentication Module
+Multi-key store loaded once (reloadable on SIGHUP) and a per-key token
+bucket rate limiter shared by all uvicorn workers on the host
+"""
+
+import fcntl
+import hashlib
+import hmac
+import mmap
+import os
+import struct
+import tempfile
+import threading
+import time
+
+from dotenv import dotenv_values
+
+# Environment variables the key store reads
+KEY_SETTINGS = ("API_KEY", "API_KEYS", "API_KEYS_FILE")
+
+# Bucket layout in shared memory: tokens, last refill (CLOCK_MONOTONIC)
+_BUCKET = struct.Struct("dd")
+
+
+class ApiKey:
+    """One accepted API key and its rate limit"""
+
+    def __init__(self, name, secret, rate=None, burst=None):
+        """
+        Args:
+            name: Label used in logs and for the rate limit bucket
+            secret: The key clients send in X-API-Key
+            rate: Requests per second (None = default)
+            burst: Bucket size (None = default)
+        """
+        self.name = name
+        self.secret = secret.encode("utf-8")
+        self.rate = rate
+        self.burst = burst
+
+
+def _parse_key(entry, default_name):
+    """Parse 'key', 'name:key' or 'name:key:rate:burst'"""
+    parts = [part.strip() for part in entry.split(":")]
+    if len(parts) == 1:
+        return ApiKey(default_name, parts[0])
+    name, secret = parts[0], parts[1]
+    rate = float(parts[2]) if len(parts) > 2 and parts[2] else None
+    burst = float(parts[3]) if len(parts) > 3 and parts[3] else None
+    return ApiKey(name, secret, rate, burst)
+
+
+class KeyStore:
+    """
+    Accepted API keys, loaded once and swapped atomically on reload
+
+    Keys come from (all optional, combined):
+    - API_KEY: a single key, named "default"
+    - API_KEYS: comma-separated 'key' or 'name:key[:rate[:burst]]'
+    - API_KEYS_FILE: one 'key' or 'name:key[:rate[:burst]]' per line,
+      # comments
+
+    Unnamed keys are called key1, key2... (API_KEYS) and file1, file2...
+    (API_KEYS_FILE). Names must be unique, since a key's rate limit bucket
+    is shared by name.
+    """
+
+    def __init__(self):
+        self._keys = ()
+        self._lock = threading.Lock()
+        self.loaded_at = None
+
+    def load(self, settings=None):
+        """
+        (Re)load keys from the environment
+
+        Args:
+            settings: Mapping to read instead of os.environ
+        """
+        settings = os.environ if settings is None else settings
+        keys = []
+
+        if settings.get("API_KEY"):
+            keys.append(ApiKey("default", settings["API_KEY"]))
+
+        for number, entry in enumerate((settings.get("API_KEYS") or "").split(","), start=1):
+            if entry.strip():
+                keys.append(_parse_key(entry, f"key{number}"))
+
+        path = settings.get("API_KEYS_FILE")
+        if path:
+            with open(path) as key_file:
+                for number, line in enumerate(key_file, start=1):
+                    line = line.split("#", 1)[0].strip()
+                    if line:
+                        keys.append(_parse_key(line, f"file{number}"))
+
+        names = [key.name for key in keys]
+        duplicates = sorted({name for name in names if names.count(name) > 1})
+        if duplicates:
+            raise ValueError(f"Duplicate API key names: {', '.join(duplicates)}")
+
+        with self._lock:
+            self._keys = tuple(keys)
+            self.loaded_at = time.time()
+        return len(keys)
+
+    def reload(self):
+        """
+        Reload keys, letting values in .env override the process environment
+
+        Called from the SIGHUP handler; a broken key file keeps the old keys.
+        """
+        settings = dict(os.environ)
+        settings.update({
+            name: value for name, value in dotenv_values().items()
+            if name in KEY_SETTINGS and value is not None
+        })
+        try:
+            count = self.load(settings)
+            print(f"Reloaded {count} API keys")
+        except Exception as e:
+            print(f"API key reload failed, keeping old keys: {e}")
+
+    def verify(self, presented):
+        """
+        Find the key matching a presented secret
+
+        Every configured key is compared with hmac.compare_digest and the
+        loop never exits early, so timing does not reveal which key (or
+        how much of one) matched.
+
+        Args:
+            presented: Value of the X-API-Key header
+
+        Returns:
+            ApiKey: The matching key, or None
+        """
+        presented = presented.encode("utf-8")
+        match = None
+        for key in self._keys:
+            if hmac.compare_digest(presented, key.secret) and match is None:
+                match = key
+        return match
+
+    def __len__(self):
+        return len(self._keys)
+
+
+class SharedRateLimiter:
+    """
+    Token bucket per API key, shared across processes
+
+    Each key's bucket is 16 bytes in a file under /dev/shm (tmpfs), mapped
+    into every worker with mmap and updated under an flock, so all uvicorn
+    workers on the host draw from the same bucket.
+    """
+
+    def __init__(self, rate=100.0, burst=200.0, directory=None, namespace="item-api"):
+        """
+        Args:
+            rate: Default tokens added per second (0 disables limiting)
+            burst: Default bucket capacity
+            directory: Where bucket files live (default /dev/shm)
+            namespace: File name prefix, to keep separate apps apart
+        """
+        self.rate = rate
+        self.burst = burst
+        if directory is None:
+            directory = "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
+        self.directory = directory
+        self.namespace = namespace
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def _bucket(self, name):
+        """Open (once per process) the shared bucket for a key name"""
+        bucket = self._buckets.get(name)
+        if bucket is not None and bucket[2] == os.getpid():
+            return bucket
+        with self._lock:
+            digest = hashlib.sha256(name.encode("utf-8")).hexdigest()[:16]
+            path = os.path.join(self.directory, f"{self.namespace}-ratelimit-{digest}")
+            fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+            if os.fstat(fd).st_size < _BUCKET.size:
+                os.ftruncate(fd, _BUCKET.size)
+            bucket = (fd, mmap.mmap(fd, _BUCKET.size), os.getpid())
+            self._buckets[name] = bucket
+        return bucket
+
+    def acquire(self, key):
+        """
+        Take one token from a key's bucket
+
+        Args:
+            key: ApiKey making the request
+
+        Returns:
+            tuple: (allowed, seconds until a token is available)
+        """
+        rate = self.rate if key.rate is None else key.rate
+        burst = self.burst if key.burst is None else key.burst
+        if rate <= 0:
+            return True, 0.0
+
+        fd, shared, _ = self._bucket(key.name)
+        fcntl.flock(fd, fcntl.LOCK_EX)
+        try:
+            tokens, last = _BUCKET.unpack_from(shared)
+            now = time.monotonic()
+            if last == 0.0 or now < last:
+                # Fresh bucket (or host rebooted): start full
+                tokens, last = burst, now
+            tokens = min(burst, tokens + (now - last) * rate)
+            allowed = tokens >= 1.0
+            if allowed:
+                tokens -= 1.0
+            _BUCKET.pack_into(shared, 0, tokens, now)
+        finally:
+            fcntl.flock(fd, fcntl.LOCK_UN)
+
+        return allowed, 0.0 if allowed else (1.0 - tokens) / rate
+
+
+# Keys and limiter used by verify_api_key
+key_store = KeyStore()
+key_store.load()
+
+rate_limiter = SharedRateLimiter(
+    rate=float(os.getenv('RATE_LIMIT_PER_SECOND', '100')),
+    burst=float(os.getenv('RATE_LIMIT_BURST', '200')),
+    directory=os.getenv('RATE_LIMIT_DIR') or None
+)
@@ -0,0 +1,79 @@
+"""
+Async Database Benchmark
+Compares concurrent-request throughput of blocking psycopg2 calls made
+directly inside coroutines against the thread-offloaded async layer
+
+Usage (from the project directory, with .env configured):
+    python -m app.benchmark_async --requests 500 --query-ms 20
+"""
+
+import argparse
+import asyncio
+import time
+
+from app.database import get_db_connection, close_db_connection, get_pool
+from app.async_database import fetch_one, shutdown_executor
+
+QUERY = "SELECT pg_sleep(%s), 1 AS ok"
+
+
+async def blocking_request(seconds):
+    """Old handler style: psycopg2 called directly on the event loop"""
+    connection = get_db_connection()
+    try:
+        cursor = connection.cursor()
+        cursor.execute(QUERY, (seconds,))
+        cursor.fetchone()
+        cursor.close()
+    finally:
+        close_db_connection(connection)
+
+
+async def offloaded_request(seconds):
+    """New handler style: query awaited through the async layer"""
+    await fetch_one(QUERY, (seconds,))
+
+
+async def run(handler, requests, seconds):
+    """
+    Fire all requests at once and time until the last one finishes
+
+    Args:
+        handler: Coroutine function simulating one request
+        requests: Number of concurrent requests
+        seconds: Server-side query time per request
+
+    Returns:
+        float: Elapsed wall time in seconds
+    """
+    start = time.perf_counter()
+    await asyncio.gather(*(handler(seconds) for _ in range(requests)))
+    return time.perf_counter() - start
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--requests", type=int, default=200, help="concurrent requests per run")
+    parser.add_argument("--query-ms", type=float, default=10.0, help="simulated query time")
+    args = parser.parse_args()
+
+    seconds = args.query_ms / 1000.0
+    pool = get_pool()
+    pool.open()
+
+    # Warm up the connections and threads
+    await run(offloaded_request, pool.max_size, 0)
+
+    print(f"{args.requests} concurrent requests, {args.query_ms:.1f} ms per query, "
+          f"pool max_size={pool.max_size}")
+    print(f"{'mode':<12}{'seconds':>10}{'req/s':>12}")
+    for name, handler in (("blocking", blocking_request), ("offloaded", offloaded_request)):
+        elapsed = await run(handler, args.requests, seconds)
+        print(f"{name:<12}{elapsed:>10.3f}{args.requests / elapsed:>12.1f}")
+
+    shutdown_executor()
+    pool.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
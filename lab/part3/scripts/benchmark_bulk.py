@@ -0,0 +1,115 @@
+"""
+Bulk Ingest Benchmark
+Measures rows per second for row-at-a-time INSERT, multi-row INSERT and
+COPY FROM STDIN, plus the parse/validate stage of POST /items/bulk
+
+Rows go into a temporary table that shadows items for this session only,
+so the real table is left untouched.
+
+Usage (from the project directory, with .env configured):
+    python -m app.benchmark_bulk --rows 50000
+"""
+
+import argparse
+import asyncio
+import json
+import time
+
+from psycopg2.extras import execute_values
+
+from app.bulk import copy_items, iter_json_array, validate_row
+from app.database import get_db_connection, close_db_connection
+from app.models import ItemBase
+
+INSERT_SQL = "INSERT INTO items (name, description, price, quantity) VALUES (%s, %s, %s, %s)"
+
+
+def make_items(count):
+    return [
+        ItemBase(name=f"Bulk item {i}", description=f"Loaded by benchmark row {i}",
+                 price=10 + i % 1000, quantity=i % 500)
+        for i in range(count)
+    ]
+
+
+def insert_row_by_row(connection, items):
+    cursor = connection.cursor()
+    for item in items:
+        cursor.execute(INSERT_SQL, (item.name, item.description, item.price, item.quantity))
+    cursor.close()
+
+
+def insert_multi_row(connection, items):
+    cursor = connection.cursor()
+    execute_values(
+        cursor,
+        "INSERT INTO items (name, description, price, quantity) VALUES %s",
+        [(item.name, item.description, item.price, item.quantity) for item in items],
+        page_size=1000
+    )
+    cursor.close()
+
+
+def insert_copy(connection, items):
+    for start in range(0, len(items), 5000):
+        copy_items(connection, items[start:start + 5000])
+
+
+async def parse_and_validate(body):
+    """Run the upload through the same parser and validator as the endpoint"""
+    async def chunks():
+        for start in range(0, len(body), 65536):
+            yield body[start:start + 65536]
+
+    valid = 0
+    async for value, _ in iter_json_array(chunks()):
+        item, errors = validate_row(value)
+        if item is not None:
+            valid += 1
+    return valid
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=50000)
+    args = parser.parse_args()
+
+    items = make_items(args.rows)
+    connection = get_db_connection()
+    try:
+        cursor = connection.cursor()
+        cursor.execute("""
+            CREATE TEMP TABLE items
+            (LIKE public.items INCLUDING DEFAULTS INCLUDING CONSTRAINTS)
+            ON COMMIT DELETE ROWS
+        """)
+        cursor.close()
+        connection.commit()
+
+        print(f"{args.rows} rows")
+        print(f"{'method':<22}{'seconds':>10}{'rows/s':>14}")
+        for name, load in (("INSERT row by row", insert_row_by_row),
+                           ("multi-row INSERT", insert_multi_row),
+                           ("COPY FROM STDIN", insert_copy)):
+            start = time.perf_counter()
+            load(connection, items)
+            connection.commit()
+            elapsed = time.perf_counter() - start
+            print(f"{name:<22}{elapsed:>10.3f}{args.rows / elapsed:>14.0f}")
+
+        body = json.dumps([item.model_dump() for item in items]).encode("utf-8")
+        start = time.perf_counter()
+        asyncio.run(parse_and_validate(body))
+        elapsed = time.perf_counter() - start
+        print(f"{'parse + validate':<22}{elapsed:>10.3f}{args.rows / elapsed:>14.0f}")
+
+        cursor = connection.cursor()
+        cursor.execute("DROP TABLE pg_temp.items")
+        cursor.close()
+        connection.commit()
+    finally:
+        close_db_connection(connection)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""
+Coalescing Benchmark
+Bursts of concurrent lookups of the same few items, as after a popular
+item drops out of the cache, with and without single-flight coalescing
+
+Each round fires --concurrency lookups at once, spread over --keys item
+IDs, straight at the repository (the item cache is bypassed, so every
+lookup is a cache miss). Reported per setting: queries run, burst time
+and per-lookup p50/p99.
+
+Usage (from the project directory, with .env configured):
+    python -m app.benchmark_coalescing --concurrency 10 100 500 --keys 1 10
+"""
+
+import argparse
+import asyncio
+import json
+import statistics
+import time
+
+from app.repository import repository
+
+
+async def burst(concurrency, keys):
+    """
+    Fire concurrency lookups at once; return their latencies in ms
+
+    Returns:
+        tuple: (burst seconds, list of per-lookup milliseconds)
+    """
+    latencies = []
+
+    async def lookup(item_id):
+        start = time.perf_counter()
+        await repository.get_item(item_id)
+        latencies.append((time.perf_counter() - start) * 1000)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(lookup(keys[i % len(keys)]) for i in range(concurrency)))
+    return time.perf_counter() - start, latencies
+
+
+async def run(args):
+    await repository.open()
+    await repository.warm_up()
+    rows = await repository.list_items(limit=max(args.keys))
+    ids = [row[0] for row in rows]
+    results = {}
+    try:
+        for enabled in (False, True):
+            repository.item_lookups.enabled = enabled
+            for concurrency in args.concurrency:
+                for key_count in args.keys:
+                    before = repository.item_lookups.stats()["executions"]
+                    seconds, latencies = [], []
+                    for _ in range(args.rounds):
+                        elapsed, burst_latencies = await burst(concurrency, ids[:key_count])
+                        seconds.append(elapsed)
+                        latencies.extend(burst_latencies)
+                    queries = repository.item_lookups.stats()["executions"] - before
+                    results[f"{'on' if enabled else 'off'} c={concurrency} keys={key_count}"] = {
+                        "queries_per_burst": queries / args.rounds,
+                        "burst_ms": statistics.median(seconds) * 1000,
+                        "p50_ms": statistics.median(latencies),
+                        "p99_ms": statistics.quantiles(latencies, n=100)[98] if len(latencies) > 1 else latencies[0]
+                    }
+    finally:
+        await repository.close()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[10, 100, 500], help="lookups per burst")
+    parser.add_argument("--keys", type=int, nargs="+", default=[1, 10], help="distinct item IDs per burst")
+    parser.add_argument("--rounds", type=int, default=20, help="bursts per setting")
+    parser.add_argument("--output", help="save results as JSON here")
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args))
+
+    print(f"{'coalescing':<24}{'queries/burst':>15}{'burst ms':>10}{'p50 ms':>9}{'p99 ms':>9}")
+    for name, result in results.items():
+        print(f"{name:<24}{result['queries_per_burst']:>15.1f}{result['burst_ms']:>10.2f}"
+              f"{result['p50_ms']:>9.2f}{result['p99_ms']:>9.2f}")
+
+    if args.output:
+        with open(args.output, "w") as output_file:
+            json.dump(results, output_file, indent=2)
+        print(f"saved {args.output}")
+
+
+if __name__ == "__main__":
+    main()
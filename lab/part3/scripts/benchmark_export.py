@@ -0,0 +1,115 @@
+"""
+Export Benchmark
+Downloads the whole items table through GET /items (JSON list and NDJSON
+stream) and GET /items/export (CSV and NDJSON over COPY), reporting time,
+throughput and the server's peak memory for each
+
+Every variant gets a fresh single uvicorn worker, so the peak resident set
+size (VmHWM) read after the download belongs to that variant alone.
+Responses are read uncompressed, in 64 KiB pieces, and discarded.
+
+Usage (from the project directory, with .env configured):
+    python -m app.benchmark_export --runs 3
+"""
+
+import argparse
+import http.client
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+from app.benchmark_startup import first_ok
+from app.benchmark_workers import free_port, stop_server
+
+VARIANTS = {
+    "items": "/items",
+    "items-stream": "/items?stream=true",
+    "export-csv": "/items/export?format=csv",
+    "export-ndjson": "/items/export?format=ndjson"
+}
+
+
+def peak_rss_kib(pid):
+    """Peak resident set size of a process, from /proc (Linux)"""
+    with open(f"/proc/{pid}/status") as status:
+        for line in status:
+            if line.startswith("VmHWM:"):
+                return int(line.split()[1])
+    return None
+
+
+def run_once(path, headers):
+    """
+    Start a worker, download path once, stop the worker
+
+    Returns:
+        dict: seconds, bytes, baseline and peak RSS in KiB
+    """
+    port = free_port()
+    environment = dict(os.environ, RATE_LIMIT_PER_SECOND="0", COMPRESSION="0")
+    command = [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1",
+               "--port", str(port), "--no-access-log", "--log-level", "warning"]
+    process = subprocess.Popen(command, env=environment, stdout=subprocess.DEVNULL,
+                               stderr=subprocess.DEVNULL, start_new_session=True)
+    try:
+        first_ok(port, "/health/ready", headers)
+        baseline = peak_rss_kib(process.pid)
+        connection = http.client.HTTPConnection("127.0.0.1", port, timeout=300)
+        start = time.perf_counter()
+        connection.request("GET", path, headers=headers)
+        response = connection.getresponse()
+        size = 0
+        while True:
+            chunk = response.read(65536)
+            if not chunk:
+                break
+            size += len(chunk)
+        elapsed = time.perf_counter() - start
+        connection.close()
+        if response.status != 200:
+            raise RuntimeError(f"GET {path} answered {response.status}")
+        peak = peak_rss_kib(process.pid)
+    finally:
+        stop_server(process)
+    return {"seconds": elapsed, "bytes": size, "baseline_rss_kib": baseline, "peak_rss_kib": peak}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--runs", type=int, default=3, help="downloads per variant, each on a fresh worker")
+    parser.add_argument("--variants", nargs="+", choices=list(VARIANTS), default=list(VARIANTS))
+    parser.add_argument("--api-key", default=os.getenv("API_KEY"), help="X-API-Key (default: API_KEY)")
+    parser.add_argument("--output", help="save results as JSON here")
+    args = parser.parse_args()
+
+    headers = {"X-API-Key": args.api_key} if args.api_key else {}
+
+    results = {}
+    for variant in args.variants:
+        runs = [run_once(VARIANTS[variant], headers) for _ in range(args.runs)]
+        seconds = statistics.median(run["seconds"] for run in runs)
+        results[variant] = {
+            "seconds": seconds,
+            "megabytes": runs[0]["bytes"] / 1e6,
+            "mb_per_second": runs[0]["bytes"] / 1e6 / seconds,
+            "rss_growth_mib": statistics.median(run["peak_rss_kib"] - run["baseline_rss_kib"] for run in runs) / 1024,
+            "runs": runs
+        }
+
+    print(f"Medians of {args.runs} downloads per variant")
+    print(f"{'variant':<16}{'seconds':>10}{'MB':>10}{'MB/s':>10}{'peak RSS growth (MiB)':>24}")
+    for variant, result in results.items():
+        print(f"{variant:<16}{result['seconds']:>10.2f}{result['megabytes']:>10.1f}"
+              f"{result['mb_per_second']:>10.1f}{result['rss_growth_mib']:>24.1f}")
+
+    if args.output:
+        with open(args.output, "w") as output_file:
+            json.dump(results, output_file, indent=2)
+        print(f"saved {args.output}")
+
+
+if __name__ == "__main__":
+    main()
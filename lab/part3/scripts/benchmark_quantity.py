@@ -0,0 +1,131 @@
+"""
+Quantity Update Benchmark
+Throughput of quantity changes written one UPDATE at a time vs. through
+the write-behind buffer that sums them per item and flushes in batches
+
+--concurrency tasks apply --changes +1/-1 changes spread over --items
+items (seeded with a large quantity, tagged with a random name prefix and
+deleted at the end on PostgreSQL). Modes:
+
+- direct: every change is its own UPDATE (QUANTITY_FLUSH_INTERVAL=0)
+- batched-wait: changes are buffered; each task waits for the flush that
+  writes its change (PATCH ...?wait=true)
+- batched: changes are buffered and acknowledged at once (the default
+  PATCH); the time includes the final flush
+
+Usage (from the project directory, with .env configured):
+    python -m app.benchmark_quantity --changes 20000 --items 10 1000 --concurrency 64 512
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import secrets
+import statistics
+import time
+
+from app.async_database import run_in_db
+from app.benchmark_repositories import _delete_tagged
+from app.models import ItemBase
+from app.repository import repository
+from app.write_behind import quantity_writer
+
+MODES = ("direct", "batched-wait", "batched")
+
+
+async def seed(tag, count):
+    """Insert count items with room to move either way; return their IDs"""
+    async with repository.bulk_writer() as writer:
+        await writer.insert([ItemBase(name=f"{tag} {i}", price=1, quantity=1000000) for i in range(count)])
+        await writer.commit()
+    rows = await repository.list_items(filters={"name_prefix": tag})
+    return [row[0] for row in rows]
+
+
+async def run_mode(mode, ids, changes, concurrency):
+    """
+    Apply changes from concurrency tasks
+
+    Returns:
+        dict: changes/s, per-change p50/p99 ms and UPDATE statements sent
+    """
+    latencies = []
+    remaining = iter(range(changes))
+    flushes_before = quantity_writer.stats()["flushes"]
+
+    async def worker():
+        for i in remaining:
+            item_id = random.choice(ids)
+            delta = 1 if i % 2 else -1
+            start = time.perf_counter()
+            if mode == "direct":
+                await quantity_writer.apply(item_id, delta)
+            elif mode == "batched-wait":
+                await quantity_writer.add(item_id, delta, wait=True)
+            else:
+                quantity_writer.add(item_id, delta)
+                # Yield like a request handler would between requests
+                await asyncio.sleep(0)
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    await quantity_writer.flush()
+    elapsed = time.perf_counter() - start
+    flushes = quantity_writer.stats()["flushes"] - flushes_before
+    return {
+        "changes_per_second": changes / elapsed,
+        "p50_ms": statistics.median(latencies),
+        "p99_ms": statistics.quantiles(latencies, n=100)[98],
+        "statements": changes if mode == "direct" else flushes
+    }
+
+
+async def run(args, tag):
+    results = {}
+    await repository.open()
+    quantity_writer.interval = args.interval
+    quantity_writer.start()
+    try:
+        for item_count in args.items:
+            ids = await seed(f"{tag}-{item_count}", item_count)
+            for concurrency in args.concurrency:
+                for mode in args.modes:
+                    results[f"{mode} items={item_count} c={concurrency}"] = await run_mode(
+                        mode, ids, args.changes, concurrency
+                    )
+    finally:
+        await quantity_writer.stop()
+        if repository.name == "postgres":
+            await run_in_db(_delete_tagged, tag)
+        await repository.close()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--changes", type=int, default=20000, help="quantity changes per mode")
+    parser.add_argument("--items", type=int, nargs="+", default=[10, 1000], help="distinct items changed")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[64, 512],
+                        help="concurrent tasks (in-flight requests)")
+    parser.add_argument("--interval", type=float, default=0.05, help="flush interval in seconds")
+    parser.add_argument("--modes", nargs="+", choices=MODES, default=list(MODES))
+    parser.add_argument("--output", help="save results as JSON here")
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args, f"bench-{secrets.token_hex(4)}"))
+
+    print(f"{'mode':<32}{'changes/s':>12}{'p50 ms':>9}{'p99 ms':>9}{'UPDATEs':>10}")
+    for name, result in results.items():
+        print(f"{name:<32}{result['changes_per_second']:>12.0f}{result['p50_ms']:>9.2f}"
+              f"{result['p99_ms']:>9.2f}{result['statements']:>10}")
+
+    if args.output:
+        with open(args.output, "w") as output_file:
+            json.dump(results, output_file, indent=2)
+        print(f"saved {args.output}")
+
+
+if __name__ == "__main__":
+    main()
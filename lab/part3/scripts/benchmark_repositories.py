@@ -0,0 +1,162 @@
+"""
+Repository Benchmark
+Compares the PostgreSQL and SQLite item repositories on the operations the
+API uses most: single lookups, first pages, bulk loads and analytics
+
+Each backend is seeded with --rows items (tagged with a random name prefix
+on PostgreSQL and deleted afterwards), then every operation runs
+--operations times from --concurrency concurrent tasks. Reported per
+operation: throughput and p50/p99 latency.
+
+Usage (from the project directory, with .env configured):
+    python -m app.benchmark_repositories --rows 20000 --concurrency 1 16
+    python -m app.benchmark_repositories --backends sqlite
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import secrets
+import statistics
+import tempfile
+import time
+
+from app.async_database import run_in_db
+from app.models import ItemBase
+from app.repository import PostgresItemRepository, SQLiteItemRepository
+
+
+def _delete_tagged(connection, tag):
+    """Remove the rows a run inserted under its name prefix"""
+    cursor = connection.cursor()
+    cursor.execute("DELETE FROM items WHERE name LIKE %s", (tag + "%",))
+    cursor.close()
+    connection.commit()
+
+
+def make_items(tag, count, start=0):
+    return [
+        ItemBase(name=f"{tag} item {i}", description=f"benchmark row {i}",
+                 price=round(random.uniform(1, 20000), 2), quantity=random.randint(0, 500))
+        for i in range(start, start + count)
+    ]
+
+
+async def seed(repository, tag, rows, batch=5000):
+    """Bulk load rows items; return their IDs"""
+    for start in range(0, rows, batch):
+        async with repository.bulk_writer() as writer:
+            await writer.insert(make_items(tag, min(batch, rows - start), start))
+            await writer.commit()
+    await repository.fold_inventory_stats()
+    ids = []
+    async for batch_rows in repository.stream_items(filters={"name_prefix": tag}):
+        ids.extend(row[0] for row in batch_rows)
+    return ids
+
+
+def operations(repository, tag, ids, bulk_size):
+    """Benchmarked operations as name -> coroutine function"""
+    counter = iter(range(10 ** 9))
+    prefix = {"name_prefix": tag}
+
+    async def get_item():
+        await repository.get_item(random.choice(ids))
+
+    async def list_items():
+        await repository.list_items(after_id=random.choice(ids), limit=50, filters=prefix)
+
+    async def bulk_insert():
+        async with repository.bulk_writer() as writer:
+            await writer.insert(make_items(f"{tag} bulk", bulk_size, next(counter) * bulk_size))
+            await writer.commit()
+
+    async def inventory_stats():
+        await repository.inventory_stats()
+
+    return {
+        "get_item": get_item,
+        "list_items(limit=50)": list_items,
+        f"bulk_insert({bulk_size})": bulk_insert,
+        "inventory_stats": inventory_stats
+    }
+
+
+async def measure(operation, count, concurrency):
+    """
+    Run operation count times from concurrency tasks
+
+    Returns:
+        dict: ops/s, p50 and p99 milliseconds
+    """
+    latencies = []
+    remaining = iter(range(count))
+
+    async def worker():
+        for _ in remaining:
+            start = time.perf_counter()
+            await operation()
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    quantiles = statistics.quantiles(latencies, n=100)
+    return {"ops_per_second": count / elapsed, "p50_ms": statistics.median(latencies), "p99_ms": quantiles[98]}
+
+
+async def run_backend(name, repository, args, tag):
+    results = {}
+    await repository.open()
+    try:
+        await repository.warm_up()
+        ids = await seed(repository, tag, args.rows)
+        for op_name, operation in operations(repository, tag, ids, args.bulk_size).items():
+            count = args.bulk_operations if op_name.startswith("bulk") else args.operations
+            for concurrency in args.concurrency:
+                results[f"{op_name} c={concurrency}"] = await measure(operation, count, concurrency)
+    finally:
+        if name == "postgres":
+            await run_in_db(_delete_tagged, tag)
+        await repository.close()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--backends", nargs="+", choices=["postgres", "sqlite"], default=["postgres", "sqlite"])
+    parser.add_argument("--rows", type=int, default=20000, help="items seeded per backend")
+    parser.add_argument("--operations", type=int, default=2000, help="calls per read operation")
+    parser.add_argument("--bulk-operations", type=int, default=50, help="calls per bulk insert")
+    parser.add_argument("--bulk-size", type=int, default=500, help="items per bulk insert")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 16])
+    parser.add_argument("--output", help="save results as JSON here")
+    args = parser.parse_args()
+
+    tag = f"bench-{secrets.token_hex(4)}"
+    results = {}
+    with tempfile.TemporaryDirectory() as directory:
+        for backend in args.backends:
+            if backend == "postgres":
+                repository = PostgresItemRepository()
+            else:
+                repository = SQLiteItemRepository(os.path.join(directory, "items.db"))
+            results[backend] = asyncio.run(run_backend(backend, repository, args, tag))
+
+    print(f"{'operation':<32}" + "".join(f"{backend + ' ops/s':>16}{'p50 ms':>9}{'p99 ms':>9}" for backend in results))
+    for op_name in next(iter(results.values())):
+        print(f"{op_name:<32}" + "".join(
+            f"{result[op_name]['ops_per_second']:>16.0f}{result[op_name]['p50_ms']:>9.2f}{result[op_name]['p99_ms']:>9.2f}"
+            for result in results.values()
+        ))
+
+    if args.output:
+        with open(args.output, "w") as output_file:
+            json.dump({"rows": args.rows, "results": results}, output_file, indent=2)
+        print(f"saved {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""
+Serialization Benchmark
+Compares FastAPI's response_model path (validate every row into Item, then
+dump to JSON) against RowEncoder on tuple rows, at 10k and 100k rows
+
+No database is needed; rows are generated in memory.
+
+Usage (from the project directory):
+    python -m app.benchmark_serialization --rows 10000 100000
+"""
+
+import argparse
+import asyncio
+import json
+import time
+from datetime import datetime, timezone
+from decimal import Decimal
+from typing import List
+
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_response_field
+
+from app.models import Item
+from app.queries import ITEM_COLUMNS
+from app.serialization import RowEncoder
+
+COLUMNS = [name.strip() for name in ITEM_COLUMNS.split(",")]
+
+
+def make_rows(count):
+    """Generate tuple rows shaped like SELECT ITEM_COLUMNS FROM items"""
+    created = datetime(2025, 11, 1, 9, 30, 0, 123456)
+    updated = datetime(2025, 11, 2, 9, 30, 0, 654321, tzinfo=timezone.utc)
+    return [
+        (i, f"Item {i}", f"Description for item {i}", Decimal("1999.50"), i % 100, created, updated, 1)
+        for i in range(1, count + 1)
+    ]
+
+
+async def pydantic_path(field, rows):
+    """What FastAPI does with response_model=List[Item] and RealDictCursor rows"""
+    dict_rows = [dict(zip(COLUMNS, row)) for row in rows]
+    content = await serialize_response(field=field, response_content=dict_rows)
+    return JSONResponse(content).body
+
+
+def best_of(repeat, func, *args):
+    """Run func repeat times and return the fastest run in seconds"""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(*args)
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, nargs="+", default=[10000, 100000])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    field = create_response_field(name="Response", type_=List[Item])
+    encoder = RowEncoder(Item, ITEM_COLUMNS)
+    loop = asyncio.new_event_loop()
+
+    def run_pydantic(rows):
+        return loop.run_until_complete(pydantic_path(field, rows))
+
+    # Both paths must produce the same document
+    sample = make_rows(3)
+    assert json.loads(run_pydantic(sample)) == json.loads(encoder.encode_list(sample))
+
+    print(f"{'rows':>8}{'pydantic s':>14}{'encoder s':>12}{'speedup':>10}{'MB':>8}")
+    for count in args.rows:
+        rows = make_rows(count)
+        slow = best_of(args.repeat, run_pydantic, rows)
+        fast = best_of(args.repeat, encoder.encode_list, rows)
+        size = len(encoder.encode_list(rows)) / 1_000_000
+        print(f"{count:>8}{slow:>14.3f}{fast:>12.3f}{slow / fast:>9.1f}x{size:>8.1f}")
+
+    loop.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+"""
+Startup Benchmark
+Measures how long a fresh worker takes from process start to its first 200
+response, and how slow its first requests are, with and without warm-up
+
+Each run starts one uvicorn worker on a spare port, polls the first path
+until it answers 200, then sends every path once (the first-hit latency a
+user right after a deploy would see) and --requests more times (steady
+state). STARTUP_WARMUP=0 runs skip the lifespan warm-up phase.
+
+Usage (from the project directory, with .env configured):
+    python -m app.benchmark_startup --runs 5
+"""
+
+import argparse
+import http.client
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+from app.benchmark_workers import free_port, stop_server
+
+DEFAULT_PATHS = "/items/1,/items?limit=50,/analytics/summary,/health/ready"
+
+
+def first_ok(port, path, headers, timeout=60.0):
+    """
+    Poll path on a fresh connection until it answers 200
+
+    Returns:
+        float: perf_counter() when the 200 arrived
+    """
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        connection = http.client.HTTPConnection("127.0.0.1", port, timeout=5)
+        try:
+            connection.request("GET", path, headers=headers)
+            response = connection.getresponse()
+            response.read()
+            if response.status == 200:
+                return time.perf_counter()
+        except OSError:
+            pass
+        finally:
+            connection.close()
+        time.sleep(0.005)
+    raise RuntimeError(f"{path} did not answer 200 within {timeout:.0f}s")
+
+
+def timed_get(connection, path, headers):
+    """Send one GET on a keep-alive connection; return milliseconds"""
+    start = time.perf_counter()
+    connection.request("GET", path, headers=headers)
+    response = connection.getresponse()
+    response.read()
+    elapsed = (time.perf_counter() - start) * 1000
+    if response.status != 200:
+        raise RuntimeError(f"GET {path} answered {response.status}")
+    return elapsed
+
+
+def run_once(warmup, paths, headers, requests):
+    """
+    Start a worker, measure it, stop it
+
+    Returns:
+        dict: first_200_ms, first-hit and steady-state milliseconds per path
+    """
+    port = free_port()
+    environment = dict(os.environ, STARTUP_WARMUP="1" if warmup else "0", RATE_LIMIT_PER_SECOND="0")
+    command = [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1",
+               "--port", str(port), "--no-access-log", "--log-level", "warning"]
+    start = time.perf_counter()
+    process = subprocess.Popen(command, env=environment, stdout=subprocess.DEVNULL,
+                               stderr=subprocess.DEVNULL, start_new_session=True)
+    try:
+        ready = first_ok(port, paths[0], headers)
+        connection = http.client.HTTPConnection("127.0.0.1", port, timeout=10)
+        first = {path: timed_get(connection, path, headers) for path in paths}
+        steady = {path: statistics.median(timed_get(connection, path, headers) for _ in range(requests))
+                  for path in paths}
+        connection.close()
+    finally:
+        stop_server(process)
+    return {"first_200_ms": (ready - start) * 1000, "first_hit_ms": first, "steady_ms": steady}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--runs", type=int, default=5, help="worker starts per mode")
+    parser.add_argument("--paths", default=DEFAULT_PATHS, help="comma-separated; the first is polled")
+    parser.add_argument("--requests", type=int, default=20, help="steady-state requests per path")
+    parser.add_argument("--modes", nargs="+", choices=["warm", "cold"], default=["cold", "warm"])
+    parser.add_argument("--api-key", default=os.getenv("API_KEY"), help="X-API-Key (default: API_KEY)")
+    parser.add_argument("--output", help="save results as JSON here")
+    args = parser.parse_args()
+
+    paths = [path.strip() for path in args.paths.split(",") if path.strip()]
+    headers = {"X-API-Key": args.api_key} if args.api_key else {}
+
+    results = {}
+    for mode in args.modes:
+        runs = [run_once(mode == "warm", paths, headers, args.requests) for _ in range(args.runs)]
+        results[mode] = {
+            "first_200_ms": statistics.median(run["first_200_ms"] for run in runs),
+            "first_hit_ms": {path: statistics.median(run["first_hit_ms"][path] for run in runs) for path in paths},
+            "steady_ms": {path: statistics.median(run["steady_ms"][path] for run in runs) for path in paths},
+            "runs": runs
+        }
+
+    print(f"Medians of {args.runs} worker starts per mode")
+    print(f"{'mode':<6}{'start to first 200 (ms)':>26}")
+    for mode, result in results.items():
+        print(f"{mode:<6}{result['first_200_ms']:>26.1f}")
+    print()
+    print(f"{'path':<24}" + "".join(f"{mode + ' first':>12}{mode + ' steady':>13}" for mode in results))
+    for path in paths:
+        print(f"{path:<24}" + "".join(
+            f"{result['first_hit_ms'][path]:>12.2f}{result['steady_ms'][path]:>13.2f}" for result in results.values()
+        ))
+
+    if args.output:
+        with open(args.output, "w") as output_file:
+            json.dump({"paths": paths, "results": results}, output_file, indent=2)
+        print(f"saved {args.output}")
+
+
+if __name__ == "__main__":
+    main()
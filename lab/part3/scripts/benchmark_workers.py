@@ -0,0 +1,117 @@
+"""
+Worker Count Benchmark
+Starts the API with different numbers of workers and measures throughput
+and tail latency of each with the load generator
+
+Each run starts a fresh server on a spare port with rate limiting off,
+waits for /health/ready, applies the load, then stops the server. Pass
+--servers launcher uvicorn to compare against plain `uvicorn --workers`.
+
+Usage (from the project directory, with .env configured):
+    python -m app.benchmark_workers --workers 1 2 4 8 --duration 15
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import signal
+import socket
+import subprocess
+import sys
+import time
+import urllib.request
+
+
+from app.launcher import available_cpus
+from app.loadtest import DEFAULT_MIX, LoadTest, parse_mix
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(kind, workers, port):
+    """Start the API in a child process and wait until it is ready"""
+    if kind == "launcher":
+        command = [sys.executable, "-m", "app.launcher", "--host", "127.0.0.1",
+                   "--port", str(port), "--workers", str(workers)]
+    else:
+        command = [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1",
+                   "--port", str(port), "--workers", str(workers), "--no-access-log"]
+    environment = dict(os.environ, RATE_LIMIT_PER_SECOND="0")
+    process = subprocess.Popen(command, env=environment, stdout=subprocess.DEVNULL,
+                               stderr=subprocess.DEVNULL, start_new_session=True)
+
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        try:
+            with urllib.request.urlopen(f"http://127.0.0.1:{port}/health/ready", timeout=1) as response:
+                if response.status == 200:
+                    # Give the remaining workers a moment to finish startup
+                    time.sleep(1 + 0.2 * workers)
+                    return process
+        except OSError:
+            pass
+        if process.poll() is not None:
+            break
+        time.sleep(0.2)
+    stop_server(process)
+    raise RuntimeError(f"{kind} with {workers} workers did not become ready")
+
+
+def stop_server(process):
+    if process.poll() is None:
+        os.killpg(process.pid, signal.SIGTERM)
+        try:
+            process.wait(30)
+        except subprocess.TimeoutExpired:
+            os.killpg(process.pid, signal.SIGKILL)
+            process.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--servers", nargs="+", choices=["launcher", "uvicorn"], default=["launcher"])
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--duration", type=float, default=15.0)
+    parser.add_argument("--warmup", type=float, default=3.0)
+    parser.add_argument("--mix", default=DEFAULT_MIX)
+    parser.add_argument("--ids", default="1-1000")
+    parser.add_argument("--api-key", default=os.getenv("API_KEY"), help="X-API-Key (default: API_KEY)")
+    parser.add_argument("--output", help="save results as JSON here")
+    args = parser.parse_args()
+
+    low, _, high = args.ids.partition("-")
+    ids = (int(low), int(high or low))
+    print(f"{available_cpus()} usable CPUs, {args.concurrency} connections, {args.duration}s per run")
+    print(f"{'server':<10}{'workers':>8}{'rps':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'errors':>8}")
+
+    runs = []
+    for kind in args.servers:
+        for workers in args.workers:
+            port = free_port()
+            process = start_server(kind, workers, port)
+            try:
+                test = LoadTest(f"http://127.0.0.1:{port}", parse_mix(args.mix), args.concurrency,
+                                args.duration, args.warmup, 0, ids, args.api_key)
+                results = asyncio.run(test.run())
+            finally:
+                stop_server(process)
+            latency = results["latency_ms"]
+            print(f"{kind:<10}{workers:>8}{results['rps']:>10.1f}{latency['p50']:>10.2f}"
+                  f"{latency['p95']:>10.2f}{latency['p99']:>10.2f}{results['errors']:>8}")
+            runs.append({"server": kind, "workers": workers, **results})
+
+    if args.output:
+        with open(args.output, "w") as output_file:
+            json.dump({"cpus": available_cpus(), "concurrency": args.concurrency,
+                       "duration": args.duration, "mix": args.mix, "runs": runs}, output_file, indent=2)
+        print(f"saved {args.output}")
+
+
+if __name__ == "__main__":
+    main()
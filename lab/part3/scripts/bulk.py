@@ -0,0 +1,214 @@
+"""
+Bulk Ingest Module
+Incrementally parse JSON / NDJSON uploads, validate rows as they arrive
+and load them with COPY FROM STDIN
+"""
+
+import codecs
+import io
+import json
+
+from pydantic import ValidationError
+
+from app.models import ItemBase
+
+# Columns written by COPY, in ItemBase order
+COPY_ITEMS_SQL = "COPY items (name, description, price, quantity) FROM STDIN"
+
+# Refuse to buffer a single JSON value larger than this
+MAX_RECORD_BYTES = 1_000_000
+
+_COPY_ESCAPES = str.maketrans({"\\": "\\\\", "\t": "\\t", "\n": "\\n", "\r": "\\r"})
+
+
+class BulkFormatError(Exception):
+    """Raised when an upload cannot be parsed at all"""
+
+
+async def iter_ndjson(chunks):
+    """
+    Yield one parsed value per line of a newline-delimited JSON body
+
+    Args:
+        chunks: Async iterator of body bytes
+
+    Yields:
+        tuple: (value, None) or (None, error message) per non-blank line
+    """
+    buffer = b""
+    async for chunk in chunks:
+        buffer += chunk
+        lines = buffer.split(b"\n")
+        buffer = lines.pop()
+        if len(buffer) > MAX_RECORD_BYTES:
+            raise BulkFormatError(f"Line longer than {MAX_RECORD_BYTES} bytes")
+        for line in lines:
+            if line.strip():
+                yield _parse_line(line)
+    if buffer.strip():
+        yield _parse_line(buffer)
+
+
+def _parse_line(line):
+    try:
+        return json.loads(line), None
+    except ValueError as e:
+        return None, f"Invalid JSON: {e}"
+
+
+async def iter_json_array(chunks):
+    """
+    Yield the elements of a top-level JSON array without loading it whole
+
+    Elements are decoded one at a time with JSONDecoder.raw_decode as
+    soon as enough bytes have arrived.
+
+    Args:
+        chunks: Async iterator of body bytes
+
+    Yields:
+        tuple: (value, None) per array element
+
+    Raises:
+        BulkFormatError: If the body is not a well-formed JSON array
+    """
+    decoder = json.JSONDecoder()
+    utf8 = codecs.getincrementaldecoder("utf-8")()
+    text = ""
+    position = 0
+    state = "start"  # start -> value -> separator -> ... -> end
+    finished = False
+    chunks = chunks.__aiter__()
+
+    while True:
+        # Skip whitespace
+        while position < len(text) and text[position] in " \t\r\n":
+            position += 1
+
+        if position == len(text):
+            if finished:
+                break
+            try:
+                chunk = await chunks.__anext__()
+                text = text[position:] + utf8.decode(chunk)
+            except StopAsyncIteration:
+                text = text[position:] + utf8.decode(b"", final=True)
+                finished = True
+            position = 0
+            continue
+
+        char = text[position]
+        if state == "start":
+            if char != "[":
+                raise BulkFormatError("Expected a JSON array")
+            position += 1
+            state = "first"
+        elif state in ("first", "value"):
+            if state == "first" and char == "]":
+                position += 1
+                state = "end"
+                continue
+            try:
+                value, end = decoder.raw_decode(text, position)
+            except ValueError as e:
+                value, end = None, None
+                error = e
+            # A value touching the end of the buffer may continue in the next chunk
+            if (end is None or end == len(text)) and not finished:
+                if len(text) - position > MAX_RECORD_BYTES:
+                    raise BulkFormatError(f"Array element larger than {MAX_RECORD_BYTES} bytes")
+                try:
+                    chunk = await chunks.__anext__()
+                    text = text[position:] + utf8.decode(chunk)
+                except StopAsyncIteration:
+                    text = text[position:] + utf8.decode(b"", final=True)
+                    finished = True
+                position = 0
+                continue
+            if end is None:
+                raise BulkFormatError(f"Invalid JSON: {error}")
+            yield value, None
+            position = end
+            state = "separator"
+        elif state == "separator":
+            if char == ",":
+                state = "value"
+            elif char == "]":
+                state = "end"
+            else:
+                raise BulkFormatError(f"Expected ',' or ']' but found {char!r}")
+            position += 1
+        else:
+            raise BulkFormatError("Unexpected data after the closing ']'")
+
+    if state != "end":
+        raise BulkFormatError("Unexpected end of JSON array")
+
+
+def validate_row(value):
+    """
+    Validate one uploaded record against ItemBase
+
+    Args:
+        value: Parsed JSON value
+
+    Returns:
+        tuple: (ItemBase, None) or (None, list of error messages)
+    """
+    try:
+        item = ItemBase.model_validate(value)
+    except ValidationError as e:
+        return None, [
+            f"{'.'.join(str(part) for part in error['loc']) or 'row'}: {error['msg']}"
+            for error in e.errors()
+        ]
+    if "\x00" in item.name or (item.description and "\x00" in item.description):
+        return None, ["NUL characters are not allowed in text fields"]
+    return item, None
+
+
+def _copy_text(value):
+    """Format one value for COPY's text format"""
+    if value is None:
+        return "\\N"
+    if isinstance(value, str):
+        return value.translate(_COPY_ESCAPES)
+    return repr(value)
+
+
+def encode_copy_rows(items):
+    """
+    Encode validated items as COPY text-format data
+
+    Args:
+        items: Iterable of ItemBase
+
+    Returns:
+        bytes: Tab-separated lines for COPY_ITEMS_SQL
+    """
+    return "".join([
+        f"{_copy_text(item.name)}\t{_copy_text(item.description)}\t"
+        f"{_copy_text(item.price)}\t{_copy_text(item.quantity)}\n"
+        for item in items
+    ]).encode("utf-8")
+
+
+def copy_items(connection, items):
+    """
+    Load a batch of validated items with COPY FROM STDIN
+
+    Runs inside the caller's transaction; nothing is committed here.
+
+    Args:
+        connection: PostgreSQL connection
+        items: List of ItemBase
+
+    Returns:
+        int: Number of rows written
+    """
+    cursor = connection.cursor()
+    try:
+        cursor.copy_expert(COPY_ITEMS_SQL, io.BytesIO(encode_copy_rows(items)))
+        return len(items)
+    finally:
+        cursor.close()
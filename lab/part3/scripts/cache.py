@@ -0,0 +1,236 @@
+"""
+Item Cache Module
+Bounded in-process LRU + TTL cache for item rows, invalidated by
+PostgreSQL LISTEN/NOTIFY
+"""
+
+import os
+import select
+import threading
+import time
+from collections import OrderedDict
+
+import psycopg2
+import psycopg2.extensions
+
+# Channel the items trigger in setup_database.sql notifies on
+INVALIDATION_CHANNEL = "items_changed"
+
+
+class ItemCache:
+    """
+    Thread-safe LRU cache with a per-entry time to live
+
+    Entries are dropped by the invalidation listener as soon as the row
+    changes; the TTL only bounds staleness if a notification is lost.
+
+    With read replicas, a row loaded just after its invalidation may come
+    from a replica that has not replayed the change yet. settle is the
+    replicas' staleness bound: for that long after an invalidation the
+    item is not cached again.
+    """
+
+    def __init__(self, max_size=1024, ttl=60.0, settle=0.0):
+        """
+        Args:
+            max_size: Maximum number of cached items (0 disables the cache)
+            ttl: Seconds an entry stays valid
+            settle: Seconds after an invalidation during which set()
+                ignores the item (0: only the generation check applies)
+        """
+        self.max_size = max_size
+        self.ttl = ttl
+        self.settle = settle
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._generation = 0
+        # Recent invalidations (key -> monotonic time), oldest first
+        self._invalidated_at = OrderedDict()
+        self._cleared_at = None
+
+        # Statistics
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._expirations = 0
+        self._invalidations = 0
+
+    @property
+    def enabled(self):
+        return self.max_size > 0
+
+    def generation(self):
+        """
+        Return a token to pass to set() after loading a value
+
+        Any invalidation in between bumps the generation, so a row read
+        before a concurrent UPDATE is never cached.
+        """
+        return self._generation
+
+    def get(self, key):
+        """
+        Look up a cached value
+
+        Args:
+            key: Cache key (item ID)
+
+        Returns:
+            The cached value, or None on a miss
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._misses += 1
+                return None
+            value, expires_at = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                self._expirations += 1
+                self._misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self._hits += 1
+            return value
+
+    def set(self, key, value, generation=None):
+        """
+        Store a value, evicting the least recently used entry if full
+
+        Args:
+            key: Cache key (item ID)
+            value: Value to cache
+            generation: Token from generation() taken before the load
+        """
+        if not self.enabled:
+            return
+        with self._lock:
+            if generation is not None and generation != self._generation:
+                return
+            now = time.monotonic()
+            if self.settle > 0 and self._settling(key, now):
+                return
+            self._entries[key] = (value, now + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self._evictions += 1
+
+    def _settling(self, key, now):
+        """Whether key was invalidated less than settle seconds ago"""
+        if self._cleared_at is not None and now - self._cleared_at < self.settle:
+            return True
+        invalidated_at = self._invalidated_at.get(key)
+        return invalidated_at is not None and now - invalidated_at < self.settle
+
+    def invalidate(self, key):
+        """Drop one entry"""
+        with self._lock:
+            self._generation += 1
+            if self._entries.pop(key, None) is not None:
+                self._invalidations += 1
+            if self.settle > 0:
+                now = time.monotonic()
+                self._invalidated_at.pop(key, None)
+                self._invalidated_at[key] = now
+                while next(iter(self._invalidated_at.values())) < now - self.settle:
+                    self._invalidated_at.popitem(last=False)
+
+    def clear(self):
+        """Drop every entry"""
+        with self._lock:
+            self._generation += 1
+            self._invalidations += len(self._entries)
+            self._entries.clear()
+            self._cleared_at = time.monotonic()
+
+    def stats(self):
+        """
+        Snapshot of cache counters
+
+        Returns:
+            dict: Size, hits, misses, evictions and invalidations
+        """
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "max_size": self.max_size,
+                "ttl": self.ttl,
+                "size": len(self._entries),
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_ratio": round(self._hits / lookups, 4) if lookups else 0.0,
+                "evictions": self._evictions,
+                "expirations": self._expirations,
+                "invalidations": self._invalidations
+            }
+
+
+class InvalidationListener(threading.Thread):
+    """
+    Background thread that LISTENs for item changes and invalidates the cache
+
+    Uses its own connection outside the pool, since LISTEN ties up the
+    session for as long as the listener runs. Whenever the connection is
+    (re)established the whole cache is cleared, because notifications sent
+    while it was down are lost.
+    """
+
+    def __init__(self, cache, dsn, channel=INVALIDATION_CHANNEL, reconnect_delay=1.0):
+        super().__init__(name="item-cache-listener", daemon=True)
+        self.cache = cache
+        self.dsn = dsn
+        self.channel = channel
+        self.reconnect_delay = reconnect_delay
+        self._stopping = threading.Event()
+        self._connection = None
+
+    def _listen(self):
+        connection = psycopg2.connect(self.dsn)
+        connection.set_isolation_level(psycopg2.extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+        self._connection = connection
+        cursor = connection.cursor()
+        cursor.execute(f"LISTEN {self.channel}")
+        cursor.close()
+        self.cache.clear()
+
+        while not self._stopping.is_set():
+            if select.select([connection], [], [], 1.0) == ([], [], []):
+                continue
+            connection.poll()
+            while connection.notifies:
+                notify = connection.notifies.pop(0)
+                try:
+                    self.cache.invalidate(int(notify.payload))
+                except ValueError:
+                    self.cache.clear()
+
+    def run(self):
+        while not self._stopping.is_set():
+            try:
+                self._listen()
+            except Exception as e:
+                if not self._stopping.is_set():
+                    print(f"Cache listener error: {e}")
+                    self.cache.clear()
+                    self._stopping.wait(self.reconnect_delay)
+            finally:
+                if self._connection is not None:
+                    try:
+                        self._connection.close()
+                    except Exception:
+                        pass
+                    self._connection = None
+
+    def stop(self):
+        """Stop listening and wait for the thread to exit"""
+        self._stopping.set()
+        if self.is_alive():
+            self.join(timeout=5)
+
+
+# Shared cache for GET /items/{item_id}
+item_cache = ItemCache(
+    max_size=int(os.getenv('ITEM_CACHE_SIZE', '1024')),
+    ttl=float(os.getenv('ITEM_CACHE_TTL', '60'))
+)
@@ -0,0 +1,180 @@
+"""
+Read Replica Check
+Verifies read/write routing and the lag fallback against a real primary
+and its streaming replicas (DATABASE_URL, DATABASE_REPLICA_URLS)
+
+Reads made as a GET request would make them must land on a standby, all
+reads of one request on the same one, and everything else on the
+primary. Then replay is paused on every replica
+(pg_wal_replay_pause(), which needs a superuser or an explicit GRANT)
+while the primary writes: after REPLICA_MAX_LAG reads must fall back to
+the primary, and return to the replicas once replay resumes. Exits
+non-zero if any check fails. See README "Read replicas" for a local
+two-instance setup.
+
+Usage (from the project directory, with .env configured):
+    DATABASE_REPLICA_URLS="postgresql://postgres@localhost:5433/apidb" python -m app.check_replicas
+"""
+
+import argparse
+import asyncio
+import sys
+
+import psycopg2
+
+from app.async_database import fetch_one, run_in_db
+from app.replicas import ReadRoute, reading, replica_router
+
+IN_RECOVERY = "SELECT pg_is_in_recovery() AS in_recovery"
+
+
+def reads_by_target():
+    return {name: target["reads"] for name, target in replica_router.stats()["targets"].items()}
+
+
+class CheckFailed(Exception):
+    pass
+
+
+def expect(condition, message):
+    if not condition:
+        raise CheckFailed(message)
+
+
+async def read_as_get(reads=1):
+    """Run reads the way one GET request's handler would; return the rows"""
+    token = reading.set(ReadRoute())
+    try:
+        return [await fetch_one(IN_RECOVERY) for _ in range(reads)]
+    finally:
+        reading.reset(token)
+
+
+def _write(connection):
+    # Catalog changes are WAL-logged even for a temp table, so this moves
+    # the primary's WAL position without touching application data
+    cursor = connection.cursor()
+    cursor.execute("CREATE TEMP TABLE replica_check (id INT); DROP TABLE replica_check")
+    cursor.close()
+    connection.commit()
+
+
+def _replay(dsn, action):
+    connection = psycopg2.connect(dsn)
+    connection.autocommit = True
+    try:
+        cursor = connection.cursor()
+        cursor.execute(f"SELECT pg_wal_replay_{action}()")
+        cursor.close()
+    finally:
+        connection.close()
+
+
+async def set_replay(action):
+    loop = asyncio.get_running_loop()
+    await asyncio.gather(*(loop.run_in_executor(None, _replay, replica.dsn, action)
+                           for replica in replica_router.replicas))
+
+
+async def wait_for(condition, seconds):
+    """Poll condition() until it holds or seconds pass; return its last value"""
+    deadline = asyncio.get_running_loop().time() + seconds
+    while True:
+        value = condition()
+        if value or asyncio.get_running_loop().time() >= deadline:
+            return value
+        await asyncio.sleep(replica_router.interval / 2)
+
+
+def usable():
+    return [replica.name for replica in replica_router.replicas
+            if replica.lag_now() is not None and replica.lag_now() <= replica_router.max_lag]
+
+
+def checks(args):
+    """(description, coroutine function) pairs, in order"""
+
+    async def standbys():
+        await replica_router.check()
+        for replica in replica_router.replicas:
+            expect(replica.available, f"{replica.name}: {replica.error}")
+        expect(await wait_for(lambda: len(usable()) == len(replica_router.replicas), 5),
+               f"replicas within {replica_router.max_lag}s: {usable()}")
+
+    async def routing():
+        for _ in range(2 * len(replica_router.replicas)):
+            before = reads_by_target()
+            rows = await read_as_get(reads=3)
+            expect(all(row["in_recovery"] for row in rows), "a GET read went to the primary")
+            after = reads_by_target()
+            moved = {name: after[name] - before[name] for name in after if after[name] != before[name]}
+            expect(len(moved) == 1 and list(moved.values()) == [3], f"one request's reads were split: {moved}")
+        row = await fetch_one(IN_RECOVERY)
+        expect(not row["in_recovery"], "a read outside a GET request went to a replica")
+        await run_in_db(_write)
+
+    async def lag_fallback():
+        await set_replay("pause")
+        try:
+            # Keep writing so the replicas fall further behind
+            async def lagging():
+                while usable():
+                    await run_in_db(_write)
+                    await asyncio.sleep(replica_router.interval)
+            await asyncio.wait_for(lagging(), replica_router.max_lag + args.timeout)
+            row, = await read_as_get()
+            expect(not row["in_recovery"], "a GET read went to a lagging replica")
+            stats = replica_router.stats()
+            expect(stats["fallbacks"]["lagging"] > 0, f"fallbacks {stats['fallbacks']}")
+        finally:
+            await set_replay("resume")
+
+    async def recovery():
+        expect(await wait_for(lambda: len(usable()) == len(replica_router.replicas), args.timeout),
+               f"replicas did not catch up within {args.timeout}s")
+        row, = await read_as_get()
+        expect(row["in_recovery"], "GET reads did not return to the replicas")
+
+    return [
+        ("replicas answer as standbys within REPLICA_MAX_LAG", standbys),
+        ("GET reads go to replicas, one server per request, other calls to the primary", routing),
+        ("paused replay falls back to the primary", lag_fallback),
+        ("resumed replay returns reads to replicas", recovery)
+    ]
+
+
+async def run(args):
+    failures = 0
+    replica_router.start()
+    try:
+        for description, check in checks(args):
+            try:
+                await check()
+                print(f"PASS  {description}")
+            except Exception as e:
+                failures += 1
+                print(f"FAIL  {description}: {e}")
+    finally:
+        await replica_router.stop()
+    for name, target in replica_router.stats()["targets"].items():
+        print(f"{name:<10}{target['server'] or '':<36}reads {target['reads']:>4}  calls {target['calls']:>4}  "
+              f"errors {target['errors']:>2}  avg {target['avg_ms'] or 0:.2f} ms")
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--timeout", type=float, default=10.0, help="seconds to wait for lag to build up or clear")
+    args = parser.parse_args()
+
+    if not replica_router.enabled:
+        print("Set DATABASE_REPLICA_URLS to the replicas of DATABASE_URL")
+        sys.exit(2)
+
+    failures = asyncio.run(run(args))
+    print(f"{failures} failed" if failures else "All checks passed")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""
+Request Coalescing Module
+Single-flight execution: concurrent calls for the same key share one
+in-flight call instead of each running their own query
+"""
+
+import asyncio
+
+from app.metrics import metrics
+
+
+class _Flight:
+    """One in-flight call and the requests waiting on it"""
+
+    def __init__(self, task, generation):
+        self.task = task
+        self.generation = generation
+        self.waiters = 1
+
+
+class SingleFlight:
+    """
+    Runs at most one call per key at a time; later callers await its result
+
+    The call runs as its own task, so a caller that is cancelled (e.g.
+    the client went away) does not cancel it for the others. Results and
+    exceptions are shared with every caller that joined, so callers must
+    treat results as read-only. Only used from the event loop thread.
+    """
+
+    def __init__(self, name, enabled=True, generation=None):
+        """
+        Args:
+            name: Label for metrics and stats
+            enabled: False runs every call on its own
+            generation: Optional callable returning a token that changes
+                when results may have gone stale (ItemCache.generation);
+                a call started under an older token is not joined
+        """
+        self.name = name
+        self.enabled = enabled
+        self.generation = generation
+        self._flights = {}
+
+        # Statistics
+        self._calls = 0
+        self._executions = 0
+        self._coalesced = 0
+        self._max_waiters = 0
+
+    async def do(self, key, func, *args):
+        """
+        Return await func(*args), sharing a call already in flight for key
+
+        Args:
+            key: Hashable key identifying the result (e.g. an item ID)
+            func: Coroutine function to run
+            *args: Arguments for func
+
+        Returns:
+            Whatever func returns
+        """
+        self._calls += 1
+        if not self.enabled:
+            self._executions += 1
+            return await func(*args)
+
+        generation = self.generation() if self.generation else None
+        flight = self._flights.get(key)
+        if flight is not None and flight.generation == generation:
+            flight.waiters += 1
+            self._coalesced += 1
+            self._max_waiters = max(self._max_waiters, flight.waiters)
+            metrics.inc("db_coalesced_calls_total", (("call", self.name),))
+        else:
+            self._executions += 1
+            flight = _Flight(asyncio.ensure_future(func(*args)), generation)
+            self._flights[key] = flight
+            flight.task.add_done_callback(lambda task: self._finish(key, flight))
+        return await asyncio.shield(flight.task)
+
+    def _finish(self, key, flight):
+        # A newer flight may have replaced this one after an invalidation
+        if self._flights.get(key) is flight:
+            del self._flights[key]
+        # Mark the exception retrieved even if every caller was cancelled
+        if not flight.task.cancelled():
+            flight.task.exception()
+
+    def stats(self):
+        """
+        Coalescing counters for this process
+
+        Returns:
+            dict: Calls, calls actually run, calls saved and flights open
+        """
+        return {
+            "enabled": self.enabled,
+            "calls": self._calls,
+            "executions": self._executions,
+            "coalesced": self._coalesced,
+            "coalesced_ratio": round(self._coalesced / self._calls, 4) if self._calls else 0.0,
+            "max_waiters": self._max_waiters,
+            "in_flight": len(self._flights)
+        }
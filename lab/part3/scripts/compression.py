@@ -0,0 +1,264 @@
+"""
+Response Compression Module
+ASGI middleware that negotiates gzip or brotli and compresses response
+bodies chunk by chunk, so streamed lists are never buffered whole
+"""
+
+import asyncio
+import os
+import zlib
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Content types worth compressing (prefix match)
+COMPRESSIBLE_TYPES = (
+    "application/json", "application/x-ndjson", "application/problem+json",
+    "text/", "application/javascript", "application/xml"
+)
+
+# Chunks larger than this are compressed on a thread (zlib releases the GIL)
+# so a multi-megabyte list does not stall the event loop
+OFFLOAD_SIZE = 256 * 1024
+
+
+async def _run(function, data):
+    """Compress data inline, or on the default executor if it is large"""
+    if len(data) < OFFLOAD_SIZE:
+        return function(data)
+    return await asyncio.get_running_loop().run_in_executor(None, function, data)
+
+
+def parse_accept_encoding(header):
+    """
+    Parse Accept-Encoding into {coding: q}
+
+    Args:
+        header: Header value, e.g. "gzip;q=0.8, br"
+
+    Returns:
+        dict: Lower-case coding -> quality value
+    """
+    codings = {}
+    for part in header.split(","):
+        coding, _, params = part.strip().partition(";")
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        codings[coding] = quality
+    return codings
+
+
+def choose_encoding(header, brotli_enabled=True):
+    """
+    Pick the response coding the client accepts and we support
+
+    Brotli is preferred over gzip at equal quality; an explicit q=0 (or a
+    "*;q=0") rules a coding out.
+
+    Returns:
+        str: "br", "gzip" or None for no compression
+    """
+    if not header:
+        return None
+    codings = parse_accept_encoding(header)
+    wildcard = codings.get("*", 0.0)
+    best, best_quality = None, 0.0
+    for coding in (("br", "gzip") if brotli_enabled and brotli is not None else ("gzip",)):
+        quality = codings.get(coding, wildcard)
+        if quality > best_quality:
+            best, best_quality = coding, quality
+    return best
+
+
+class _GzipEncoder:
+    def __init__(self, level):
+        # wbits=31: gzip container with header and trailer
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+
+    def process(self, data):
+        # Sync flush so each chunk reaches the client as soon as it is ready
+        return self._compressor.compress(data) + self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self, data=b""):
+        return self._compressor.compress(data) + self._compressor.flush(zlib.Z_FINISH)
+
+
+class _BrotliEncoder:
+    def __init__(self, quality):
+        self._compressor = brotli.Compressor(quality=quality)
+
+    def process(self, data):
+        return self._compressor.process(data) + self._compressor.flush()
+
+    def finish(self, data=b""):
+        return self._compressor.process(data) + self._compressor.finish()
+
+
+class CompressionMiddleware:
+    """
+    Pure ASGI middleware compressing responses with gzip or brotli
+
+    The start message is held back until minimum_size bytes of body (or
+    the whole body) have arrived. Smaller responses go out unchanged.
+    Larger ones lose Content-Length, gain Content-Encoding and are
+    compressed one body chunk at a time, with a sync flush per chunk so
+    NDJSON streams stay incremental. Strong ETags become weak, since the
+    encoded bytes differ from the identity representation.
+    """
+
+    def __init__(self, app, minimum_size=1024, gzip_level=6, brotli_quality=4, brotli_enabled=True):
+        """
+        Args:
+            app: ASGI application to wrap
+            minimum_size: Bodies smaller than this many bytes are sent as is
+            gzip_level: zlib compression level (1 fastest .. 9 smallest)
+            brotli_quality: Brotli quality (0 fastest .. 11 smallest)
+            brotli_enabled: Offer brotli when the module is installed
+        """
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+        self.brotli_enabled = brotli_enabled
+
+    def _encoder(self, coding):
+        if coding == "br":
+            return _BrotliEncoder(self.brotli_quality)
+        return _GzipEncoder(self.gzip_level)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] == "HEAD":
+            await self.app(scope, receive, send)
+            return
+
+        accept = ""
+        for name, value in scope["headers"]:
+            if name == b"accept-encoding":
+                accept = value.decode("latin-1")
+                break
+        coding = choose_encoding(accept, self.brotli_enabled)
+
+        start = None
+        buffered = []
+        buffered_size = 0
+        encoder = None
+        passthrough = False
+
+        async def send_compressed(message):
+            nonlocal start, buffered_size, encoder, passthrough
+
+            if message["type"] == "http.response.start":
+                headers = message.get("headers", [])
+                content_type = b""
+                for name, value in headers:
+                    lower = name.lower()
+                    if lower == b"content-encoding":
+                        passthrough = True
+                    elif lower == b"content-type":
+                        content_type = value.lower()
+                if message["status"] < 200 or message["status"] in (204, 304) or \
+                        not content_type.decode("latin-1").startswith(COMPRESSIBLE_TYPES):
+                    passthrough = True
+                if passthrough:
+                    await send(message)
+                elif coding is None:
+                    # Identity, but caches must still key on Accept-Encoding
+                    passthrough = True
+                    await send(_with_vary(message))
+                else:
+                    start = message
+                return
+
+            if passthrough or message["type"] != "http.response.body":
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+
+            if encoder is not None:
+                if more_body:
+                    data = await _run(encoder.process, body) if body else b""
+                    if data:
+                        await send({"type": "http.response.body", "body": data, "more_body": True})
+                else:
+                    await send({"type": "http.response.body", "body": await _run(encoder.finish, body)})
+                return
+
+            # Still deciding: hold the body until it reaches the threshold
+            buffered.append(body)
+            buffered_size += len(body)
+            if buffered_size < self.minimum_size:
+                if more_body:
+                    return
+                await send(_with_vary(start))
+                await send({"type": "http.response.body", "body": b"".join(buffered)})
+                return
+
+            encoder = self._encoder(coding)
+            data = b"".join(buffered)
+            buffered.clear()
+            if more_body:
+                await send(_encoded_start(start, coding, None))
+                await send({"type": "http.response.body", "body": await _run(encoder.process, data), "more_body": True})
+            else:
+                compressed = await _run(encoder.finish, data)
+                await send(_encoded_start(start, coding, len(compressed)))
+                await send({"type": "http.response.body", "body": compressed})
+
+        await self.app(scope, receive, send_compressed)
+
+
+def _with_vary(start):
+    """Add Vary: Accept-Encoding to a held start message"""
+    headers = [(name, value) for name, value in start.get("headers", []) if name.lower() != b"vary"]
+    vary = [value for name, value in start.get("headers", []) if name.lower() == b"vary"]
+    if vary and b"accept-encoding" not in vary[0].lower():
+        headers.append((b"vary", vary[0] + b", Accept-Encoding"))
+    elif vary:
+        headers.append((b"vary", vary[0]))
+    else:
+        headers.append((b"vary", b"Accept-Encoding"))
+    return dict(start, headers=headers)
+
+
+def _encoded_start(start, coding, length):
+    """Start message for a compressed body"""
+    start = _with_vary(start)
+    headers = []
+    for name, value in start["headers"]:
+        lower = name.lower()
+        if lower == b"content-length":
+            continue
+        if lower == b"etag" and not value.startswith(b"W/"):
+            value = b"W/" + value
+        headers.append((name, value))
+    headers.append((b"content-encoding", coding.encode("latin-1")))
+    if length is not None:
+        headers.append((b"content-length", str(length).encode("latin-1")))
+    return dict(start, headers=headers)
+
+
+def compression_settings():
+    """
+    Middleware options from COMPRESSION_* environment variables
+
+    Returns:
+        dict: Keyword arguments for CompressionMiddleware
+    """
+    return {
+        "minimum_size": int(os.getenv('COMPRESSION_MIN_SIZE', '1024')),
+        "gzip_level": int(os.getenv('COMPRESSION_LEVEL', '6')),
+        "brotli_quality": int(os.getenv('COMPRESSION_BROTLI_QUALITY', '4')),
+        "brotli_enabled": os.getenv('COMPRESSION_BROTLI', '1') != '0'
+    }
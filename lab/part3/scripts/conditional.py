@@ -0,0 +1,158 @@
+"""
+Conditional Request Helpers
+Build ETag / Last-Modified validators, answer If-None-Match and
+If-Modified-Since with 304 Not Modified and read If-Match for updates
+"""
+
+import hashlib
+from datetime import timezone
+from email.utils import format_datetime, parsedate_to_datetime
+
+from fastapi import Response
+
+# Clients must revalidate, but may keep the body around to do so
+CACHE_CONTROL = "private, no-cache"
+
+
+def item_etag(item):
+    """
+    Strong ETag for a single item row
+
+    version is bumped by a trigger on every UPDATE, so (id, version)
+    identifies one exact version of the row.
+
+    Args:
+        item: Row dictionary with id and version
+
+    Returns:
+        str: Quoted entity tag
+    """
+    return f'"item-{item["id"]}-v{item["version"]}"'
+
+
+def if_match_versions(request, item_id):
+    """
+    Read the item versions an If-Match header accepts
+
+    Args:
+        request: Incoming request
+        item_id: Item the request writes to
+
+    Returns:
+        None if the client sent no If-Match, "*" if any version will do,
+        else a list of versions (empty if no tag names this item, which
+        can never match)
+    """
+    header = request.headers.get("if-match")
+    if header is None:
+        return None
+    if header.strip() == "*":
+        return "*"
+    versions = []
+    prefix = f'"item-{item_id}-v'
+    for candidate in header.split(","):
+        candidate = candidate.strip()
+        # Compression turns our strong ETags into weak ones on the way out;
+        # they still name exactly one version of the row
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate.startswith(prefix) and candidate.endswith('"'):
+            version = candidate[len(prefix):-1]
+            if version.isdigit():
+                versions.append(int(version))
+    return versions
+
+
+def collection_etag(version, *params):
+    """
+    Strong ETag for a list response
+
+    Args:
+        version: Table version from the items_version counters
+        *params: Query parameters that shape the response body
+
+    Returns:
+        str: Quoted entity tag
+    """
+    digest = hashlib.sha1(repr(params).encode("utf-8")).hexdigest()[:12]
+    return f'"items-{version}-{digest}"'
+
+
+def http_date(value):
+    """Format a datetime as an HTTP-date (always GMT)"""
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return format_datetime(value.astimezone(timezone.utc), usegmt=True)
+
+
+def _etag_matches(header, etag):
+    """Weak comparison of an If-None-Match header against an ETag"""
+    if header.strip() == "*":
+        return True
+    for candidate in header.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == etag:
+            return True
+    return False
+
+
+def is_not_modified(request, etag, last_modified=None):
+    """
+    Decide whether a GET can be answered with 304
+
+    If-None-Match takes precedence; If-Modified-Since is only consulted
+    when the client sent no entity tags (RFC 9110 section 13.2.2).
+
+    Args:
+        request: Incoming request
+        etag: Current entity tag
+        last_modified: Current modification time, if known
+
+    Returns:
+        bool: True if the client's copy is still current
+    """
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        return _etag_matches(if_none_match, etag)
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since and last_modified is not None:
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        if since.tzinfo is None:
+            since = since.replace(tzinfo=timezone.utc)
+        if last_modified.tzinfo is None:
+            last_modified = last_modified.replace(tzinfo=timezone.utc)
+        return last_modified.replace(microsecond=0) <= since
+    return False
+
+
+def set_validators(response, etag, last_modified=None):
+    """
+    Attach ETag, Last-Modified and Cache-Control headers to a response
+
+    Args:
+        response: Response to modify
+        etag: Entity tag
+        last_modified: Modification time, if known
+    """
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = CACHE_CONTROL
+    if last_modified is not None:
+        response.headers["Last-Modified"] = http_date(last_modified)
+
+
+def not_modified(etag, last_modified=None):
+    """
+    Build an empty 304 response carrying the current validators
+
+    Returns:
+        Response: 304 Not Modified
+    """
+    response = Response(status_code=304)
+    set_validators(response, etag, last_modified)
+    return response
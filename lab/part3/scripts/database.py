@@ -1,28 +1,752 @@
 """
 Database Connection Module
-This module handles PostgreSQL database connections
+This module handles PostgreSQL database connections through a per-worker
+connection pool
 """
 
 import psycopg2
+import psycopg2.errors
+import psycopg2.extensions
 from psycopg2.extras import RealDictCursor
+import math
 import os
-from dotenv import load_dotenv
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
 
-# Load environment variables
-load_dotenv()
+from app.metrics import metrics
 
-def get_db_connection():
+
+class PoolTimeoutError(Exception):
+    """Raised when no connection becomes available within the pool timeout"""
+
+
+class PooledConnection(psycopg2.extensions.connection):
+    """psycopg2 connection that remembers when it was opened and last used"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.created_at = time.monotonic()
+        self.last_used_at = self.created_at
+        # Names of server-side prepared statements on this session
+        self.prepared = set()
+        # ConnectionPool the connection goes back to
+        self.pool = None
+
+
+class ConnectionPool:
+    """
+    Thread-safe PostgreSQL connection pool
+
+    Connections are opened lazily up to max_size, handed out most recently
+    used first, validated on checkout and recycled once they reach
+    max_lifetime. Each uvicorn worker process owns its own pool, so the
+    total number of server connections is workers * max_size.
+    """
+
+    def __init__(self, dsn, min_size=1, max_size=10, max_lifetime=1800.0,
+                 timeout=5.0, validate_idle=30.0, name="primary", connect_timeout=5.0):
+        """
+        Args:
+            dsn: PostgreSQL connection string
+            min_size: Connections opened up front by open()
+            max_size: Upper bound on open connections
+            max_lifetime: Seconds after which a connection is recycled
+            timeout: Seconds to wait for a free connection before failing
+            validate_idle: Connections idle longer than this many seconds
+                are pinged with SELECT 1 before being handed out
+            name: Server this pool connects to, for stats ("primary",
+                "replica1", ...)
+            connect_timeout: Seconds to wait for a new server connection
+        """
+        if min_size < 0 or max_size < 1 or min_size > max_size:
+            raise ValueError("Pool sizes must satisfy 0 <= min_size <= max_size, max_size >= 1")
+
+        self.dsn = dsn
+        self.min_size = min_size
+        self.max_size = max_size
+        self.max_lifetime = max_lifetime
+        self.timeout = timeout
+        self.validate_idle = validate_idle
+        self.name = name
+        self.connect_timeout = connect_timeout
+
+        self._idle = deque()
+        self._size = 0
+        self._in_use = 0
+        self._closed = False
+        self._cond = threading.Condition()
+
+        # Statistics
+        self._checkouts = 0
+        self._waits = 0
+        self._timeouts = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+        self._opened = 0
+        self._discarded = 0
+        self._validation_failures = 0
+
+    def _connect(self, timeout=None):
+        """Open a new server connection, waiting at most timeout seconds"""
+        timeout = self.connect_timeout if timeout is None else min(timeout, self.connect_timeout)
+        connection = psycopg2.connect(
+            self.dsn,
+            connection_factory=PooledConnection,
+            cursor_factory=RealDictCursor,
+            # libpq takes whole seconds and treats anything below 2 as 2
+            connect_timeout=max(2, math.ceil(timeout))
+        )
+        connection.pool = self
+        return connection
+
+    def _expired(self, connection, now):
+        """Check whether a connection has outlived max_lifetime"""
+        return self.max_lifetime > 0 and now - connection.created_at >= self.max_lifetime
+
+    def _discard(self, connection):
+        """Close a connection and release its slot"""
+        try:
+            connection.close()
+        except Exception:
+            pass
+        with self._cond:
+            self._size -= 1
+            self._discarded += 1
+            self._cond.notify()
+
+    def _is_usable(self, connection, now):
+        """Validate a connection taken from the idle list"""
+        if connection.closed or self._expired(connection, now):
+            return False
+        if now - connection.last_used_at < self.validate_idle:
+            return True
+        try:
+            cursor = connection.cursor()
+            cursor.execute("SELECT 1")
+            cursor.close()
+            connection.rollback()
+            return True
+        except Exception:
+            with self._cond:
+                self._validation_failures += 1
+            return False
+
+    def open(self):
+        """Open min_size connections up front"""
+        while True:
+            with self._cond:
+                if self._closed or self._size >= self.min_size:
+                    return
+                self._size += 1
+            try:
+                connection = self._connect()
+            except Exception:
+                with self._cond:
+                    self._size -= 1
+                raise
+            with self._cond:
+                self._opened += 1
+                self._idle.append(connection)
+                self._cond.notify()
+
+    def getconn(self, timeout=None):
+        """
+        Borrow a connection from the pool
+
+        Args:
+            timeout: Seconds to wait for a free connection, and at most for
+                opening a new one (default: the pool's timeout)
+
+        Returns:
+            connection: PostgreSQL connection object
+
+        Raises:
+            PoolTimeoutError: If no connection frees up within timeout
+        """
+        timeout = self.timeout if timeout is None else timeout
+        start = time.monotonic()
+        deadline = start + timeout
+        waited = False
+
+        while True:
+            connection = None
+            create = False
+            with self._cond:
+                while True:
+                    if self._closed:
+                        raise PoolTimeoutError("Connection pool is closed")
+                    if self._idle:
+                        connection = self._idle.pop()
+                        break
+                    if self._size < self.max_size:
+                        self._size += 1
+                        create = True
+                        break
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._timeouts += 1
+                        raise PoolTimeoutError(
+                            f"No database connection available after {timeout}s"
+                        )
+                    waited = True
+                    self._cond.wait(remaining)
+
+            now = time.monotonic()
+            if create:
+                try:
+                    connection = self._connect(timeout)
+                except Exception:
+                    with self._cond:
+                        self._size -= 1
+                        self._cond.notify()
+                    raise
+                with self._cond:
+                    self._opened += 1
+            elif not self._is_usable(connection, now):
+                self._discard(connection)
+                continue
+
+            # Record checkout statistics
+            wait = time.monotonic() - start
+            with self._cond:
+                self._in_use += 1
+                self._checkouts += 1
+                if waited:
+                    self._waits += 1
+                self._wait_total += wait
+                if wait > self._wait_max:
+                    self._wait_max = wait
+            return connection
+
+    def putconn(self, connection):
+        """
+        Return a borrowed connection to the pool
+
+        Any open transaction is rolled back so the next borrower starts
+        clean. Broken or expired connections are closed instead.
+
+        Args:
+            connection: Connection previously returned by getconn()
+        """
+        with self._cond:
+            self._in_use -= 1
+
+        now = time.monotonic()
+        if not connection.closed and \
+                connection.info.transaction_status != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+            try:
+                connection.rollback()
+            except Exception:
+                pass
+
+        if connection.closed or self._closed or self._expired(connection, now) or \
+                connection.info.transaction_status != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+            self._discard(connection)
+            return
+
+        connection.last_used_at = now
+        with self._cond:
+            self._idle.append(connection)
+            self._cond.notify()
+
+    def close(self):
+        """Close all idle connections and refuse further checkouts"""
+        with self._cond:
+            self._closed = True
+            idle = list(self._idle)
+            self._idle.clear()
+            self._cond.notify_all()
+        for connection in idle:
+            self._discard(connection)
+
+    def stats(self):
+        """
+        Snapshot of pool usage
+
+        Returns:
+            dict: Sizes, checkout counts and wait times
+        """
+        with self._cond:
+            return {
+                "min_size": self.min_size,
+                "max_size": self.max_size,
+                "size": self._size,
+                "in_use": self._in_use,
+                "idle": len(self._idle),
+                "checkouts": self._checkouts,
+                "waits": self._waits,
+                "timeouts": self._timeouts,
+                "wait_time_total": round(self._wait_total, 6),
+                "wait_time_max": round(self._wait_max, 6),
+                "wait_time_avg": round(self._wait_total / self._checkouts, 6) if self._checkouts else 0.0,
+                "connections_opened": self._opened,
+                "connections_closed": self._discarded,
+                "validation_failures": self._validation_failures
+            }
+
+
+class SlowQueryLog:
+    """
+    Remembers queries slower than a threshold, with a sampled query plan
+
+    Every execution through StatementRegistry.execute is timed. Queries
+    over threshold_ms (and queries that fail) are printed and kept in a
+    ring buffer with their parameters and duration. Slow statements
+    registered as read_only then get EXPLAIN (ANALYZE, BUFFERS) on a
+    background thread with its own connection to the server the query ran
+    on (the primary or a read replica), in a transaction that is rolled
+    back. Anything else (a function with side effects, a FOR UPDATE lock,
+    ad hoc SQL) is never run twice and gets no plan. That happens for a
+    sample_rate share of them, at most once per explain_interval seconds
+    per query and one at a time, so a slow query under load does not turn
+    into twice the load. The buffer is per worker process.
     """
-    Create and return a database connection
-    
+
+    def __init__(self, threshold_ms=100.0, size=100, sample_rate=1.0, explain_interval=60.0,
+                 explain_timeout=10.0, log_params=True):
+        """
+        Args:
+            threshold_ms: Queries taking at least this long are logged;
+                0 logs every query, a negative value turns the log off
+            size: Entries kept (oldest dropped first)
+            sample_rate: Share of slow SELECTs that get a plan (0..1)
+            explain_interval: Minimum seconds between plans of one query
+            explain_timeout: statement_timeout in seconds for EXPLAIN
+            log_params: Record query parameters (turn off for sensitive data)
+        """
+        self.threshold = threshold_ms / 1000
+        self.threshold_ms = threshold_ms
+        self.sample_rate = sample_rate
+        self.explain_interval = explain_interval
+        self.explain_timeout = explain_timeout
+        self.log_params = log_params
+        self.enabled = threshold_ms >= 0
+        self._entries = deque(maxlen=size)
+        self._lock = threading.Lock()
+        self._last_explained = {}
+        self._explaining = False
+        self._executor = None
+        self._executor_pid = None
+        # EXPLAIN connections by DSN
+        self._connections = {}
+
+        # Statistics
+        self.slow = 0
+        self.failed = 0
+        self.explained = 0
+
+    def observe(self, sql, params, elapsed, statement=None, error=None, analyze=False, pool=None):
+        """
+        Record one execution if it was slow or failed
+
+        Args:
+            sql: Query text with %s placeholders
+            params: Query parameters
+            elapsed: Seconds the execution took
+            statement: Prepared statement name, if it ran as one
+            error: Exception raised by the execution, if any
+            analyze: The query is registered read-only and safe to run
+                again under EXPLAIN ANALYZE; otherwise it gets no plan
+            pool: ConnectionPool of the server it ran on (None: the primary)
+        """
+        if not self.enabled or (elapsed < self.threshold and error is None):
+            return
+
+        query = " ".join(sql.split())
+        entry = {
+            "at": datetime.now(timezone.utc).isoformat(),
+            "duration_ms": round(elapsed * 1000, 3),
+            "statement": statement,
+            "server": pool.name if pool is not None else "primary",
+            "query": query,
+            "params": _loggable(params) if self.log_params else None,
+            "error": f"{type(error).__name__}: {error}".strip() if error is not None else None,
+            "plan": None,
+            "plan_server": None,
+            "plan_status": self._plan_decision(query, error, analyze)
+        }
+        with self._lock:
+            if error is not None:
+                self.failed += 1
+            else:
+                self.slow += 1
+            self._entries.append(entry)
+        if error is None:
+            metrics.inc("db_slow_queries_total")
+
+        kind = f"Failed query ({entry['error']})" if error is not None else "Slow query"
+        print(f"{kind} {entry['duration_ms']} ms [{statement or 'ad hoc'}] on {entry['server']}: "
+              f"{query[:200]} params={entry['params']}")
+
+        if entry["plan_status"] == "pending":
+            dsn = pool.dsn if pool is not None else os.getenv('DATABASE_URL')
+            self._get_executor().submit(self._explain, entry, sql, params, dsn)
+
+    def _plan_decision(self, query, error, analyze):
+        """Whether this entry gets a plan, and if not, why not"""
+        if error is not None:
+            return "not explained: query failed"
+        if not analyze:
+            return "not explained: not a registered read-only statement"
+        if random.random() >= self.sample_rate:
+            return "not explained: sampled out"
+        now = time.monotonic()
+        with self._lock:
+            if self._explaining:
+                return "not explained: another plan is being captured"
+            if now - self._last_explained.get(query, -self.explain_interval) < self.explain_interval:
+                return "not explained: explained recently"
+            self._last_explained[query] = now
+            self._explaining = True
+        return "pending"
+
+    def _get_executor(self):
+        pid = os.getpid()
+        if self._executor is None or self._executor_pid != pid:
+            self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="explain")
+            self._executor_pid = pid
+            self._connections = {}
+        return self._executor
+
+    def _explain(self, entry, sql, params, dsn):
+        """Capture the plan on the log's own connection to dsn"""
+        connection = None
+        try:
+            connection = self._connections.get(dsn)
+            if connection is None or connection.closed:
+                connection = self._connections[dsn] = psycopg2.connect(dsn)
+            cursor = connection.cursor()
+            try:
+                cursor.execute("SET LOCAL statement_timeout = %s", (int(self.explain_timeout * 1000),))
+                cursor.execute("EXPLAIN (ANALYZE, BUFFERS) " + sql, params)
+                plan = "\n".join(row[0] for row in cursor.fetchall())
+            finally:
+                cursor.close()
+                connection.rollback()
+            with self._lock:
+                entry["plan"] = plan
+                entry["plan_server"] = entry["server"]
+                entry["plan_status"] = "explained"
+                self.explained += 1
+        except Exception as e:
+            with self._lock:
+                entry["plan_status"] = f"not explained: {e}".strip()
+            if connection is not None:
+                try:
+                    connection.close()
+                except Exception:
+                    pass
+                self._connections.pop(dsn, None)
+        finally:
+            with self._lock:
+                self._explaining = False
+
+    def close(self):
+        """Wait for a plan being captured and close the EXPLAIN connections"""
+        if self._executor is not None and self._executor_pid == os.getpid():
+            self._executor.shutdown(wait=True)
+            self._executor = None
+            for connection in self._connections.values():
+                connection.close()
+            self._connections = {}
+
+    def entries(self, limit=None):
+        """
+        Logged queries, newest first
+
+        Args:
+            limit: Maximum number of entries to return
+
+        Returns:
+            list: Entry dictionaries (copies)
+        """
+        with self._lock:
+            entries = [dict(entry) for entry in reversed(self._entries)]
+        return entries[:limit] if limit is not None else entries
+
+    def stats(self):
+        """
+        Settings and counters for this worker
+
+        Returns:
+            dict: Threshold, counts of slow, failed and explained queries
+        """
+        with self._lock:
+            return {
+                "threshold_ms": self.threshold_ms if self.enabled else None,
+                "slow": self.slow,
+                "failed": self.failed,
+                "explained": self.explained,
+                "kept": len(self._entries)
+            }
+
+
+def _loggable(params, limit=200):
+    """Query parameters as short, JSON-safe strings"""
+    if params is None:
+        return None
+    values = params.values() if isinstance(params, dict) else params
+    loggable = []
+    for value in values:
+        text = repr(value)
+        loggable.append(text if len(text) <= limit else text[:limit] + "...")
+    return loggable
+
+
+# Slow and failing queries of this process, configured from SLOW_QUERY_*
+slow_queries = SlowQueryLog(
+    threshold_ms=float(os.getenv('SLOW_QUERY_MS', '100')),
+    size=int(os.getenv('SLOW_QUERY_LOG_SIZE', '100')),
+    sample_rate=float(os.getenv('SLOW_QUERY_EXPLAIN_SAMPLE', '1')),
+    explain_interval=float(os.getenv('SLOW_QUERY_EXPLAIN_INTERVAL', '60')),
+    log_params=os.getenv('SLOW_QUERY_LOG_PARAMS', '1') != '0'
+)
+
+
+class PreparedStatement:
+    """One registered query and its execution statistics"""
+
+    def __init__(self, name, sql, read_only=False):
+        """
+        Args:
+            name: SQL identifier used for PREPARE / EXECUTE
+            sql: Query text with %s placeholders
+            read_only: Plain read without side effects or row locks
+        """
+        self.name = name
+        self.sql = sql
+        self.read_only = read_only
+        self.param_count = sql.count("%s")
+
+        # Turn %s placeholders into $1, $2, ... for PREPARE
+        parts = sql.split("%s")
+        numbered = parts[0]
+        for number, part in enumerate(parts[1:], start=1):
+            numbered += f"${number}" + part
+        self.prepare_sql = f"PREPARE {name} AS {numbered}"
+        self.execute_sql = f"EXECUTE {name}"
+        if self.param_count:
+            self.execute_sql += " (" + ", ".join(["%s"] * self.param_count) + ")"
+
+        self.prepares = 0
+        self.executions = 0
+        self.total_time = 0.0
+        self.max_time = 0.0
+
+
+class StatementRegistry:
+    """
+    Prepares hot queries once per pooled connection and reuses their plans
+
+    Queries are looked up by their exact SQL text, so callers keep passing
+    the same strings they would give to cursor.execute(); anything not
+    registered is executed as plain SQL. Set DB_PREPARED_STATEMENTS=0 to
+    turn preparing off (e.g. behind PgBouncer in transaction mode).
+    """
+
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self._by_sql = {}
+        self._by_name = {}
+        self._lock = threading.Lock()
+
+    def register(self, name, sql, read_only=False):
+        """
+        Register a query to be prepared
+
+        Args:
+            name: SQL identifier for the statement
+            sql: Query text with %s placeholders
+            read_only: The query only reads (no function with side effects,
+                no FOR UPDATE / FOR SHARE), so the slow query log may run it
+                again under EXPLAIN ANALYZE
+
+        Returns:
+            PreparedStatement: The registered statement
+        """
+        statement = PreparedStatement(name, sql, read_only)
+        self._by_sql[sql] = statement
+        self._by_name[name] = statement
+        return statement
+
+    def _ensure_prepared(self, cursor, statement):
+        connection = cursor.connection
+        if statement.name not in connection.prepared:
+            cursor.execute(statement.prepare_sql)
+            connection.prepared.add(statement.name)
+            with self._lock:
+                statement.prepares += 1
+
+    def execute(self, cursor, sql, params=None):
+        """
+        Execute sql on cursor, through its prepared statement if registered
+
+        Every execution is timed; slow and failing ones go to slow_queries.
+
+        Args:
+            cursor: Cursor of a pooled connection
+            sql: Query text with %s placeholders
+            params: Query parameters
+        """
+        registered = self._by_sql.get(sql)
+        analyze = registered is not None and registered.read_only
+        pool = getattr(cursor.connection, "pool", None)
+        statement = registered if self.enabled else None
+        if statement is None or not hasattr(cursor.connection, "prepared"):
+            start = time.perf_counter()
+            try:
+                cursor.execute(sql, params)
+            except Exception as e:
+                slow_queries.observe(sql, params, time.perf_counter() - start, error=e, pool=pool)
+                raise
+            slow_queries.observe(sql, params, time.perf_counter() - start, analyze=analyze, pool=pool)
+            return
+
+        self._ensure_prepared(cursor, statement)
+        start = time.perf_counter()
+        try:
+            cursor.execute(statement.execute_sql, params)
+        except Exception as e:
+            slow_queries.observe(sql, params, time.perf_counter() - start, statement.name, e, pool=pool)
+            if isinstance(e, psycopg2.errors.InvalidSqlStatementName):
+                # Session was reset behind our back; prepare again next time
+                cursor.connection.prepared.clear()
+            raise
+        elapsed = time.perf_counter() - start
+        slow_queries.observe(sql, params, elapsed, statement.name, analyze=analyze, pool=pool)
+
+        with self._lock:
+            statement.executions += 1
+            statement.total_time += elapsed
+            if elapsed > statement.max_time:
+                statement.max_time = elapsed
+
+    def prepare_all(self, connection):
+        """
+        Prepare every registered statement on a connection
+
+        Args:
+            connection: Pooled connection to warm up
+        """
+        if not self.enabled:
+            return
+        missing = [statement for statement in self._by_name.values()
+                   if statement.name not in connection.prepared]
+        if not missing:
+            return
+        cursor = connection.cursor()
+        try:
+            # All PREPAREs in one round trip
+            cursor.execute(";".join(statement.prepare_sql for statement in missing))
+        finally:
+            cursor.close()
+        connection.prepared.update(statement.name for statement in missing)
+        with self._lock:
+            for statement in missing:
+                statement.prepares += 1
+
+    def stats(self):
+        """
+        Per-statement execution counts and timings
+
+        Returns:
+            dict: Statement name -> counters (times in seconds)
+        """
+        with self._lock:
+            return {
+                name: {
+                    "prepares": statement.prepares,
+                    "executions": statement.executions,
+                    "total_time": round(statement.total_time, 6),
+                    "avg_time": round(statement.total_time / statement.executions, 6) if statement.executions else 0.0,
+                    "max_time": round(statement.max_time, 6)
+                }
+                for name, statement in self._by_name.items()
+            }
+
+
+# Registry of hot queries, shared by every connection in this process
+statements = StatementRegistry(enabled=os.getenv('DB_PREPARED_STATEMENTS', '1') != '0')
+
+
+_pool = None
+_pool_pid = None
+_pool_lock = threading.Lock()
+
+
+def create_pool(dsn, name="primary"):
+    """
+    Build a connection pool configured from DB_POOL_* environment variables
+
+    Args:
+        dsn: PostgreSQL connection string
+        name: Server name for stats
+
+    Returns:
+        ConnectionPool: New pool (no connections opened yet)
+    """
+    return ConnectionPool(
+        dsn,
+        min_size=int(os.getenv('DB_POOL_MIN_SIZE', '1')),
+        max_size=int(os.getenv('DB_POOL_MAX_SIZE', '10')),
+        max_lifetime=float(os.getenv('DB_POOL_MAX_LIFETIME', '1800')),
+        timeout=float(os.getenv('DB_POOL_TIMEOUT', '5')),
+        validate_idle=float(os.getenv('DB_POOL_VALIDATE_IDLE', '30')),
+        name=name,
+        connect_timeout=float(os.getenv('DB_CONNECT_TIMEOUT', '5'))
+    )
+
+
+def get_pool():
+    """
+    Return this process's connection pool, creating it on first use
+
+    The pool is keyed on the process ID so that a pool inherited across
+    fork() is never shared between uvicorn workers.
+
+    Returns:
+        ConnectionPool: Pool configured from DB_POOL_* environment variables
+    """
+    global _pool, _pool_pid
+    pid = os.getpid()
+    if _pool is not None and _pool_pid == pid:
+        return _pool
+    with _pool_lock:
+        if _pool is None or _pool_pid != pid:
+            _pool = create_pool(os.getenv('DATABASE_URL'))
+            _pool_pid = pid
+    return _pool
+
+
+def pool_stats():
+    """
+    Return usage statistics for this process's connection pool
+
+    Returns:
+        dict: See ConnectionPool.stats()
+    """
+    return get_pool().stats()
+
+
+def get_db_connection(pool=None, timeout=None):
+    """
+    Borrow a database connection from the pool
+
+    Args:
+        pool: Pool to borrow from (default: the primary's)
+        timeout: Seconds to wait for a connection (default: DB_POOL_TIMEOUT)
+
     Returns:
         connection: PostgreSQL connection object
     """
+    start = time.perf_counter()
     try:
-        connection = psycopg2.connect(
-            os.getenv('DATABASE_URL'),
-            cursor_factory=RealDictCursor
-        )
+        connection = (pool or get_pool()).getconn(timeout)
+        metrics.observe("db_pool_wait_seconds", value=time.perf_counter() - start)
         return connection
     except Exception as e:
         print(f"Database connection error: {e}")
@@ -30,10 +754,10 @@ def get_db_connection():
 
 def close_db_connection(connection):
     """
-    Close database connection
-    
+    Return database connection to the pool
+
     Args:
-        connection: PostgreSQL connection object to close
+        connection: PostgreSQL connection object to return
     """
     if connection:
-        connection.close()
+        connection.pool.putconn(connection)
@@ -0,0 +1,143 @@
+"""
+Health Check Module
+Background task that checks the database periodically so probes can be
+answered from memory without touching PostgreSQL
+"""
+
+import asyncio
+import os
+import time
+from datetime import datetime, timezone
+
+from app.repository import repository
+
+
+class HealthMonitor:
+    """
+    Periodically pings the item repository (SELECT 1) and caches the result
+
+    Probes read the cached status, so however often load balancers and
+    scripts poll, each worker sends one check per interval to the database.
+    """
+
+    def __init__(self, interval=5.0, timeout=2.0, max_age=None):
+        """
+        Args:
+            interval: Seconds between database checks
+            timeout: Seconds a check may take before it counts as failed
+            max_age: Seconds after which a cached result is too old to
+                report ready (default 3 * interval)
+        """
+        self.interval = interval
+        self.timeout = timeout
+        self.max_age = max_age if max_age is not None else 3 * interval
+        self._task = None
+        # Ping still running after its check timed out
+        self._ping = None
+
+        # Last check result
+        self.healthy = False
+        self.latency = None
+        self.error = "not checked yet"
+        self.checked_at = None
+        self.checked_monotonic = None
+        self.checks = 0
+        self.consecutive_failures = 0
+
+    async def check(self):
+        """
+        Run one database check and record the outcome
+
+        The ping is bounded by the timeout on the database side as well,
+        but while a timed-out ping is still holding its thread and
+        connection, no new one is sent; the check fails straight away.
+        """
+        start = time.perf_counter()
+        try:
+            if self._ping is not None and not self._ping.done():
+                raise TimeoutError("previous check still running")
+            self._ping = asyncio.ensure_future(repository.ping(self.timeout))
+            # Retrieve the outcome even if nobody awaits it any more
+            self._ping.add_done_callback(lambda ping: ping.cancelled() or ping.exception())
+            await asyncio.wait_for(asyncio.shield(self._ping), self.timeout)
+            self.healthy = True
+            self.error = None
+            self.consecutive_failures = 0
+        except Exception as e:
+            self.healthy = False
+            self.error = str(e) or type(e).__name__
+            self.consecutive_failures += 1
+        self.latency = time.perf_counter() - start
+        self.checked_at = datetime.now(timezone.utc)
+        self.checked_monotonic = time.monotonic()
+        self.checks += 1
+
+    async def _run(self):
+        while True:
+            await self.check()
+            await asyncio.sleep(self.interval)
+
+    def start(self):
+        """Start checking in the background on the running event loop"""
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        """Cancel the background task"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def age(self):
+        """Seconds since the last check finished, or None"""
+        if self.checked_monotonic is None:
+            return None
+        return time.monotonic() - self.checked_monotonic
+
+    def is_ready(self):
+        """Whether the last check passed and is recent enough to trust"""
+        age = self.age()
+        return self.healthy and age is not None and age <= self.max_age
+
+    def status(self):
+        """
+        Cached database status for the readiness probe
+
+        Returns:
+            dict: Readiness, last check result and pool saturation of the
+                active backend (SQLite: its read connections)
+        """
+        age = self.age()
+        pool = repository.pool_stats()
+        return {
+            "status": "ready" if self.is_ready() else "unavailable",
+            "database": {
+                "status": "healthy" if self.healthy else "unhealthy",
+                "latency_ms": round(self.latency * 1000, 3) if self.latency is not None else None,
+                "checked_at": self.checked_at.isoformat() if self.checked_at else None,
+                "age_seconds": round(age, 3) if age is not None else None,
+                "consecutive_failures": self.consecutive_failures,
+                "error": self.error
+            },
+            "pool": {
+                "backend": repository.name,
+                "size": pool["size"],
+                "max_size": pool["max_size"],
+                "in_use": pool["in_use"],
+                "idle": pool["idle"],
+                "saturation": round(pool["in_use"] / pool["max_size"], 3),
+                "waits": pool["waits"],
+                "timeouts": pool["timeouts"]
+            }
+        }
+
+
+# Shared by the probe endpoints; started with the app
+health_monitor = HealthMonitor(
+    interval=float(os.getenv('HEALTH_CHECK_INTERVAL', '5')),
+    timeout=float(os.getenv('HEALTH_CHECK_TIMEOUT', '2'))
+)
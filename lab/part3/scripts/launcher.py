@@ -0,0 +1,397 @@
+"""
+Production Launcher
+Sizes and tunes uvicorn workers for the machine and supervises them on one
+shared listening socket, with graceful rolling restarts on SIGHUP
+
+Usage (from the project directory):
+    python -m app.launcher                  # serve on WEB_HOST:WEB_PORT
+    python -m app.launcher --check          # print the chosen settings
+    kill -HUP <launcher pid>                # re-read .env, replace workers one by one
+    kill -USR1 <launcher pid>               # reload API keys in every worker
+
+Environment (all optional):
+    WEB_HOST, WEB_PORT        Bind address (default 0.0.0.0:8000)
+    WEB_CONCURRENCY           Worker count (default: usable CPUs)
+    DB_MAX_CONNECTIONS        Cap workers so workers * DB_POOL_MAX_SIZE fits
+    WEB_BACKLOG               listen() backlog (default 2048)
+    WEB_KEEPALIVE             Idle keep-alive seconds (default 75)
+    WEB_DRAIN_TIMEOUT         Seconds a stopping worker moves keep-alive
+                              clients off before closing them (default 5)
+    WEB_GRACEFUL_TIMEOUT      Seconds a stopping worker may finish requests
+    WEB_ACCESS_LOG            1 to log every request (default 0)
+"""
+
+import argparse
+import asyncio
+import importlib.util
+import math
+import multiprocessing
+import os
+import signal
+import socket
+import sys
+import time
+
+import uvicorn
+from dotenv import dotenv_values
+from uvicorn.importer import import_from_string
+
+# Seconds a new worker gets to finish startup during a rolling restart
+WORKER_START_TIMEOUT = 60.0
+
+
+def _read_first_line(path):
+    try:
+        with open(path) as cgroup_file:
+            return cgroup_file.readline().strip()
+    except OSError:
+        return None
+
+
+def cgroup_cpu_limit():
+    """
+    CPU quota imposed by the container's cgroup, if any
+
+    Returns:
+        float: Number of CPUs the quota allows, or None if unlimited
+    """
+    # cgroup v2: "<quota> <period>" or "max <period>"
+    line = _read_first_line("/sys/fs/cgroup/cpu.max")
+    if line:
+        quota, _, period = line.partition(" ")
+        if quota != "max" and period:
+            return int(quota) / int(period)
+        return None
+
+    # cgroup v1
+    quota = _read_first_line("/sys/fs/cgroup/cpu/cpu.cfs_quota_us")
+    period = _read_first_line("/sys/fs/cgroup/cpu/cpu.cfs_period_us")
+    if quota and period and int(quota) > 0:
+        return int(quota) / int(period)
+    return None
+
+
+def available_cpus():
+    """
+    CPUs this process may actually use
+
+    Takes the smaller of the CPU affinity mask and the cgroup quota, so a
+    container limited to 2 CPUs on a 64-core host counts as 2.
+
+    Returns:
+        int: Usable CPU count, at least 1
+    """
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:
+        cpus = os.cpu_count() or 1
+    limit = cgroup_cpu_limit()
+    if limit is not None:
+        cpus = min(cpus, math.ceil(limit))
+    return max(1, cpus)
+
+
+def default_workers():
+    """
+    Pick the number of worker processes
+
+    Each worker runs one event loop, so one worker per usable CPU keeps
+    every core busy without processes fighting over them. WEB_CONCURRENCY
+    overrides this. If DB_MAX_CONNECTIONS is set, the count is capped so
+    every worker's pool (DB_POOL_MAX_SIZE) fits the database's budget.
+
+    Returns:
+        tuple: (workers, explanation)
+    """
+    if os.getenv('WEB_CONCURRENCY'):
+        return max(1, int(os.getenv('WEB_CONCURRENCY'))), "WEB_CONCURRENCY"
+
+    workers = available_cpus()
+    reason = f"{workers} usable CPUs"
+    budget = int(os.getenv('DB_MAX_CONNECTIONS', '0'))
+    if budget:
+        per_worker = int(os.getenv('DB_POOL_MAX_SIZE', '10'))
+        allowed = max(1, budget // per_worker)
+        if allowed < workers:
+            workers = allowed
+            reason += f", capped by DB_MAX_CONNECTIONS={budget} / DB_POOL_MAX_SIZE={per_worker}"
+    return workers, reason
+
+
+def server_options(args):
+    """
+    uvicorn.Config keyword arguments for each worker
+
+    uvloop and httptools are used when installed (uvicorn[standard]
+    pulls both in), falling back to asyncio and h11.
+
+    Returns:
+        dict: Config options
+    """
+    return {
+        "app": args.app,
+        "loop": "uvloop" if importlib.util.find_spec("uvloop") else "asyncio",
+        "http": "httptools" if importlib.util.find_spec("httptools") else "h11",
+        "backlog": args.backlog,
+        "timeout_keep_alive": args.keep_alive,
+        "timeout_graceful_shutdown": args.graceful_timeout,
+        "access_log": args.access_log,
+        "proxy_headers": True,
+        "lifespan": "on"
+    }
+
+
+def bind_socket(host, port, backlog):
+    """
+    Open the listening socket shared by every worker
+
+    The supervisor owns it, so the kernel keeps queueing connections while
+    workers come and go. It is created with IPPROTO_TCP (accepted sockets
+    inherit the protocol), which lets asyncio turn on TCP_NODELAY for each
+    connection; uvicorn's own multi-worker socket leaves the protocol at 0,
+    and small responses then stall on Nagle + delayed ACK.
+
+    Returns:
+        socket.socket: Bound, listening socket
+    """
+    family = socket.AF_INET6 if ":" in host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM, socket.IPPROTO_TCP)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    sock.set_inheritable(True)
+    return sock
+
+
+class DrainingApp:
+    """
+    ASGI wrapper that adds Connection: close once the worker is draining
+
+    Keep-alive clients then finish their current or next request on the
+    old worker and reconnect through the shared socket to a new one,
+    instead of having their idle connection closed under them.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self.draining = False
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self.draining:
+            await self.app(scope, receive, send)
+            return
+
+        async def send_closing(message):
+            if message["type"] == "http.response.start":
+                message = dict(message)
+                message["headers"] = list(message.get("headers", [])) + [(b"connection", b"close")]
+            await send(message)
+
+        await self.app(scope, receive, send_closing)
+
+
+def _serve(options, sock, ready, drain_timeout):
+    """Worker process: run uvicorn on the inherited socket"""
+    app = DrainingApp(import_from_string(options["app"]))
+
+    class WorkerServer(uvicorn.Server):
+        async def startup(self, sockets=None):
+            await super().startup(sockets=sockets)
+            if self.started:
+                ready.set()
+
+        async def shutdown(self, sockets=None):
+            # Stop accepting, then let open connections wind down on their own
+            for server in self.servers:
+                server.close()
+            app.draining = True
+            deadline = time.monotonic() + drain_timeout
+            while self.server_state.connections and time.monotonic() < deadline:
+                await asyncio.sleep(0.05)
+            await super().shutdown(sockets=sockets)
+
+    WorkerServer(uvicorn.Config(**dict(options, app=app))).run(sockets=[sock])
+
+
+class Supervisor:
+    """
+    Keeps a fixed number of uvicorn workers running on one socket
+
+    Workers that die are replaced. On SIGHUP the supervisor re-reads .env
+    (its values override the environment, as in KeyStore.reload) and
+    replaces workers one at a time: a new worker is started and must
+    finish startup (lifespan, pool) before the old one is sent SIGTERM.
+    The old worker stops accepting, answers with Connection: close for up
+    to drain_timeout seconds so keep-alive clients move over, then
+    finishes in-flight requests and exits. The socket stays open in the
+    supervisor throughout, so no connection is refused. SIGTERM / SIGINT
+    stop all workers the same graceful way. SIGUSR1 is forwarded to every worker as SIGHUP, which
+    reloads API keys in place without a restart.
+    """
+
+    def __init__(self, options, sock, workers, graceful_timeout, drain_timeout):
+        self.options = options
+        self.sock = sock
+        self.workers = workers
+        self.graceful_timeout = graceful_timeout
+        self.drain_timeout = drain_timeout
+        self.processes = []
+        self._context = multiprocessing.get_context("spawn")
+        self._restart = False
+        self._reload_keys = False
+        self._stopping = False
+        # .env as loaded at import time, to notice settings removed later
+        self._dotenv = dotenv_values()
+
+    def _spawn(self):
+        """Start a worker; process.ready is set once it is serving"""
+        ready = self._context.Event()
+        process = self._context.Process(
+            target=_serve, args=(self.options, self.sock, ready, self.drain_timeout),
+            name="item-api-worker"
+        )
+        process.ready = ready
+        process.start()
+        return process
+
+    def _stop_worker(self, process):
+        """SIGTERM a worker and wait for it to drain"""
+        if process.is_alive():
+            process.terminate()
+        process.join(self.drain_timeout + self.graceful_timeout + 5)
+        if process.is_alive():
+            print(f"Worker {process.pid} did not stop in time, killing it")
+            process.kill()
+            process.join()
+
+    def reload_settings(self):
+        """
+        Re-read .env into the environment new workers inherit
+
+        The app package loads .env without overriding, so without this a
+        restarted worker would see the values the supervisor started with.
+        Settings removed from .env are dropped unless something else
+        changed them since.
+        """
+        settings = dotenv_values()
+        for name, value in self._dotenv.items():
+            if name not in settings and value is not None and os.environ.get(name) == value:
+                del os.environ[name]
+        os.environ.update({name: value for name, value in settings.items() if value is not None})
+        os.environ["WEB_WORKERS"] = str(self.workers)
+        self._dotenv = settings
+
+    def rolling_restart(self):
+        """Replace every worker, one at a time, without a gap in capacity"""
+        try:
+            self.reload_settings()
+        except Exception as e:
+            print(f"Could not re-read .env, keeping current settings: {e}")
+        print(f"Rolling restart of {len(self.processes)} workers")
+        for index, old in enumerate(list(self.processes)):
+            if self._stopping:
+                return
+            new = self._spawn()
+            deadline = time.monotonic() + WORKER_START_TIMEOUT
+            while not new.ready.wait(0.2):
+                if not new.is_alive() or time.monotonic() > deadline or self._stopping:
+                    print(f"New worker failed to start; keeping worker {old.pid}, restart aborted")
+                    self._stop_worker(new)
+                    return
+            self.processes[index] = new
+            self._stop_worker(old)
+            print(f"Replaced worker {old.pid} with {new.pid}")
+        print("Rolling restart complete")
+
+    def reload_keys(self):
+        """Ask every serving worker to reload its API keys"""
+        for process in self.processes:
+            # A worker still starting has no SIGHUP handler yet and would die
+            if process.is_alive() and process.ready.is_set():
+                os.kill(process.pid, signal.SIGHUP)
+        print("Asked workers to reload API keys")
+
+    def _on_hup(self, signum, frame):
+        self._restart = True
+
+    def _on_usr1(self, signum, frame):
+        self._reload_keys = True
+
+    def _on_stop(self, signum, frame):
+        self._stopping = True
+
+    def run(self):
+        """Start the workers and supervise them until stopped"""
+        signal.signal(signal.SIGHUP, self._on_hup)
+        signal.signal(signal.SIGUSR1, self._on_usr1)
+        signal.signal(signal.SIGTERM, self._on_stop)
+        signal.signal(signal.SIGINT, self._on_stop)
+
+        # Lets workers know whether they are the only process on the database
+        os.environ["WEB_WORKERS"] = str(self.workers)
+        for _ in range(self.workers):
+            self.processes.append(self._spawn())
+        print(f"Supervisor {os.getpid()} started workers {[p.pid for p in self.processes]}")
+
+        while not self._stopping:
+            if self._restart:
+                self._restart = False
+                self.rolling_restart()
+            if self._reload_keys:
+                self._reload_keys = False
+                self.reload_keys()
+            for index, process in enumerate(self.processes):
+                if not process.is_alive() and not self._stopping:
+                    print(f"Worker {process.pid} exited with {process.exitcode}, starting a new one")
+                    self.processes[index] = self._spawn()
+            time.sleep(0.5)
+
+        print("Stopping workers")
+        for process in self.processes:
+            if process.is_alive():
+                process.terminate()
+        for process in self.processes:
+            self._stop_worker(process)
+        self.sock.close()
+
+
+def main(argv=None):
+    workers, reason = default_workers()
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--app", default="app.main:app", help="ASGI app import path")
+    parser.add_argument("--host", default=os.getenv('WEB_HOST', '0.0.0.0'))
+    parser.add_argument("--port", type=int, default=int(os.getenv('WEB_PORT', '8000')))
+    parser.add_argument("--workers", type=int, default=workers)
+    parser.add_argument("--backlog", type=int, default=int(os.getenv('WEB_BACKLOG', '2048')))
+    parser.add_argument("--keep-alive", type=int, default=int(os.getenv('WEB_KEEPALIVE', '75')),
+                        help="seconds an idle keep-alive connection stays open")
+    parser.add_argument("--graceful-timeout", type=int,
+                        default=int(os.getenv('WEB_GRACEFUL_TIMEOUT', '30')),
+                        help="seconds a stopping worker may spend finishing requests")
+    parser.add_argument("--drain-timeout", type=float,
+                        default=float(os.getenv('WEB_DRAIN_TIMEOUT', '5')),
+                        help="seconds a stopping worker moves keep-alive clients off")
+    parser.add_argument("--access-log", action="store_true",
+                        default=os.getenv('WEB_ACCESS_LOG', '0') == '1')
+    parser.add_argument("--check", action="store_true", help="print the settings and exit")
+    args = parser.parse_args(argv)
+    if args.workers != workers:
+        reason = "--workers"
+
+    options = server_options(args)
+    print(f"Workers: {args.workers} ({reason})")
+    print(f"Event loop: {options['loop']}, HTTP parser: {options['http']}")
+    print(f"Listen: {args.host}:{args.port}, backlog {args.backlog}, "
+          f"keep-alive {args.keep_alive}s, drain {args.drain_timeout}s, "
+          f"graceful timeout {args.graceful_timeout}s")
+    if args.check:
+        return
+
+    sock = bind_socket(args.host, args.port, args.backlog)
+    Supervisor(options, sock, args.workers, args.graceful_timeout, args.drain_timeout).run()
+    sys.exit(0)
+
+
+if __name__ == "__main__":
+    main()
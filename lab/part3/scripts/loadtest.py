@@ -0,0 +1,429 @@
+"""
+Load Test
+Asyncio HTTP/1.1 load generator reporting throughput and tail latency for
+a weighted mix of API endpoints
+
+Each connection is a keep-alive HTTP/1.1 stream driven by one coroutine,
+so the generator needs nothing beyond the standard library. Without
+--rate every connection sends its next request as soon as the previous
+one finishes (closed loop). With --rate, requests are scheduled at a
+fixed arrival rate and latency is measured from the scheduled time, so
+server stalls are not hidden by the generator slowing down.
+
+Every key is rate limited (auth.py), so start the API with
+RATE_LIMIT_PER_SECOND=0, or give the test key a high limit in API_KEYS;
+otherwise most requests come back 429 and are counted as errors.
+
+Usage (from the project directory, with the API running):
+    python -m app.loadtest --concurrency 32 --duration 30 --output run.json
+    python -m app.loadtest --mix "GET /items/{id}=80,GET /health/ready=20"
+    python -m app.loadtest --compare baseline.json --output run.json
+
+    # Exercise the app without PostgreSQL: serve it on a SQLite file (load
+    # items through POST /items/bulk first, so {id} lookups find rows)
+    DATABASE_URL=sqlite:///loadtest.db RATE_LIMIT_PER_SECOND=0 python -m app.launcher
+    python -m app.loadtest --concurrency 32 --duration 30
+
+    # Measure only the generator's own ceiling (no app, canned responses)
+    python -m app.loadtest --stub
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import sys
+import time
+from datetime import datetime, timezone
+from urllib.parse import urlsplit
+
+
+# Endpoint mix used when --mix is not given: (method, path, weight)
+DEFAULT_MIX = "GET /items/{id}=70,GET /items?limit=50=20,GET /health/ready=10"
+
+# Payload the --stub server answers every request with
+STUB_BODY = json.dumps({
+    "id": 1, "name": "Item 1", "description": "Stand-in item", "price": 9.99,
+    "quantity": 10, "created_at": "2025-01-01T00:00:00", "updated_at": "2025-01-01T00:00:00Z",
+    "version": 1
+}).encode("utf-8")
+
+
+class Endpoint:
+    """One entry of the request mix"""
+
+    def __init__(self, method, path, weight):
+        self.method = method
+        self.path = path
+        self.weight = weight
+        self.name = f"{method} {path}"
+
+
+def parse_mix(text):
+    """
+    Parse 'METHOD /path=weight,...' into endpoints
+
+    A '{id}' in a path is replaced by a random ID from --ids per request.
+
+    Returns:
+        list: Endpoint objects
+    """
+    endpoints = []
+    for entry in text.split(","):
+        entry = entry.strip()
+        if not entry:
+            continue
+        request, _, weight = entry.rpartition("=")
+        if not request or not weight.replace(".", "", 1).isdigit():
+            request, weight = entry, "1"
+        method, _, path = request.strip().partition(" ")
+        endpoints.append(Endpoint(method.upper(), path.strip() or "/", float(weight)))
+    if not endpoints:
+        raise ValueError("The endpoint mix is empty")
+    return endpoints
+
+
+def percentile(ordered, fraction):
+    """Nearest-rank percentile of an already sorted list"""
+    if not ordered:
+        return 0.0
+    # Rounded first so float error (0.07 * 100 = 7.000000000000001) keeps the rank
+    rank = math.ceil(round(fraction * len(ordered), 9))
+    index = min(len(ordered) - 1, max(0, rank - 1))
+    return ordered[index]
+
+
+def summarize(latencies, elapsed):
+    """
+    Throughput and latency summary for one set of samples
+
+    Args:
+        latencies: Latencies in seconds
+        elapsed: Measured wall time in seconds
+
+    Returns:
+        dict: Request count, requests per second and latency in ms
+    """
+    ordered = sorted(latencies)
+    return {
+        "requests": len(ordered),
+        "rps": round(len(ordered) / elapsed, 1) if elapsed > 0 else 0.0,
+        "latency_ms": {
+            "mean": round(sum(ordered) / len(ordered) * 1000, 3) if ordered else 0.0,
+            "p50": round(percentile(ordered, 0.50) * 1000, 3),
+            "p95": round(percentile(ordered, 0.95) * 1000, 3),
+            "p99": round(percentile(ordered, 0.99) * 1000, 3),
+            "max": round(ordered[-1] * 1000, 3) if ordered else 0.0
+        }
+    }
+
+
+class Connection:
+    """Minimal keep-alive HTTP/1.1 client connection"""
+
+    def __init__(self, host, port, headers):
+        self.host = host
+        self.port = port
+        self.headers = headers
+        self.reader = None
+        self.writer = None
+
+    async def close(self):
+        if self.writer is not None:
+            self.writer.close()
+            try:
+                await self.writer.wait_closed()
+            except Exception:
+                pass
+            self.reader = self.writer = None
+
+    async def request(self, method, path):
+        """
+        Send one request and read the whole response body
+
+        Returns:
+            int: HTTP status code
+        """
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+        self.writer.write(
+            f"{method} {path} HTTP/1.1\r\nHost: {self.host}:{self.port}\r\n{self.headers}\r\n".encode("latin-1")
+        )
+        await self.writer.drain()
+
+        status_line = await self.reader.readline()
+        if not status_line:
+            raise ConnectionError("Server closed the connection")
+        status = int(status_line.split()[1])
+
+        length, chunked, close = 0, False, False
+        while True:
+            line = await self.reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            name, value = name.strip().lower(), value.strip().lower()
+            if name == "content-length":
+                length = int(value)
+            elif name == "transfer-encoding" and "chunked" in value:
+                chunked = True
+            elif name == "connection" and value == "close":
+                close = True
+
+        if chunked:
+            while True:
+                size = int((await self.reader.readline()).split(b";")[0], 16)
+                await self.reader.readexactly(size + 2)
+                if size == 0:
+                    break
+        elif length and method != "HEAD" and status != 304:
+            await self.reader.readexactly(length)
+
+        if close:
+            await self.close()
+        return status
+
+
+class LoadTest:
+    """Drives the request mix and collects per-endpoint latencies"""
+
+    def __init__(self, url, endpoints, concurrency, duration, warmup, rate, ids, api_key):
+        parts = urlsplit(url)
+        self.host = parts.hostname or "localhost"
+        self.port = parts.port or 80
+        self.prefix = parts.path.rstrip("/")
+        self.endpoints = endpoints
+        self.weights = [endpoint.weight for endpoint in endpoints]
+        self.concurrency = concurrency
+        self.duration = duration
+        self.warmup = warmup
+        self.rate = rate
+        self.ids = ids
+        self.headers = "Accept: application/json\r\n"
+        if api_key:
+            self.headers += f"X-API-Key: {api_key}\r\n"
+
+        self.latencies = {endpoint.name: [] for endpoint in endpoints}
+        self.statuses = {}
+        self.errors = {}
+        self.measure_from = 0.0
+        self.stop_at = 0.0
+
+    def _next_request(self):
+        endpoint = random.choices(self.endpoints, self.weights)[0]
+        path = endpoint.path.replace("{id}", str(random.randint(*self.ids)))
+        return endpoint, self.prefix + path
+
+    def _record(self, endpoint, scheduled, status, error):
+        now = time.perf_counter()
+        if scheduled < self.measure_from:
+            return
+        if error is not None:
+            self.errors[error] = self.errors.get(error, 0) + 1
+            return
+        self.statuses[status] = self.statuses.get(status, 0) + 1
+        if 200 <= status < 400:
+            self.latencies[endpoint.name].append(now - scheduled)
+        else:
+            self.errors[f"HTTP {status}"] = self.errors.get(f"HTTP {status}", 0) + 1
+
+    async def _send(self, connection, endpoint, path, scheduled):
+        try:
+            status = await connection.request(endpoint.method, path)
+            self._record(endpoint, scheduled, status, None)
+        except (OSError, asyncio.IncompleteReadError, ValueError, IndexError) as e:
+            await connection.close()
+            self._record(endpoint, scheduled, 0, type(e).__name__)
+
+    async def _closed_loop_worker(self):
+        connection = Connection(self.host, self.port, self.headers)
+        while time.perf_counter() < self.stop_at:
+            endpoint, path = self._next_request()
+            await self._send(connection, endpoint, path, time.perf_counter())
+        await connection.close()
+
+    async def _open_loop_worker(self, queue):
+        connection = Connection(self.host, self.port, self.headers)
+        while True:
+            scheduled = await queue.get()
+            if scheduled is None:
+                break
+            endpoint, path = self._next_request()
+            await self._send(connection, endpoint, path, scheduled)
+        await connection.close()
+
+    async def _schedule(self, queue):
+        """Enqueue one start time per request at a fixed arrival rate"""
+        interval = 1.0 / self.rate
+        scheduled = time.perf_counter()
+        while scheduled < self.stop_at:
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            queue.put_nowait(scheduled)
+            scheduled += interval
+        for _ in range(self.concurrency):
+            queue.put_nowait(None)
+
+    async def run(self):
+        """
+        Run warm-up plus the measured period
+
+        Returns:
+            dict: Results, ready to be saved as JSON
+        """
+        start = time.perf_counter()
+        self.measure_from = start + self.warmup
+        self.stop_at = self.measure_from + self.duration
+
+        if self.rate:
+            queue = asyncio.Queue()
+            tasks = [asyncio.create_task(self._open_loop_worker(queue)) for _ in range(self.concurrency)]
+            tasks.append(asyncio.create_task(self._schedule(queue)))
+        else:
+            tasks = [asyncio.create_task(self._closed_loop_worker()) for _ in range(self.concurrency)]
+        await asyncio.gather(*tasks)
+        elapsed = max(time.perf_counter(), self.stop_at) - self.measure_from
+
+        everything = [value for values in self.latencies.values() for value in values]
+        results = summarize(everything, elapsed)
+        results["errors"] = sum(self.errors.values())
+        results["error_types"] = self.errors
+        results["status_codes"] = {str(code): count for code, count in sorted(self.statuses.items())}
+        results["endpoints"] = {
+            name: summarize(values, elapsed) for name, values in self.latencies.items()
+        }
+        return results
+
+
+async def run_stub_server(port):
+    """
+    Stand-in backend answering every request with one canned item
+
+    Runs in this process, so --stub measures the generator's own ceiling;
+    it does not exercise the API at all. To load the app without
+    PostgreSQL, run it with DATABASE_URL=sqlite:///... instead.
+    """
+    response = (
+        b"HTTP/1.1 200 OK\r\nContent-Type: application/json\r\n"
+        b"Content-Length: " + str(len(STUB_BODY)).encode() + b"\r\n\r\n" + STUB_BODY
+    )
+
+    async def handle(reader, writer):
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                while line not in (b"\r\n", b"\n", b""):
+                    line = await reader.readline()
+                writer.write(response)
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    return await asyncio.start_server(handle, "127.0.0.1", port, backlog=1024)
+
+
+def compare(baseline, results, threshold):
+    """
+    Print current results next to a saved run and flag regressions
+
+    Args:
+        baseline: Results loaded from an earlier --output file
+        results: Results of this run
+        threshold: Allowed change in percent before a metric counts as
+            a regression (RPS down or p95/p99 up)
+
+    Returns:
+        bool: True if any metric regressed beyond the threshold
+    """
+    regressed = False
+    print(f"\n{'compared to baseline':<26}{'before':>12}{'after':>12}{'change':>10}")
+    rows = [("rps", baseline["rps"], results["rps"], -1)]
+    for key in ("p50", "p95", "p99", "max"):
+        rows.append((f"{key} ms", baseline["latency_ms"][key], results["latency_ms"][key], 1))
+    for label, before, after, direction in rows:
+        change = (after - before) / before * 100 if before else 0.0
+        flag = ""
+        if label in ("rps", "p95 ms", "p99 ms") and change * direction > threshold:
+            regressed = True
+            flag = "  REGRESSION"
+        print(f"{label:<26}{before:>12.3f}{after:>12.3f}{change:>+9.1f}%{flag}")
+    return regressed
+
+
+def print_results(results):
+    print(f"\n{'endpoint':<32}{'requests':>10}{'rps':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}")
+    rows = list(results["endpoints"].items()) + [("all", results)]
+    for name, summary in rows:
+        latency = summary["latency_ms"]
+        print(f"{name:<32}{summary['requests']:>10}{summary['rps']:>10.1f}{latency['p50']:>10.2f}"
+              f"{latency['p95']:>10.2f}{latency['p99']:>10.2f}{latency['max']:>10.2f}")
+    print(f"\nstatus codes: {results['status_codes']}")
+    if results["errors"]:
+        print(f"errors: {results['error_types']}")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--url", default="http://127.0.0.1:8000", help="API base URL")
+    parser.add_argument("--api-key", default=os.getenv("API_KEY"), help="X-API-Key (default: API_KEY)")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="'METHOD /path=weight,...'")
+    parser.add_argument("--ids", default="1-1000", help="range substituted for {id}")
+    parser.add_argument("--concurrency", type=int, default=32, help="connections")
+    parser.add_argument("--duration", type=float, default=30.0, help="measured seconds")
+    parser.add_argument("--warmup", type=float, default=3.0, help="unmeasured seconds first")
+    parser.add_argument("--rate", type=float, default=0.0, help="fixed requests/s (open loop)")
+    parser.add_argument("--output", help="save results as JSON here")
+    parser.add_argument("--compare", help="JSON results of an earlier run")
+    parser.add_argument("--threshold", type=float, default=10.0, help="allowed regression in percent")
+    parser.add_argument("--stub", action="store_true", help="test against a built-in stand-in server")
+    args = parser.parse_args()
+
+    low, _, high = args.ids.partition("-")
+    ids = (int(low), int(high or low))
+    endpoints = parse_mix(args.mix)
+
+    server = None
+    url = args.url
+    if args.stub:
+        server = await run_stub_server(0)
+        url = f"http://127.0.0.1:{server.sockets[0].getsockname()[1]}"
+
+    test = LoadTest(url, endpoints, args.concurrency, args.duration, args.warmup,
+                    args.rate, ids, args.api_key)
+    print(f"{url}: {args.concurrency} connections, {args.warmup}s warm-up + {args.duration}s"
+          + (f" at {args.rate} req/s" if args.rate else ""))
+    results = await test.run()
+
+    if server is not None:
+        server.close()
+        await server.wait_closed()
+
+    print_results(results)
+    report = {
+        "started_at": datetime.now(timezone.utc).isoformat(),
+        "config": {
+            "url": url, "mix": args.mix, "ids": args.ids, "concurrency": args.concurrency,
+            "duration": args.duration, "warmup": args.warmup, "rate": args.rate, "stub": args.stub
+        },
+        **results
+    }
+    if args.output:
+        with open(args.output, "w") as output_file:
+            json.dump(report, output_file, indent=2)
+        print(f"saved {args.output}")
+
+    if args.compare:
+        with open(args.compare) as baseline_file:
+            if compare(json.load(baseline_file), results, args.threshold):
+                sys.exit(1)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -3,43 +3,303 @@ FastAPI Application - Web API Service
 Main application file with API endpoints
 """
 
-from fastapi import FastAPI, HTTPException, Depends, Header
-from fastapi.responses import JSONResponse
-from typing import List, Optional
+from fastapi import FastAPI, HTTPException, Depends, Header, Query, Request, Response
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from typing import List, Literal, Optional
+from datetime import datetime
+from contextlib import asynccontextmanager
+import asyncio
+import math
 import os
-from dotenv import load_dotenv
+import signal
+import time
 
-from app.database import get_db_connection, close_db_connection
-from app.models import Item
+from app.database import statements, slow_queries
+from app.async_database import executor_stats
+from app.repository import VersionConflict, repository
+from app.auth import key_store, rate_limiter
+from app.cache import item_cache, InvalidationListener
+from app.health import health_monitor
+from app.analytics import stats_folder, summarize, histogram
+from app.write_behind import WriteBacklogFull, quantity_writer
+from app.replicas import ReadRoutingMiddleware, replica_router
+from app.metrics import metrics, MetricsMiddleware
+from app.compression import CompressionMiddleware, compression_settings
+from app.models import (
+    Item, ItemBase, ItemBatchRequest, ItemBatchResponse, BulkInsertResponse, InventorySummary, PriceHistogram,
+    QuantityDelta, QuantityUpdateResponse
+)
+from app.bulk import BulkFormatError, iter_json_array, iter_ndjson, validate_row
+from app.conditional import (
+    item_etag, collection_etag, if_match_versions, is_not_modified, not_modified, set_validators
+)
+from app.queries import (
+    ITEM_COLUMNS, LOCK_ITEMS_BY_IDS, LOW_STOCK_THRESHOLD, SELECT_INVENTORY_STATS, SELECT_ITEM_BY_ID,
+    SELECT_ITEMS_BY_IDS, SELECT_ITEMS_VERSION, SELECT_LOW_STOCK_ITEMS, UPDATE_ITEM, UPDATE_ITEM_IF_VERSION,
+    UPDATE_ITEM_QUANTITY, build_items_query
+)
+from app.serialization import RowEncoder
+
+# STARTUP_WARMUP=0 serves without warming up first (see benchmark_startup)
+STARTUP_WARMUP = os.getenv('STARTUP_WARMUP', '1') != '0'
+
+# GET requests read from DATABASE_REPLICA_URLS (PostgreSQL backend only)
+READ_REPLICAS = replica_router.enabled and repository.name == "postgres"
+
+# Worker processes sharing the database (set by the launcher; 0 = unknown)
+WEB_WORKERS = int(os.getenv('WEB_WORKERS', '0'))
+
+# Seconds spent in each startup step of this worker, for /stats
+startup_stats = {}
+
+# Background listener that drops cached items when their rows change
+cache_listener = None
+
+
+# Requests replayed in-process during warm-up, one pass per warmed connection
+WARMUP_REQUESTS = [
+    ("GET", "/items/0", b""),
+    ("GET", "/items?limit=1", b""),
+    ("GET", "/items?limit=1&after_id=0", b""),
+    ("POST", "/items/batch", b'{"ids": [0]}'),
+    ("GET", "/analytics/summary", b""),
+    ("GET", "/analytics/price-histogram", b""),
+    ("GET", "/analytics/low-stock?limit=1", b""),
+    ("GET", "/health/ready", b"")
+]
+
+
+async def _replay(app, method, target, body):
+    """Send one request straight to the router, skipping the middleware"""
+    path, _, query = target.partition("?")
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1",
+        "method": method, "scheme": "http", "path": path, "raw_path": path.encode(),
+        "query_string": query.encode(), "root_path": "", "app": app,
+        "headers": [(b"host", b"warm-up"), (b"content-type", b"application/json")],
+        "client": ("127.0.0.1", 0), "server": ("127.0.0.1", 0)
+    }
+    sent = False
+
+    async def receive():
+        nonlocal sent
+        if sent:
+            return {"type": "http.disconnect"}
+        sent = True
+        return {"type": "http.request", "body": body, "more_body": False}
+
+    async def send(message):
+        pass
+
+    try:
+        await app.router(scope, receive, send)
+    except HTTPException:
+        # e.g. 404 for the made-up item ID; the query still ran
+        pass
+
+
+async def warm_up(app):
+    """
+    Do the work a first request would otherwise pay for
+    
+    Opens the repository's connections (for PostgreSQL, DB_POOL_MIN_SIZE
+    of them in parallel with every registered statement prepared), runs the first health check so readiness
+    is known at once and builds the OpenAPI schema. Then WARMUP_REQUESTS
+    are replayed through the router, which plans each hot statement and
+    fills the server's catalog caches on every warmed connection, and
+    runs dependency resolution, validation and encoding once per route.
+    
+    Args:
+        app: Application being started
+        
+    Returns:
+        dict: Seconds spent on each step
+    """
+    timings = {}
+    
+    start = time.perf_counter()
+    connections = await repository.warm_up()
+    await health_monitor.check()
+    timings["connections"] = connections
+    timings["pool_seconds"] = time.perf_counter() - start
+    
+    start = time.perf_counter()
+    app.openapi()
+    timings["schema_seconds"] = time.perf_counter() - start
+    
+    # Warm-up requests skip the API key check (and its rate limit)
+    start = time.perf_counter()
+    app.dependency_overrides[verify_api_key] = lambda: "warm-up"
+    try:
+        async def replay_all():
+            for method, target, body in WARMUP_REQUESTS:
+                await _replay(app, method, target, body)
+        await asyncio.gather(*(replay_all() for _ in range(max(1, connections))))
+    finally:
+        del app.dependency_overrides[verify_api_key]
+    timings["requests_seconds"] = time.perf_counter() - start
+    return timings
+
+
+@asynccontextmanager
+async def lifespan(app):
+    """
+    Worker startup and shutdown
+    
+    uvicorn runs everything before the yield ahead of accepting
+    connections (and the launcher only retires an old worker once its
+    replacement got this far), so no request waits for warm-up.
+    """
+    global cache_listener
+    start = time.perf_counter()
+    try:
+        if STARTUP_WARMUP:
+            startup_stats.update(await warm_up(app))
+        else:
+            await repository.open()
+    except Exception as e:
+        print(f"Database connection error: {e}")
+    startup_stats["total_seconds"] = time.perf_counter() - start
+
+    # Measure replica lag before the first request, then keep it current
+    if READ_REPLICAS:
+        await replica_router.check()
+        replica_router.start()
+    elif replica_router.enabled:
+        print("DATABASE_REPLICA_URLS ignored: read replicas need the PostgreSQL backend")
+
+    # Check the database in the background; probes read the cached result
+    health_monitor.start()
+    metrics.start()
+
+    # Keep the inventory aggregates' pending deltas short
+    stats_folder.start()
+
+    # Write buffered quantity changes every QUANTITY_FLUSH_INTERVAL
+    quantity_writer.start()
+
+    if item_cache.enabled and repository.notifies_changes:
+        cache_listener = InvalidationListener(item_cache, os.getenv('DATABASE_URL'))
+        cache_listener.start()
+    elif item_cache.enabled and WEB_WORKERS > 1:
+        # Nothing would tell this worker about another worker's writes, so
+        # it would serve their old row, version and ETag until the TTL
+        item_cache.max_size = 0
+        item_cache.clear()
+        print(f"Item cache disabled: {repository.name} has no change notifications "
+              f"and {WEB_WORKERS} workers share it")
+
+    # kill -HUP <pid> reloads API keys without a restart
+    try:
+        asyncio.get_running_loop().add_signal_handler(signal.SIGHUP, key_store.reload)
+    except (NotImplementedError, RuntimeError):
+        pass
+
+    yield
+
+    # Write buffered quantity changes while the database is still open
+    await quantity_writer.stop()
+
+    # Close pooled database connections when the worker stops
+    await health_monitor.stop()
+    await stats_folder.stop()
+    await metrics.stop()
+    if cache_listener is not None:
+        cache_listener.stop()
+    await replica_router.stop()
+    await repository.close()
 
-# Load environment variables
-load_dotenv()
 
 # Create FastAPI app instance
 app = FastAPI(
     title="Item Management API",
     description="Simple REST API for managing items with PostgreSQL",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
+# gzip / brotli for responses over COMPRESSION_MIN_SIZE, applied per chunk
+if os.getenv('COMPRESSION', '1') != '0':
+    app.add_middleware(CompressionMiddleware, **compression_settings())
+
+# Request counts and latency per route, for GET /metrics
+app.add_middleware(MetricsMiddleware, registry=metrics)
+
+# Reads of GET requests go to replicas within REPLICA_MAX_LAG; cached items
+# wait out the replicas' staleness after an invalidation
+if READ_REPLICAS:
+    app.add_middleware(ReadRoutingMiddleware)
+    item_cache.settle = replica_router.max_staleness
+
+
+def collect_runtime_metrics(registry):
+    """Copy pool and cache counters into the metrics registry"""
+    pool = repository.pool_stats()
+    registry.set("db_pool_connections", (("state", "in_use"),), pool["in_use"])
+    registry.set("db_pool_connections", (("state", "idle"),), pool["idle"])
+    registry.set("db_pool_max_connections", value=pool["max_size"])
+    registry.set("db_pool_timeouts_total", value=pool["timeouts"])
+    cache = item_cache.stats()
+    registry.set("item_cache_hits_total", value=cache["hits"])
+    registry.set("item_cache_misses_total", value=cache["misses"])
+    if READ_REPLICAS:
+        for replica in replica_router.replicas:
+            lag = replica.lag_now()
+            registry.set("db_replica_available", (("replica", replica.name),), 1 if lag is not None else 0)
+            if lag is not None:
+                registry.set("db_replica_lag_seconds", (("replica", replica.name),), lag)
+
+
+metrics.add_collector(collect_runtime_metrics)
+
+# Hot queries, prepared once per pooled connection; read_only ones may be
+# re-run under EXPLAIN ANALYZE by the slow query log
+statements.register("item_by_id", SELECT_ITEM_BY_ID, read_only=True)
+statements.register("items_by_ids", SELECT_ITEMS_BY_IDS, read_only=True)
+statements.register("items_version", SELECT_ITEMS_VERSION, read_only=True)
+statements.register("items_all", build_items_query()[0], read_only=True)
+statements.register("items_first_page", build_items_query(limit=1)[0], read_only=True)
+statements.register("items_next_page", build_items_query(after_id=0, limit=1)[0], read_only=True)
+statements.register("inventory_stats", SELECT_INVENTORY_STATS, read_only=True)
+statements.register("low_stock_items", SELECT_LOW_STOCK_ITEMS, read_only=True)
+statements.register("update_item", UPDATE_ITEM)
+statements.register("update_item_if_version", UPDATE_ITEM_IF_VERSION)
+statements.register("update_item_quantity", UPDATE_ITEM_QUANTITY)
+statements.register("lock_items_by_ids", LOCK_ITEMS_BY_IDS)
+
+# Encodes tuple rows exactly like response_model=Item would
+item_encoder = RowEncoder(Item, ITEM_COLUMNS)
+
 # API Key Authentication
 async def verify_api_key(x_api_key: str = Header(...)):
     """
-    Verify API Key from request header
+    Verify API Key from request header and apply its rate limit
     
     Args:
         x_api_key: API key from X-API-Key header
         
+    Returns:
+        str: Name of the matching key
+        
     Raises:
-        HTTPException: If API key is invalid
+        HTTPException: 403 if API key is invalid, 429 if the key has
+            used up its rate limit
     """
-    expected_key = os.getenv('API_KEY')
-    if x_api_key != expected_key:
+    api_key = key_store.verify(x_api_key)
+    if api_key is None:
         raise HTTPException(
             status_code=403,
             detail="Invalid API Key"
         )
-    return x_api_key
+    
+    allowed, retry_after = rate_limiter.acquire(api_key)
+    if not allowed:
+        raise HTTPException(
+            status_code=429,
+            detail="Rate limit exceeded",
+            headers={"Retry-After": str(max(1, math.ceil(retry_after)))}
+        )
+    return api_key.name
 
 
 @app.get("/")
@@ -55,65 +315,190 @@ async def root():
         "version": "1.0.0",
         "endpoints": {
             "GET /": "API information",
-            "GET /items": "Get all items (requires API key)",
+            "GET /health/live": "Liveness probe (no I/O)",
+            "GET /health/ready": "Readiness probe from the cached database status",
+            "GET /items": "Get all items, filtered, paginated with limit/after_id or streamed with stream=true (requires API key)",
+            "GET /items/export": "Download every item as CSV or NDJSON, streamed with COPY (requires API key)",
             "GET /items/{id}": "Get item by ID (requires API key)",
+            "PUT /items/{id}": "Replace an item's fields if its ETag still matches If-Match (requires API key)",
+            "PATCH /items/{id}/quantity": "Add to or take from an item's quantity, written in batches (requires API key)",
+            "POST /items/batch": "Get many items by ID in one request (requires API key)",
+            "POST /items/bulk": "Insert many items from a JSON array or NDJSON upload (requires API key)",
+            "GET /analytics/summary": "Inventory totals from incrementally maintained aggregates (requires API key)",
+            "GET /analytics/price-histogram": "Item counts and value per price range (requires API key)",
+            "GET /analytics/low-stock": "Items running out, lowest quantity first (requires API key)",
+            "GET /debug/slow-queries": "Recent slow or failed queries with their plans (requires API key)",
+            "GET /metrics": "Prometheus metrics for all workers",
+            "GET /stats": "Connection pool, replica, cache and prepared statement statistics (requires API key)",
             "GET /docs": "API documentation (Swagger UI)"
         }
     }
 
 
+def item_filters(
+    name_prefix: Optional[str] = Query(None, max_length=100, description="Items whose name starts with this (case-sensitive)"),
+    name_contains: Optional[str] = Query(None, max_length=100, description="Items whose name contains this (case-insensitive)"),
+    created_after: Optional[datetime] = Query(None, description="Created at or after this time"),
+    created_before: Optional[datetime] = Query(None, description="Created before this time"),
+    min_price: Optional[float] = Query(None, ge=0, description="Minimum price (inclusive)"),
+    max_price: Optional[float] = Query(None, ge=0, description="Maximum price (inclusive)"),
+    min_quantity: Optional[int] = Query(None, ge=0, description="Minimum quantity (inclusive)"),
+    max_quantity: Optional[int] = Query(None, ge=0, description="Maximum quantity (inclusive)")
+):
+    """
+    Collect the optional GET /items filters
+    
+    Returns:
+        dict: Filters that were given (see queries.build_items_query)
+    """
+    filters = {
+        "name_prefix": name_prefix,
+        "name_contains": name_contains,
+        "created_after": created_after,
+        "created_before": created_before,
+        "min_price": min_price,
+        "max_price": max_price,
+        "min_quantity": min_quantity,
+        "max_quantity": max_quantity
+    }
+    return {key: value for key, value in filters.items() if value is not None}
+
+
 @app.get("/items", response_model=List[Item])
-async def get_items(api_key: str = Depends(verify_api_key)):
+async def get_items(
+    request: Request,
+    limit: Optional[int] = Query(None, ge=1, le=10000, description="Maximum number of items to return"),
+    after_id: Optional[int] = Query(None, description="Return items with an ID greater than this (keyset pagination)"),
+    stream: bool = Query(False, description="Stream items as NDJSON from a server-side cursor"),
+    filters: dict = Depends(item_filters),
+    api_key: str = Depends(verify_api_key)
+):
     """
-    Get all items from database
+    Get items from database, ordered by ID
+    
+    Without limit every item is returned. With limit, pass the
+    X-Next-After-Id response header back as after_id to get the next page.
+    A matching If-None-Match is answered with 304 before any row is read.
+    
+    Rows are fetched as tuples and encoded straight to JSON bytes;
+    response_model is kept for the OpenAPI schema only.
     
     Args:
+        request: Incoming request (conditional headers)
+        limit: Maximum number of items to return
+        after_id: Return items with an ID greater than this
+        stream: Stream items as newline-delimited JSON
+        filters: Name, creation time, price and quantity filters
         api_key: Verified API key from dependency
         
     Returns:
-        List[Item]: List of all items
+        List[Item]: List of items
         
     Raises:
         HTTPException: If database error occurs
     """
-    connection = None
     try:
-        # Connect to database
-        connection = get_db_connection()
-        cursor = connection.cursor()
-        
-        # Execute query
-        cursor.execute("""
-            SELECT id, name, description, price, quantity, created_at
-            FROM items
-            ORDER BY id
-        """)
-        
-        # Fetch all results
-        items = cursor.fetchall()
+        # Check the table version first so unchanged lists cost one tiny query
+        version = await repository.items_version()
+        etag = collection_etag(version["version"], limit, after_id, stream, sorted(filters.items()))
+        last_modified = version["last_modified"]
+        if is_not_modified(request, etag, last_modified):
+            return not_modified(etag, last_modified)
+
+        if stream:
+            streamed = StreamingResponse(
+                (item_encoder.encode_ndjson(rows) async for rows in repository.stream_items(after_id, limit, filters)),
+                media_type="application/x-ndjson"
+            )
+            set_validators(streamed, etag, last_modified)
+            return streamed
+
+        # Execute query on a database thread
+        rows = await repository.list_items(after_id, limit, filters)
+        encoded = Response(content=item_encoder.encode_list(rows), media_type="application/json")
+        set_validators(encoded, etag, last_modified)
         
-        # Close cursor
-        cursor.close()
+        # Tell the client where the next page starts
+        if limit is not None and len(rows) == limit:
+            encoded.headers["X-Next-After-Id"] = str(rows[-1][0])
         
-        return items
+        return encoded
         
     except Exception as e:
         raise HTTPException(
             status_code=500,
             detail=f"Database error: {str(e)}"
         )
-    finally:
-        if connection:
-            close_db_connection(connection)
+
+
+# Content types of GET /items/export
+EXPORT_MEDIA_TYPES = {"csv": "text/csv", "ndjson": "application/x-ndjson"}
+
+
+@app.get("/items/export")
+async def export_items(
+    request: Request,
+    format: Literal["csv", "ndjson"] = Query("csv", description="csv (with a header line) or ndjson"),
+    filters: dict = Depends(item_filters),
+    api_key: str = Depends(verify_api_key)
+):
+    """
+    Download every item (or every filtered item), ordered by ID
+
+    The rows are encoded by the database (COPY ... TO STDOUT on
+    PostgreSQL) and streamed to the client in chunks as they arrive, with
+    a small bounded buffer in between. Memory use stays the same at any
+    table size and no per-row Python objects are built.
+
+    Args:
+        request: Incoming request (conditional headers)
+        format: Output format
+        filters: Same filters as GET /items
+        api_key: Verified API key from dependency
+
+    Returns:
+        StreamingResponse: The export as an attachment
+
+    Raises:
+        HTTPException: If database error occurs
+    """
+    try:
+        version = await repository.items_version()
+        etag = collection_etag(version["version"], "export", format, sorted(filters.items()))
+        last_modified = version["last_modified"]
+        if is_not_modified(request, etag, last_modified):
+            return not_modified(etag, last_modified)
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Database error: {str(e)}"
+        )
+
+    exported = StreamingResponse(
+        repository.export_items(format, filters),
+        media_type=EXPORT_MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="items.{format}"'}
+    )
+    set_validators(exported, etag, last_modified)
+    return exported
 
 
 @app.get("/items/{item_id}", response_model=Item)
-async def get_item(item_id: int, api_key: str = Depends(verify_api_key)):
+async def get_item(
+    item_id: int,
+    request: Request,
+    response: Response,
+    api_key: str = Depends(verify_api_key)
+):
     """
     Get a specific item by ID
     
+    Responds 304 without a body when If-None-Match matches the item's ETag.
+    
     Args:
         item_id: Item ID to retrieve
+        request: Incoming request (conditional headers)
+        response: Response used to set validator headers
         api_key: Verified API key from dependency
         
     Returns:
@@ -122,34 +507,103 @@ async def get_item(item_id: int, api_key: str = Depends(verify_api_key)):
     Raises:
         HTTPException: If item not found or database error
     """
-    connection = None
+    # Serve hot items from the in-process cache
+    item = item_cache.get(item_id)
+
     try:
-        # Connect to database
-        connection = get_db_connection()
-        cursor = connection.cursor()
+        if item is None:
+            # Execute query on a database thread
+            generation = item_cache.generation()
+            item = await repository.get_item(item_id)
+            
+            # Check if item exists
+            if not item:
+                raise HTTPException(
+                    status_code=404,
+                    detail=f"Item with ID {item_id} not found"
+                )
+            
+            item_cache.set(item_id, item, generation)
         
-        # Execute query
-        cursor.execute("""
-            SELECT id, name, description, price, quantity, created_at
-            FROM items
-            WHERE id = %s
-        """, (item_id,))
+        # Skip serialization entirely if the client copy is current
+        etag = item_etag(item)
+        if is_not_modified(request, etag, item["updated_at"]):
+            return not_modified(etag, item["updated_at"])
         
-        # Fetch result
-        item = cursor.fetchone()
-        
-        # Close cursor
-        cursor.close()
+        set_validators(response, etag, item["updated_at"])
+        return item
         
-        # Check if item exists
-        if not item:
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Database error: {str(e)}"
+        )
+
+
+@app.put("/items/{item_id}", response_model=Item)
+async def update_item(
+    item_id: int,
+    item: ItemBase,
+    request: Request,
+    response: Response,
+    api_key: str = Depends(verify_api_key)
+):
+    """
+    Replace an item's fields, unless someone else changed it first
+
+    Optimistic concurrency: send the ETag from GET /items/{id} as If-Match.
+    The UPDATE only matches while the row is still at that version, so
+    concurrent editors never wait on each other's locks; the one that
+    loses gets 412 with the current ETag and can re-read and retry.
+    If-Match: * overwrites whatever version is there.
+
+    Args:
+        item_id: Item to update
+        item: New field values
+        request: Incoming request (If-Match)
+        response: Response used to set validator headers
+        api_key: Verified API key from dependency
+
+    Returns:
+        Item: The updated item, with its new version
+
+    Raises:
+        HTTPException: 428 without If-Match, 404 for unknown items, 412 if
+            the item is at another version, 500 on database errors
+    """
+    versions = if_match_versions(request, item_id)
+    if versions is None:
+        metrics.inc("item_updates_total", (("outcome", "precondition_required"),))
+        raise HTTPException(
+            status_code=428,
+            detail="Send If-Match with the item's ETag from GET /items/{id} (or If-Match: * to overwrite any version)"
+        )
+
+    try:
+        try:
+            updated = await repository.update_item(item_id, item, None if versions == "*" else versions)
+        except VersionConflict as e:
+            metrics.inc("item_updates_total", (("outcome", "conflict"),))
+            raise HTTPException(
+                status_code=412,
+                detail=f"Item {item_id} was changed by someone else (now at version {e.current['version']})",
+                headers={"ETag": item_etag(e.current)}
+            )
+
+        if updated is None:
+            metrics.inc("item_updates_total", (("outcome", "not_found"),))
             raise HTTPException(
                 status_code=404,
                 detail=f"Item with ID {item_id} not found"
             )
-        
-        return item
-        
+
+        metrics.inc("item_updates_total", (("outcome", "applied"),))
+        item_cache.invalidate(item_id)
+        set_validators(response, item_etag(updated), updated["updated_at"])
+        return updated
+
     except HTTPException:
         raise
     except Exception as e:
@@ -157,40 +611,440 @@ async def get_item(item_id: int, api_key: str = Depends(verify_api_key)):
             status_code=500,
             detail=f"Database error: {str(e)}"
         )
-    finally:
-        if connection:
-            close_db_connection(connection)
+
+
+@app.patch("/items/{item_id}/quantity", response_model=QuantityUpdateResponse)
+async def update_item_quantity(
+    item_id: int,
+    change: QuantityDelta,
+    response: Response,
+    wait: bool = Query(False, description="Answer after the change is written, with its outcome"),
+    api_key: str = Depends(verify_api_key)
+):
+    """
+    Add delta to an item's quantity (negative to take stock)
+
+    Changes are buffered and written with everyone else's in one statement
+    per flush (QUANTITY_FLUSH_INTERVAL), so by default the answer is 202
+    with the change pending. A change that would drop the quantity below
+    zero is rejected when it is written; pass wait=true to wait for the
+    flush and get 200 with the new quantity or 409.
+
+    Args:
+        item_id: Item to change
+        change: Request body with the delta
+        response: Response used to set the status code
+        wait: Wait for the write and report its outcome
+        api_key: Verified API key from dependency
+
+    Returns:
+        QuantityUpdateResponse: Pending change, or the applied quantity
+
+    Raises:
+        HTTPException: 404 for unknown items, 409 if rejected, 503 if the
+            buffer is full, 500 on database errors
+    """
+    try:
+        if item_cache.get(item_id) is None and await repository.get_item(item_id) is None:
+            raise HTTPException(
+                status_code=404,
+                detail=f"Item with ID {item_id} not found"
+            )
+
+        if quantity_writer.enabled:
+            future = quantity_writer.add(item_id, change.delta, wait)
+            if not wait:
+                response.status_code = 202
+                return {"id": item_id, "delta": change.delta, "status": "pending",
+                        "pending_delta": quantity_writer.pending(item_id)}
+            quantity = await future
+        else:
+            quantity = await quantity_writer.apply(item_id, change.delta)
+
+        if quantity is None:
+            raise HTTPException(
+                status_code=409,
+                detail=f"Quantity of item {item_id} cannot change by {change.delta}: it would drop below zero (or overflow)"
+            )
+        return {"id": item_id, "delta": change.delta, "status": "applied", "quantity": quantity}
+
+    except HTTPException:
+        raise
+    except WriteBacklogFull as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Database error: {str(e)}"
+        )
+
+
+@app.post("/items/batch", response_model=ItemBatchResponse)
+async def get_items_batch(batch: ItemBatchRequest, api_key: str = Depends(verify_api_key)):
+    """
+    Get several items by ID with a single query
+    
+    Cached items are served from memory; the rest are fetched together
+    with WHERE id = ANY(...). Duplicate IDs are returned once.
+    
+    Args:
+        batch: Requested item IDs
+        api_key: Verified API key from dependency
+        
+    Returns:
+        ItemBatchResponse: Found items in request order and missing IDs
+        
+    Raises:
+        HTTPException: If database error occurs
+    """
+    ids = list(dict.fromkeys(batch.ids))
+    
+    # Take what we can from the cache
+    found = {}
+    for item_id in ids:
+        item = item_cache.get(item_id)
+        if item is not None:
+            found[item_id] = item
+    
+    wanted = [item_id for item_id in ids if item_id not in found]
+    if wanted:
+        try:
+            # One round trip for all remaining IDs
+            generation = item_cache.generation()
+            rows = await repository.get_items(wanted)
+        except Exception as e:
+            raise HTTPException(
+                status_code=500,
+                detail=f"Database error: {str(e)}"
+            )
+        for row in rows:
+            found[row["id"]] = row
+            item_cache.set(row["id"], row, generation)
+    
+    return {
+        "items": [found[item_id] for item_id in ids if item_id in found],
+        "missing": [item_id for item_id in ids if item_id not in found]
+    }
+
+
+# Rows per COPY round trip during bulk uploads
+BULK_BATCH_ROWS = int(os.getenv('BULK_BATCH_ROWS', '5000'))
+
+# Rejected rows listed in a bulk response
+BULK_MAX_ERRORS = 100
+
+
+@app.post(
+    "/items/bulk",
+    response_model=BulkInsertResponse,
+    openapi_extra={
+        "requestBody": {
+            "required": True,
+            "content": {
+                "application/json": {"schema": {"type": "array", "items": {"$ref": "#/components/schemas/ItemBase"}}},
+                "application/x-ndjson": {"schema": {"$ref": "#/components/schemas/ItemBase"}}
+            }
+        }
+    }
+)
+async def bulk_insert_items(
+    request: Request,
+    atomic: bool = Query(False, description="Insert nothing if any row fails validation"),
+    api_key: str = Depends(verify_api_key)
+):
+    """
+    Insert many items from a JSON array or NDJSON upload
+    
+    The body is parsed and validated as it arrives, and valid rows are
+    written with COPY FROM STDIN in batches, all inside one transaction.
+    Invalid rows are skipped and reported (or, with atomic=true, abort
+    the whole upload).
+    
+    Args:
+        request: Incoming request with the upload body
+        atomic: Roll back everything if any row is invalid
+        api_key: Verified API key from dependency
+        
+    Returns:
+        BulkInsertResponse: Counts, rejected rows and throughput
+        
+    Raises:
+        HTTPException: 415 for unsupported content, 400 for malformed
+            JSON, 500 if database error occurs
+    """
+    content_type = request.headers.get("content-type", "").split(";")[0].strip().lower()
+    if content_type == "application/json":
+        records = iter_json_array(request.stream())
+    elif content_type in ("application/x-ndjson", "application/jsonl", "application/json-seq"):
+        records = iter_ndjson(request.stream())
+    else:
+        raise HTTPException(
+            status_code=415,
+            detail="Send application/json (array) or application/x-ndjson"
+        )
+
+    start = time.perf_counter()
+    received = inserted = failed = 0
+    errors = []
+    batch = []
+
+    try:
+        async with repository.bulk_writer() as writer:
+            async for value, parse_error in records:
+                index = received
+                received += 1
+                
+                # Validate each row as soon as it is parsed
+                item, row_errors = (None, [parse_error]) if parse_error else validate_row(value)
+                if row_errors:
+                    failed += 1
+                    if len(errors) < BULK_MAX_ERRORS:
+                        errors.append({"index": index, "errors": row_errors})
+                    continue
+                
+                if failed and atomic:
+                    continue
+                batch.append(item)
+                if len(batch) >= BULK_BATCH_ROWS:
+                    inserted += await writer.insert(batch)
+                    batch = []
+            
+            if failed and atomic:
+                # Nothing is committed; the writer rolls back on exit
+                inserted = 0
+            else:
+                if batch:
+                    inserted += await writer.insert(batch)
+                await writer.commit()
+    
+    except BulkFormatError as e:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Malformed upload after {received} rows: {str(e)}"
+        )
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Database error: {str(e)}"
+        )
+
+    seconds = time.perf_counter() - start
+    return {
+        "received": received,
+        "inserted": inserted,
+        "failed": failed,
+        "errors": errors,
+        "errors_truncated": failed > len(errors),
+        "seconds": round(seconds, 6),
+        "rows_per_second": round(inserted / seconds, 1) if seconds > 0 else 0.0
+    }
+
+
+@app.get("/analytics/summary", response_model=InventorySummary)
+async def get_inventory_summary(api_key: str = Depends(verify_api_key)):
+    """
+    Inventory totals: item count, quantity, value and low stock count
+    
+    Read from the per price bucket aggregates that triggers maintain, so
+    the cost does not grow with the number of items.
+    
+    Args:
+        api_key: Verified API key from dependency
+        
+    Returns:
+        InventorySummary: Totals over every item
+        
+    Raises:
+        HTTPException: If database error occurs
+    """
+    try:
+        rows = await repository.inventory_stats()
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Database error: {str(e)}"
+        )
+    return summarize(rows)
+
+
+@app.get("/analytics/price-histogram", response_model=PriceHistogram)
+async def get_price_histogram(api_key: str = Depends(verify_api_key)):
+    """
+    Item count, quantity and value per price range
+    
+    Args:
+        api_key: Verified API key from dependency
+        
+    Returns:
+        PriceHistogram: Every price bucket, empty ones included
+        
+    Raises:
+        HTTPException: If database error occurs
+    """
+    try:
+        edges = await repository.price_bucket_edges()
+        rows = await repository.inventory_stats()
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Database error: {str(e)}"
+        )
+    return {"buckets": histogram(rows, edges)}
+
+
+@app.get("/analytics/low-stock", response_model=List[Item])
+async def get_low_stock_items(
+    threshold: int = Query(LOW_STOCK_THRESHOLD, ge=1, le=LOW_STOCK_THRESHOLD, description="List items with quantity below this"),
+    limit: int = Query(100, ge=1, le=1000, description="Maximum number of items to return"),
+    api_key: str = Depends(verify_api_key)
+):
+    """
+    Items with little stock left, lowest quantity first
+    
+    Served from a partial index over low-stock rows only, so it stays
+    small and the query never scans the whole table.
+    
+    Args:
+        threshold: Quantity below which an item is listed
+        limit: Maximum number of items to return
+        api_key: Verified API key from dependency
+        
+    Returns:
+        List[Item]: Low stock items ordered by quantity, then ID
+        
+    Raises:
+        HTTPException: If database error occurs
+    """
+    try:
+        # Execute query on a database thread
+        rows = await repository.low_stock_items(threshold, limit)
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Database error: {str(e)}"
+        )
+    return Response(content=item_encoder.encode_list(rows), media_type="application/json")
+
+
+@app.get("/health/live")
+async def liveness_check():
+    """
+    Liveness probe: the worker is up and its event loop is responding
+    
+    Does no I/O, so a slow or unavailable database never gets the
+    process restarted.
+    
+    Returns:
+        dict: Liveness status
+    """
+    return {"status": "alive"}
+
+
+@app.get("/health/ready")
+async def readiness_check():
+    """
+    Readiness probe: the worker can reach the database
+    
+    Served from the status cached by the background health monitor, so
+    probes never open connections or run queries themselves.
+    
+    Returns:
+        dict: Last database check (latency, age) and pool saturation;
+            status 503 if the last check failed or is stale
+    """
+    status = health_monitor.status()
+    return JSONResponse(
+        status_code=200 if status["status"] == "ready" else 503,
+        content=status
+    )
 
 
 @app.get("/health")
 async def health_check():
     """
-    Health check endpoint
+    Health check endpoint (kept for existing clients)
+    
+    Reports the cached database status in the original format; use
+    /health/live and /health/ready for probes.
     
     Returns:
         dict: Health status
     """
-    connection = None
-    try:
-        # Test database connection
-        connection = get_db_connection()
-        cursor = connection.cursor()
-        cursor.execute("SELECT 1")
-        cursor.close()
-        
-        db_status = "healthy"
-    except:
-        db_status = "unhealthy"
-    finally:
-        if connection:
-            close_db_connection(connection)
+    db_status = "healthy" if health_monitor.is_ready() else "unhealthy"
     
     return {
-        "status": "healthy" if db_status == "healthy" else "unhealthy",
+        "status": db_status,
         "database": db_status
     }
 
 
+@app.get("/stats")
+async def get_stats(api_key: str = Depends(verify_api_key)):
+    """
+    Runtime statistics for this worker process
+    
+    Args:
+        api_key: Verified API key from dependency
+        
+    Returns:
+        dict: Connection pool usage (in use, idle, wait times)
+    """
+    return {
+        "pid": os.getpid(),
+        "backend": repository.name,
+        "pool": repository.pool_stats(),
+        "replicas": replica_router.stats() if READ_REPLICAS else None,
+        "health": health_monitor.status()["database"],
+        "analytics": stats_folder.stats(),
+        "startup": {key: round(value, 6) for key, value in startup_stats.items()},
+        "executor": executor_stats(),
+        "item_cache": item_cache.stats(),
+        "item_lookups": repository.item_lookups.stats(),
+        "quantity_writer": quantity_writer.stats(),
+        "statements": statements.stats(),
+        "slow_queries": slow_queries.stats()
+    }
+
+
+@app.get("/debug/slow-queries")
+async def get_slow_queries(
+    limit: int = Query(20, ge=1, le=1000, description="Maximum number of entries to return"),
+    api_key: str = Depends(verify_api_key)
+):
+    """
+    Recent slow or failed queries of the worker that answers
+    
+    Each entry has the query, its parameters, duration, the error if it
+    failed and, for sampled SELECTs, its EXPLAIN (ANALYZE, BUFFERS) plan.
+    
+    Args:
+        limit: Maximum number of entries to return
+        api_key: Verified API key from dependency
+        
+    Returns:
+        dict: Log settings and counters, and entries newest first
+    """
+    return {
+        "pid": os.getpid(),
+        **slow_queries.stats(),
+        "entries": slow_queries.entries(limit)
+    }
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    """
+    Prometheus metrics summed over every worker process
+    
+    Returns:
+        str: Metrics in the Prometheus text exposition format
+    """
+    return PlainTextResponse(
+        metrics.render(),
+        media_type="text/plain; version=0.0.4; charset=utf-8"
+    )
+
+
 # Error handlers
 @app.exception_handler(404)
 async def not_found_handler(request, exc):
@@ -211,5 +1065,6 @@ async def internal_error_handler(request, exc):
 
 
 if __name__ == "__main__":
-    import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+    # Size, tune and supervise workers the same way as in production
+    from app.launcher import main
+    main()
@@ -0,0 +1,386 @@
+"""
+Metrics Module
+In-process counters and histograms, exposed in the Prometheus text format
+and aggregated across uvicorn workers through per-process snapshot files
+"""
+
+import asyncio
+import bisect
+import fcntl
+import json
+import math
+import os
+import tempfile
+import threading
+import time
+
+# Latency buckets in seconds, shared by every histogram
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# name -> (type, help text)
+METRICS = {
+    "http_requests_total": ("counter", "HTTP requests by method, route and status"),
+    "http_request_duration_seconds": ("histogram", "HTTP request latency by method, route and status"),
+    "http_requests_in_flight": ("gauge", "HTTP requests being handled"),
+    "db_query_duration_seconds": ("histogram", "Time spent running database calls on a connection"),
+    "db_pool_wait_seconds": ("histogram", "Time spent waiting to borrow a pooled connection"),
+    "db_pool_connections": ("gauge", "Pooled connections by state (SQLite: read connections)"),
+    "db_pool_max_connections": ("gauge", "Upper bound on pooled connections (SQLite: SQLITE_READERS)"),
+    "db_pool_timeouts_total": ("counter", "Connection checkouts that timed out"),
+    "db_slow_queries_total": ("counter", "Queries slower than SLOW_QUERY_MS"),
+    "db_reads_total": ("counter", "Database reads made for GET requests, by the server sent to (primary, replicaN)"),
+    "db_replica_fallbacks_total": ("counter", "GET requests sent to the primary because no replica could take them, by reason"),
+    "db_replica_lag_seconds": ("gauge", "Replica replay lag at the last check, plus the time since"),
+    "db_replica_available": ("gauge", "1 if the replica answered its last check as a standby"),
+    "db_target_duration_seconds": ("histogram", "Database call time per server, connection checkout included"),
+    "db_target_errors_total": ("counter", "Failed database calls per server"),
+    "db_coalesced_calls_total": ("counter", "Lookups that shared an in-flight query instead of running their own"),
+    "quantity_changes_total": ("counter", "PATCH /items/{id}/quantity changes written, by outcome"),
+    "quantity_flush_duration_seconds": ("histogram", "Time to write one batch of buffered quantity changes"),
+    "item_updates_total": ("counter", "PUT /items/{id} requests, by outcome (applied, conflict, precondition_required, not_found)"),
+    "item_update_conflict_ratio": ("gauge", "PUT /items/{id} updates that lost to a concurrent edit (412) / updates applied or lost since start"),
+    "item_cache_hits_total": ("counter", "Item cache lookups answered from memory"),
+    "item_cache_misses_total": ("counter", "Item cache lookups that went to the database"),
+    "item_cache_hit_ratio": ("gauge", "Item cache hits / lookups since start"),
+    "metrics_workers": ("gauge", "Worker processes reporting metrics")
+}
+
+
+def _label_key(labels):
+    """Serialise labels (a tuple of name/value pairs) for a snapshot"""
+    return json.dumps(labels, separators=(",", ":"))
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labels, extra=None):
+    pairs = list(labels) + ([extra] if extra else [])
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+def _format_value(value):
+    if value == math.inf:
+        return "+Inf"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value)
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+class MetricsRegistry:
+    """
+    Metrics for one worker process
+
+    Updates take one lock and a couple of dictionary lookups. Each worker
+    writes its values to {directory}/{namespace}-metrics-{pid}.json every
+    flush_interval seconds (and just before rendering), and a scrape
+    answered by any worker sums the files of all workers. Counters and
+    histograms of exited workers are folded into an archive file so totals
+    never go backwards; their gauges are dropped.
+    """
+
+    def __init__(self, directory=None, namespace="item-api", flush_interval=1.0,
+                 buckets=DEFAULT_BUCKETS):
+        """
+        Args:
+            directory: Where snapshot files live (default /dev/shm)
+            namespace: File name prefix, to keep separate apps apart
+            flush_interval: Seconds between snapshot writes
+            buckets: Histogram bucket upper bounds in seconds
+        """
+        if directory is None:
+            directory = "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
+        self.directory = directory
+        self.namespace = namespace
+        self.flush_interval = flush_interval
+        self.buckets = tuple(buckets)
+        self._counters = {}
+        self._gauges = {}
+        self._histograms = {}
+        self._collectors = []
+        self._lock = threading.Lock()
+        self._task = None
+
+    def inc(self, name, labels=(), value=1):
+        """Add to a counter"""
+        key = (name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def set(self, name, labels=(), value=0):
+        """Set a gauge (or a counter kept elsewhere, e.g. by the pool)"""
+        with self._lock:
+            self._gauges[(name, labels)] = value
+
+    def add(self, name, labels=(), value=1):
+        """Add to (or subtract from) a gauge"""
+        key = (name, labels)
+        with self._lock:
+            self._gauges[key] = self._gauges.get(key, 0) + value
+
+    def observe(self, name, labels=(), value=0.0):
+        """Record one histogram sample"""
+        key = (name, labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                # Per-bucket counts (last is +Inf), then sum
+                histogram = self._histograms[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            histogram[index] += 1
+            histogram[-1] += value
+
+    def add_collector(self, collector):
+        """
+        Register a callable run before every snapshot
+
+        Args:
+            collector: Function taking this registry, used to copy values
+                kept elsewhere (pool, cache) into gauges and counters
+        """
+        self._collectors.append(collector)
+
+    def snapshot(self):
+        """
+        This process's current values
+
+        Returns:
+            dict: JSON-serialisable counters, gauges and histograms
+        """
+        for collector in self._collectors:
+            try:
+                collector(self)
+            except Exception as e:
+                print(f"Metrics collector error: {e}")
+        with self._lock:
+            counters, gauges = {}, {}
+            for (name, labels), value in self._counters.items():
+                counters.setdefault(name, {})[_label_key(labels)] = value
+            for (name, labels), value in self._gauges.items():
+                target = counters if METRICS[name][0] == "counter" else gauges
+                target.setdefault(name, {})[_label_key(labels)] = value
+            histograms = {}
+            for (name, labels), values in self._histograms.items():
+                histograms.setdefault(name, {})[_label_key(labels)] = list(values)
+        return {"pid": os.getpid(), "counters": counters, "gauges": gauges, "histograms": histograms}
+
+    def _path(self, name):
+        return os.path.join(self.directory, f"{self.namespace}-metrics-{name}.json")
+
+    def _write(self, path, data):
+        temporary = f"{path}.{os.getpid()}.tmp"
+        with open(temporary, "w") as snapshot_file:
+            json.dump(data, snapshot_file, separators=(",", ":"))
+        os.replace(temporary, path)
+
+    def flush(self):
+        """Write this process's snapshot file"""
+        try:
+            self._write(self._path(os.getpid()), self.snapshot())
+        except OSError as e:
+            print(f"Metrics flush error: {e}")
+
+    def _read_all(self):
+        """Load every worker snapshot, archiving those of exited workers"""
+        archive_path = self._path("archive")
+        prefix = f"{self.namespace}-metrics-"
+        live, dead = [], []
+
+        # One scraper at a time, so an exited worker is archived only once
+        lock_fd = os.open(archive_path + ".lock", os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            fcntl.flock(lock_fd, fcntl.LOCK_EX)
+            for entry in os.listdir(self.directory):
+                name = entry[len(prefix):-len(".json")]
+                if not entry.startswith(prefix) or not entry.endswith(".json") or not name.isdigit():
+                    continue
+                try:
+                    with open(os.path.join(self.directory, entry)) as snapshot_file:
+                        data = json.load(snapshot_file)
+                except (OSError, ValueError):
+                    continue
+                (live if _pid_alive(int(name)) else dead).append(data)
+
+            try:
+                with open(archive_path) as archive_file:
+                    archive = json.load(archive_file)
+            except (OSError, ValueError):
+                archive = {"counters": {}, "gauges": {}, "histograms": {}}
+
+            if dead:
+                # Keep exited workers' totals, forget their gauges
+                archive = _merge([archive] + dead)
+                archive["gauges"] = {}
+                self._write(archive_path, archive)
+                for data in dead:
+                    try:
+                        os.remove(self._path(data["pid"]))
+                    except OSError:
+                        pass
+        finally:
+            fcntl.flock(lock_fd, fcntl.LOCK_UN)
+            os.close(lock_fd)
+        return live, archive
+
+    def render(self):
+        """
+        Metrics of all workers in the Prometheus text exposition format
+
+        Returns:
+            str: Exposition text (format version 0.0.4)
+        """
+        self.flush()
+        live, archive = self._read_all()
+        merged = _merge(live + [archive])
+        merged["gauges"]["metrics_workers"] = {"[]": len(live)}
+
+        # Hit ratio from summed totals, so it is right across workers
+        hits = sum(merged["counters"].get("item_cache_hits_total", {}).values())
+        misses = sum(merged["counters"].get("item_cache_misses_total", {}).values())
+        merged["gauges"]["item_cache_hit_ratio"] = {"[]": hits / (hits + misses) if hits + misses else 0.0}
+
+        # Same for the share of item updates that lost to a concurrent edit
+        updates = merged["counters"].get("item_updates_total", {})
+        conflicts = updates.get(_label_key((("outcome", "conflict"),)), 0)
+        decided = conflicts + updates.get(_label_key((("outcome", "applied"),)), 0)
+        merged["gauges"]["item_update_conflict_ratio"] = {"[]": conflicts / decided if decided else 0.0}
+
+        lines = []
+        for name, (kind, help_text) in METRICS.items():
+            if kind == "histogram":
+                series = merged["histograms"].get(name)
+            else:
+                series = merged["counters" if kind == "counter" else "gauges"].get(name)
+            if not series:
+                continue
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for key in sorted(series):
+                labels = tuple(tuple(pair) for pair in json.loads(key))
+                if kind != "histogram":
+                    lines.append(f"{name}{_format_labels(labels)} {_format_value(series[key])}")
+                    continue
+                values = series[key]
+                cumulative = 0
+                for bound, count in zip(self.buckets + (math.inf,), values[:-1]):
+                    cumulative += count
+                    lines.append(f"{name}_bucket{_format_labels(labels, ('le', _format_value(float(bound))))} {cumulative}")
+                lines.append(f"{name}_sum{_format_labels(labels)} {_format_value(values[-1])}")
+                lines.append(f"{name}_count{_format_labels(labels)} {cumulative}")
+        return "\n".join(lines) + "\n"
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            self.flush()
+
+    def start(self):
+        """Write snapshots periodically on the running event loop"""
+        if self._task is None:
+            self.flush()
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        """Stop the periodic writes and write a final snapshot"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        self.flush()
+
+
+def _merge(snapshots):
+    """Sum counters, gauges and histogram buckets of several snapshots"""
+    merged = {"counters": {}, "gauges": {}, "histograms": {}}
+    for data in snapshots:
+        for section in ("counters", "gauges"):
+            for name, series in data.get(section, {}).items():
+                target = merged[section].setdefault(name, {})
+                for key, value in series.items():
+                    target[key] = target.get(key, 0) + value
+        for name, series in data.get("histograms", {}).items():
+            target = merged["histograms"].setdefault(name, {})
+            for key, values in series.items():
+                if key in target:
+                    target[key] = [a + b for a, b in zip(target[key], values)]
+                else:
+                    target[key] = list(values)
+    return merged
+
+
+class MetricsMiddleware:
+    """
+    Pure ASGI middleware recording request counts, latency and in-flight
+
+    Requests are labelled with the route template (e.g. /items/{item_id})
+    rather than the raw path, so label cardinality stays bounded. Latency
+    runs until the last body chunk is sent, streamed responses included.
+    """
+
+    def __init__(self, app, registry):
+        self.app = app
+        self.registry = registry
+        self._routes = {}
+
+    def _route(self, scope):
+        """Route template of the endpoint the router picked"""
+        endpoint = scope.get("endpoint")
+        if endpoint is None:
+            return "unmatched"
+        route = self._routes.get(endpoint)
+        if route is None:
+            route = "unmatched"
+            for candidate in getattr(scope.get("app"), "routes", ()):
+                if getattr(candidate, "endpoint", None) is endpoint:
+                    route = candidate.path
+                    break
+            self._routes[endpoint] = route
+        return route
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        registry = self.registry
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        registry.add("http_requests_in_flight")
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - start
+            registry.add("http_requests_in_flight", value=-1)
+            labels = (("method", scope["method"]), ("route", self._route(scope)), ("status", str(status)))
+            registry.inc("http_requests_total", labels)
+            registry.observe("http_request_duration_seconds", labels, elapsed)
+
+
+# Registry for this process, configured from METRICS_* environment variables
+metrics = MetricsRegistry(
+    directory=os.getenv('METRICS_DIR') or None,
+    flush_interval=float(os.getenv('METRICS_FLUSH_INTERVAL', '1'))
+)
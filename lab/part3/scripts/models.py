@@ -3,21 +3,42 @@ Pydantic Models
 Define data models for request/response validation
 """
 
-from pydantic import BaseModel, Field
-from typing import Optional
+from pydantic import BaseModel, Field, field_validator
+from typing import List, Optional
 from datetime import datetime
+from decimal import Decimal, ROUND_HALF_UP
+
+# Largest value DECIMAL(10, 2) holds
+MAX_PRICE = 99999999.99
 
 class ItemBase(BaseModel):
     """Base model for Item"""
     name: str = Field(..., max_length=100, description="Item name")
     description: Optional[str] = Field(None, description="Item description")
-    price: float = Field(..., gt=0, description="Item price (must be positive)")
-    quantity: int = Field(..., ge=0, description="Item quantity (must be non-negative)")
+    price: float = Field(..., gt=0, lt=100000000, description="Item price (must be positive, fits DECIMAL(10, 2))")
+    quantity: int = Field(..., ge=0, le=2147483647, description="Item quantity (must be non-negative)")
+
+    @field_validator("price")
+    @classmethod
+    def round_price(cls, value):
+        """
+        Round to cents the way PostgreSQL stores DECIMAL(10, 2), then check
+        the stored value: 0.004 would become 0.00 (CHECK price > 0) and
+        99999999.995 would overflow the column
+        """
+        value = float(Decimal(repr(value)).quantize(Decimal("0.01"), rounding=ROUND_HALF_UP))
+        if value <= 0:
+            raise ValueError("must be at least 0.01 once rounded to cents")
+        if value > MAX_PRICE:
+            raise ValueError(f"must be at most {MAX_PRICE} once rounded to cents")
+        return value
 
 class Item(ItemBase):
     """Complete Item model with ID and timestamp"""
     id: int = Field(..., description="Item ID")
     created_at: datetime = Field(..., description="Creation timestamp")
+    updated_at: Optional[datetime] = Field(None, description="Last modification timestamp")
+    version: int = Field(1, description="Row version, bumped by every update (the ETag is derived from it)")
     
     class Config:
         from_attributes = True  # For ORM compatibility
@@ -27,3 +48,63 @@ class ItemResponse(BaseModel):
     success: bool
     message: str
     data: Optional[Item] = None
+
+class ItemBatchRequest(BaseModel):
+    """Request body for fetching several items at once"""
+    ids: List[int] = Field(..., min_length=1, max_length=1000, description="Item IDs to fetch (max 1000)")
+
+class ItemBatchResponse(BaseModel):
+    """Items found for a batch request, plus the IDs that do not exist"""
+    items: List[Item] = Field(..., description="Found items, in request order")
+    missing: List[int] = Field(..., description="Requested IDs with no matching item")
+
+class BulkRowError(BaseModel):
+    """Why one uploaded row was rejected"""
+    index: int = Field(..., description="Zero-based position of the row in the upload")
+    errors: List[str] = Field(..., description="Validation messages")
+
+class BulkInsertResponse(BaseModel):
+    """Outcome of a bulk upload"""
+    received: int = Field(..., description="Rows parsed from the upload")
+    inserted: int = Field(..., description="Rows written to the database")
+    failed: int = Field(..., description="Rows rejected by validation")
+    errors: List[BulkRowError] = Field(..., description="First rejected rows (see errors_truncated)")
+    errors_truncated: bool = Field(..., description="True if more rows failed than are listed")
+    seconds: float = Field(..., description="Time spent parsing, validating and loading")
+    rows_per_second: float = Field(..., description="Inserted rows per second")
+
+class InventorySummary(BaseModel):
+    """Totals over every item, read from the incremental aggregates"""
+    item_count: int = Field(..., description="Number of items")
+    total_quantity: int = Field(..., description="Sum of quantities")
+    total_value: float = Field(..., description="Sum of price * quantity")
+    average_price: Optional[float] = Field(None, description="Mean item price (null with no items)")
+    low_stock_count: int = Field(..., description="Items with quantity below low_stock_threshold")
+    low_stock_threshold: int = Field(..., description="Quantity below which an item counts as low stock")
+    pending_deltas: int = Field(..., description="Aggregate changes not folded into items_stats yet")
+
+class PriceBucket(BaseModel):
+    """Items whose price falls in [min_price, max_price)"""
+    bucket: int = Field(..., description="Bucket number, 0 = cheapest")
+    min_price: float = Field(..., description="Lower price bound (inclusive)")
+    max_price: Optional[float] = Field(None, description="Upper price bound (exclusive, null for the last bucket)")
+    item_count: int = Field(..., description="Items in the bucket")
+    total_quantity: int = Field(..., description="Sum of their quantities")
+    total_value: float = Field(..., description="Sum of their price * quantity")
+
+class PriceHistogram(BaseModel):
+    """Item counts per price range"""
+    buckets: List[PriceBucket] = Field(..., description="Every bucket in price order, empty ones included")
+
+class QuantityDelta(BaseModel):
+    """Request body for changing an item's quantity"""
+    delta: int = Field(..., ge=-1000000, le=1000000, description="Amount to add to the quantity (negative to take stock)")
+
+class QuantityUpdateResponse(BaseModel):
+    """Outcome of a quantity change"""
+    id: int = Field(..., description="Item ID")
+    delta: int = Field(..., description="Requested change")
+    status: str = Field(..., description='"applied", or "pending" until the next flush')
+    quantity: Optional[int] = Field(None, description="Quantity right after the flush that applied the change")
+    pending_delta: Optional[int] = Field(None, description="Sum of this item's changes waiting for the next flush")
+
@@ -10,7 +10,9 @@ echo ""
 
 # Check if FastAPI is running
 echo "--- Service Status ---"
-if pgrep -f "uvicorn app.main:app" > /dev/null; then
+if pgrep -f "app.launcher" > /dev/null; then
+    echo "✓ FastAPI: Running (supervisor PID: $(pgrep -f 'app.launcher' | head -1), workers: $(pgrep -f 'multiprocessing.spawn' | wc -l))"
+elif pgrep -f "uvicorn app.main:app" > /dev/null; then
     echo "✓ FastAPI: Running (PID: $(pgrep -f 'uvicorn app.main:app'))"
 else
     echo "✗ FastAPI: Not running"
@@ -61,7 +63,7 @@ echo ""
 # API Health Check
 echo "--- API Health Check ---"
 if command -v curl &> /dev/null; then
-    HEALTH=$(curl -s http://localhost:8000/health 2>/dev/null)
+    HEALTH=$(curl -s http://localhost:8000/health/ready 2>/dev/null)
     if [ ! -z "$HEALTH" ]; then
         echo "$HEALTH" | python3 -m json.tool 2>/dev/null || echo "$HEALTH"
     else
@@ -72,6 +74,18 @@ else
 fi
 echo ""
 
+# Application metrics (summed over all workers)
+echo "--- API Metrics ---"
+if command -v curl &> /dev/null; then
+    METRICS=$(curl -s http://localhost:8000/metrics 2>/dev/null)
+    if [ ! -z "$METRICS" ]; then
+        echo "$METRICS" | grep -E "^(http_requests_total|http_requests_in_flight|db_pool_connections|db_pool_timeouts_total|item_cache_hit_ratio|metrics_workers)" | sed "s/^/  /"
+    else
+        echo "API not responding"
+    fi
+fi
+echo ""
+
 # Recent logs (if using systemd)
 echo "--- Recent Logs (last 10 lines) ---"
 if systemctl list-unit-files | grep -q fastapi.service; then
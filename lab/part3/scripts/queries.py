@@ -0,0 +1,223 @@
+"""
+SQL Queries
+SQL text for the item endpoints, kept in one place
+"""
+
+# Columns returned for every Item, in model order
+ITEM_COLUMNS = "id, name, description, price, quantity, created_at, updated_at, version"
+
+SELECT_ITEM_BY_ID = f"""
+    SELECT {ITEM_COLUMNS}
+    FROM items
+    WHERE id = %s
+"""
+
+SELECT_ITEMS_BY_IDS = f"""
+    SELECT {ITEM_COLUMNS}
+    FROM items
+    WHERE id = ANY(%s)
+"""
+
+# Table-wide change counter, bumped by a statement trigger on items
+SELECT_ITEMS_VERSION = """
+    SELECT COALESCE(SUM(version), 0) AS version, MAX(last_modified) AS last_modified
+    FROM items_version
+"""
+
+# Must match "quantity < 20" in idx_items_low_stock and the stats triggers
+LOW_STOCK_THRESHOLD = 20
+
+# Must match items_price_bucket_edges() (used where the SQL is unavailable)
+PRICE_BUCKET_EDGES = (10, 50, 100, 500, 1000, 5000, 10000, 50000, 100000)
+
+# Per price bucket totals: folded rows plus deltas not folded yet
+SELECT_INVENTORY_STATS = """
+    SELECT bucket,
+           SUM(item_count)::BIGINT AS item_count,
+           SUM(total_quantity)::BIGINT AS total_quantity,
+           SUM(total_value) AS total_value,
+           SUM(price_sum) AS price_sum,
+           SUM(low_stock_count)::BIGINT AS low_stock_count,
+           SUM(pending)::BIGINT AS pending
+    FROM (
+        SELECT bucket, item_count, total_quantity, total_value, price_sum, low_stock_count, 0 AS pending
+        FROM items_stats
+        UNION ALL
+        SELECT bucket, item_count, total_quantity, total_value, price_sum, low_stock_count, 1
+        FROM items_stats_delta
+    ) AS stats
+    GROUP BY bucket
+    ORDER BY bucket
+"""
+
+SELECT_PRICE_BUCKET_EDGES = "SELECT items_price_bucket_edges() AS edges"
+
+FOLD_INVENTORY_STATS = "SELECT fold_items_stats() AS folded"
+
+# The literal bound lets the planner use the partial index for any %s
+SELECT_LOW_STOCK_ITEMS = f"""
+    SELECT {ITEM_COLUMNS}
+    FROM items
+    WHERE quantity < {LOW_STOCK_THRESHOLD} AND quantity < %s
+    ORDER BY quantity, id
+    LIMIT %s
+"""
+
+
+def escape_like(text):
+    """Escape LIKE wildcards so user input only matches literally"""
+    return text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def build_items_query(after_id=None, limit=None, filters=None):
+    """
+    Build a keyset-paginated, filtered SELECT over items
+
+    Paging on "id > last seen id" walks the primary key index, so every
+    page costs the same no matter how deep into the table it is, unlike
+    OFFSET which has to skip all earlier rows.
+
+    Every filter is a bound parameter on a bare column, so the planner can
+    use the matching index:
+
+    - name_prefix: name LIKE 'prefix%' (idx_items_name, varchar_pattern_ops)
+    - name_contains: name ILIKE '%text%' (idx_items_name_trgm, if pg_trgm
+      is installed)
+    - created_after / created_before: half-open range on
+      idx_items_created_at
+    - min_price / max_price / min_quantity / max_quantity: inclusive
+      bounds, applied as filters
+
+    Args:
+        after_id: Only return items with an ID greater than this
+        limit: Maximum number of rows, or None for all rows
+        filters: Dictionary of the filters above (None values are ignored)
+
+    Returns:
+        tuple: (sql, params) ready for cursor.execute()
+    """
+    filters = filters or {}
+    conditions = []
+    params = []
+
+    if after_id is not None:
+        conditions.append("id > %s")
+        params.append(after_id)
+
+    if filters.get("name_prefix") is not None:
+        conditions.append("name LIKE %s")
+        params.append(escape_like(filters["name_prefix"]) + "%")
+    if filters.get("name_contains") is not None:
+        conditions.append("name ILIKE %s")
+        params.append("%" + escape_like(filters["name_contains"]) + "%")
+    if filters.get("created_after") is not None:
+        conditions.append("created_at >= %s")
+        params.append(filters["created_after"])
+    if filters.get("created_before") is not None:
+        conditions.append("created_at < %s")
+        params.append(filters["created_before"])
+
+    bounds = (
+        ("min_price", "price >= %s"),
+        ("max_price", "price <= %s"),
+        ("min_quantity", "quantity >= %s"),
+        ("max_quantity", "quantity <= %s")
+    )
+    for key, condition in bounds:
+        if filters.get(key) is not None:
+            conditions.append(condition)
+            params.append(filters[key])
+
+    sql = f"SELECT {ITEM_COLUMNS} FROM items"
+    if conditions:
+        sql += " WHERE " + " AND ".join(conditions)
+    sql += " ORDER BY id"
+    if limit is not None:
+        sql += " LIMIT %s"
+        params.append(limit)
+
+    return sql, tuple(params)
+
+
+# COPY ... TO STDOUT options per export format. NDJSON rows are single
+# JSON values written as CSV with a quote and delimiter that JSON text
+# never contains (row_to_json escapes control characters), so COPY
+# passes them through unquoted and unescaped.
+EXPORT_COPY_OPTIONS = {
+    "csv": "FORMAT csv, HEADER",
+    "ndjson": "FORMAT csv, QUOTE E'\\x01', DELIMITER E'\\x02'"
+}
+
+
+def build_export_query(format, filters=None):
+    """
+    Build the SELECT behind GET /items/export
+
+    Args:
+        format: "csv" (one column per item field) or "ndjson" (one JSON
+            object per item)
+        filters: Same filters as build_items_query
+
+    Returns:
+        tuple: (sql, params, copy options) for async_database.copy_out()
+    """
+    query, params = build_items_query(filters=filters)
+    if format == "ndjson":
+        query = f"SELECT row_to_json(item) FROM ({query}) item"
+    return query, params, EXPORT_COPY_OPTIONS[format]
+
+
+# Largest quantity the INTEGER column holds
+MAX_QUANTITY = 2147483647
+
+# Lock the rows of a quantity flush in ID order first, so flushes from
+# several workers that touch the same items cannot deadlock
+LOCK_ITEMS_BY_IDS = "SELECT id FROM items WHERE id = ANY(%s) ORDER BY id FOR UPDATE"
+
+# One quantity change; skipped (no row returned) if the result would leave
+# 0 .. MAX_QUANTITY, so CHECK (quantity >= 0) never fails
+UPDATE_ITEM_QUANTITY = f"""
+    UPDATE items SET quantity = quantity + %s
+    WHERE id = %s AND quantity + %s::BIGINT BETWEEN 0 AND {MAX_QUANTITY}
+    RETURNING quantity
+"""
+
+
+def build_quantity_update(count):
+    """
+    Build one UPDATE ... FROM (VALUES ...) applying count quantity changes
+
+    Items whose quantity would leave 0 .. MAX_QUANTITY are left as they
+    are and do not appear in RETURNING.
+
+    Args:
+        count: Number of (id, delta) pairs, one per distinct item
+
+    Returns:
+        str: SQL with 2 * count placeholders (id, delta, id, delta, ...)
+    """
+    values = ", ".join(["(%s, %s::BIGINT)"] * count)
+    return f"""
+        UPDATE items SET quantity = items.quantity + v.delta
+        FROM (VALUES {values}) AS v(id, delta)
+        WHERE items.id = v.id AND items.quantity + v.delta BETWEEN 0 AND {MAX_QUANTITY}
+        RETURNING items.id, items.quantity
+    """
+
+
+# Replace an item's fields. The trigger bumps version, and RETURNING sees
+# the row as the trigger left it
+UPDATE_ITEM = f"""
+    UPDATE items SET name = %s, description = %s, price = %s, quantity = %s
+    WHERE id = %s
+    RETURNING {ITEM_COLUMNS}
+"""
+
+# The same, only while the row is still at one of the versions the client
+# read (optimistic concurrency: nothing is locked between that read and
+# this write, and a concurrent edit turns this into a no-op)
+UPDATE_ITEM_IF_VERSION = f"""
+    UPDATE items SET name = %s, description = %s, price = %s, quantity = %s
+    WHERE id = %s AND version = ANY(%s)
+    RETURNING {ITEM_COLUMNS}
+"""
@@ -0,0 +1,423 @@
+"""
+Read Replica Module
+Routes the database reads of GET requests to PostgreSQL streaming replicas
+that are close enough behind the primary, and everything else to the
+primary
+
+DATABASE_REPLICA_URLS lists the replicas (comma-separated connection
+strings). Without it every query goes to DATABASE_URL, as before.
+"""
+
+import asyncio
+import contextvars
+import itertools
+import os
+import threading
+import time
+from collections import deque
+
+import psycopg2
+import psycopg2.errors
+import psycopg2.extensions
+
+from app.database import PoolTimeoutError, create_pool
+from app.metrics import metrics
+
+
+class ReadRoute:
+    """
+    Where the reads of one GET or HEAD request go
+
+    The request's first read picks the server and every later read goes
+    to the same one, so the ETag and the rows of one response never come
+    from servers at different points in the WAL.
+    """
+
+    __slots__ = ("chosen", "replica")
+
+    def __init__(self):
+        self.chosen = False
+        self.replica = None
+
+
+# ReadRoute of the request being served, None outside GET and HEAD
+# requests (see ReadRoutingMiddleware)
+reading = contextvars.ContextVar("reading", default=None)
+
+# Failures after which a read is retried on the primary: the replica is
+# unreachable, out of connections, cancelled the query to apply WAL
+# (conflict with recovery) or was handed a write by mistake
+RETRY_ON_PRIMARY = (psycopg2.OperationalError, psycopg2.InterfaceError, PoolTimeoutError,
+                    psycopg2.errors.ReadOnlySqlTransaction)
+
+
+def _lsn(text):
+    """WAL position 'X/Y' as an integer"""
+    high, low = text.split("/")
+    return (int(high, 16) << 32) + int(low, 16)
+
+
+def _server(dsn):
+    """host:port/dbname of a connection string, without credentials"""
+    try:
+        params = psycopg2.extensions.parse_dsn(dsn or "")
+    except Exception:
+        return None
+    return f"{params.get('host', 'localhost')}:{params.get('port', '5432')}/{params.get('dbname', '')}"
+
+
+class Replica:
+    """One read replica: its connection pool and the last lag check"""
+
+    def __init__(self, name, dsn):
+        self.name = name
+        self.dsn = dsn
+        self._pool = None
+        self._pool_pid = None
+        self._pool_lock = threading.Lock()
+
+        # Last check result
+        self.available = False
+        self.lag = None
+        self.error = "not checked yet"
+        self.checked_at = None
+
+    def pool(self):
+        """
+        Return this process's pool for the replica, creating it on first use
+
+        Returns:
+            ConnectionPool: Pool configured like the primary's (DB_POOL_*)
+        """
+        pid = os.getpid()
+        if self._pool is not None and self._pool_pid == pid:
+            return self._pool
+        with self._pool_lock:
+            if self._pool is None or self._pool_pid != pid:
+                self._pool = create_pool(self.dsn, self.name)
+                self._pool_pid = pid
+        return self._pool
+
+    def pool_stats(self):
+        """Usage of this process's pool, or None if it was never used"""
+        if self._pool is None or self._pool_pid != os.getpid():
+            return None
+        pool = self._pool.stats()
+        return {"size": pool["size"], "in_use": pool["in_use"], "timeouts": pool["timeouts"]}
+
+    def close(self):
+        """Close this process's pool"""
+        if self._pool is not None and self._pool_pid == os.getpid():
+            self._pool.close()
+            self._pool = None
+
+    def lag_now(self):
+        """Measured lag plus the time since it was measured, or None"""
+        if not self.available or self.lag is None:
+            return None
+        return self.lag + (time.monotonic() - self.checked_at)
+
+
+class ReplicaRouter:
+    """
+    Chooses the server for each read and keeps replica lag current
+
+    A background task samples the primary's WAL position every interval
+    and compares each replica's replayed position against the samples:
+    a replica's lag is how long ago the primary had already written WAL
+    the replica has not replayed yet. This needs no clock agreement
+    between servers and still reads 0 on an idle primary. Reads go
+    round-robin to the replicas whose lag, plus the age of that
+    measurement, is within max_lag; when none is (lagging, down, or not
+    checked yet) they go to the primary. The choice is made once per
+    request (see ReadRoute). A read that fails on a replica with a
+    connection error is retried once on the primary, the rest of that
+    request stays there, and the replica is skipped until its next good
+    check.
+
+    Per-server call latency and errors are recorded for every database
+    call while replicas are configured, primary included.
+    """
+
+    def __init__(self, urls, primary_dsn, max_lag=1.0, interval=0.25, timeout=2.0):
+        """
+        Args:
+            urls: Replica connection strings (empty disables routing)
+            primary_dsn: Primary connection string, for WAL positions
+            max_lag: Seconds a replica may be behind and still serve reads
+            interval: Seconds between lag checks (keep well below max_lag)
+            timeout: Seconds a check may take on one server
+        """
+        self.replicas = [Replica(f"replica{number}", url) for number, url in enumerate(urls, start=1)]
+        self.primary_dsn = primary_dsn
+        self.max_lag = max_lag
+        self.interval = interval
+        self.timeout = timeout
+        self._task = None
+        self._round_robin = itertools.count()
+        self._lock = threading.Lock()
+
+        # Primary WAL positions (monotonic time, LSN), oldest first; enough
+        # history to tell "a little behind" from "far behind"
+        window = max(10.0, 4 * max_lag)
+        self._samples = deque(maxlen=int(window / interval) + 2)
+        self.primary_error = None
+
+        # Lag-check connections, used only by the checking thread
+        self._connections = {}
+
+        # Statistics
+        self._reads = {name: 0 for name in ["primary"] + [replica.name for replica in self.replicas]}
+        self._fallbacks = {"lagging": 0, "unavailable": 0, "error": 0}
+        self._calls = {name: [0, 0, 0.0, 0.0, None] for name in self._reads}
+
+    @property
+    def enabled(self):
+        return bool(self.replicas)
+
+    @property
+    def max_staleness(self):
+        """Seconds a read served by a replica can be behind the primary, at most"""
+        return self.max_lag + self.interval
+
+    def choose(self, route):
+        """
+        Pick the server for one read of a request
+
+        Args:
+            route: The request's ReadRoute; its first read decides
+
+        Returns:
+            Replica: Replica to read from, or None for the primary
+        """
+        if not route.chosen:
+            route.replica = self._pick()
+            route.chosen = True
+        self._count_read(route.replica.name if route.replica is not None else "primary")
+        return route.replica
+
+    def _pick(self):
+        """A replica within max_lag (round-robin), or None for the primary"""
+        usable = []
+        for replica in self.replicas:
+            lag = replica.lag_now()
+            if lag is not None and lag <= self.max_lag:
+                usable.append(replica)
+        if usable:
+            return usable[next(self._round_robin) % len(usable)]
+        self._fall_back("lagging" if any(replica.available for replica in self.replicas) else "unavailable")
+        return None
+
+    def failed(self, route, replica, error):
+        """
+        Take a replica out of rotation after a read failed on it
+
+        The rest of the request reads from the primary, and the next good
+        check puts the replica back. The read is counted again when it is
+        retried on the primary.
+        """
+        route.replica = None
+        replica.available = False
+        replica.error = str(error).strip() or type(error).__name__
+        print(f"Replica {replica.name} failed, reading from the primary: {replica.error}")
+        self._fall_back("error")
+        self._count_read("primary")
+
+    def _fall_back(self, reason):
+        with self._lock:
+            self._fallbacks[reason] += 1
+        metrics.inc("db_replica_fallbacks_total", (("reason", reason),))
+
+    def _count_read(self, name):
+        with self._lock:
+            self._reads[name] += 1
+        metrics.inc("db_reads_total", (("target", name),))
+
+    def record(self, name, seconds, error=None):
+        """
+        Record one database call on a server (from a database thread)
+
+        Args:
+            name: "primary" or the replica name
+            seconds: Time the call took, connection checkout included
+            error: Exception the call raised, if any
+        """
+        with self._lock:
+            calls = self._calls[name]
+            calls[0] += 1
+            calls[2] += seconds
+            calls[3] = max(calls[3], seconds)
+            if error is not None:
+                calls[1] += 1
+                calls[4] = f"{type(error).__name__}: {error}".strip()
+        metrics.observe("db_target_duration_seconds", (("target", name),), seconds)
+        if error is not None:
+            metrics.inc("db_target_errors_total", (("target", name),))
+
+    def _query(self, name, dsn, sql):
+        """Run sql on the check connection for one server; return the row"""
+        connection = self._connections.get(name)
+        if connection is None or connection.closed:
+            connection = psycopg2.connect(
+                dsn, connect_timeout=max(1, round(self.timeout)),
+                options=f"-c statement_timeout={int(self.timeout * 1000)}"
+            )
+            connection.set_isolation_level(psycopg2.extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+            self._connections[name] = connection
+        try:
+            cursor = connection.cursor()
+            try:
+                cursor.execute(sql)
+                return cursor.fetchone()
+            finally:
+                cursor.close()
+        except Exception:
+            connection.close()
+            raise
+
+    def _lag(self, replayed, now):
+        """Seconds since the primary first had WAL beyond replayed"""
+        for sampled_at, position in self._samples:
+            if position > replayed:
+                return now - sampled_at
+        return 0.0
+
+    def _check(self):
+        """Sample the primary's WAL position, then every replica's lag"""
+        try:
+            position = self._query("primary", self.primary_dsn, "SELECT pg_current_wal_lsn()::text")[0]
+            self._samples.append((time.monotonic(), _lsn(position)))
+            self.primary_error = None
+        except Exception as e:
+            # Keep judging replicas against the samples already taken
+            self.primary_error = str(e).strip() or type(e).__name__
+
+        for replica in self.replicas:
+            try:
+                in_recovery, replayed = self._query(
+                    replica.name, replica.dsn, "SELECT pg_is_in_recovery(), pg_last_wal_replay_lsn()::text"
+                )
+                if not in_recovery:
+                    raise RuntimeError("not a standby (pg_is_in_recovery() is false)")
+                if replayed is None or not self._samples:
+                    raise RuntimeError("replay position unknown")
+                now = time.monotonic()
+                replica.lag = self._lag(_lsn(replayed), now)
+                replica.checked_at = now
+                replica.available = True
+                replica.error = None
+            except Exception as e:
+                replica.available = False
+                replica.error = str(e).strip() or type(e).__name__
+
+    async def check(self):
+        """Run one lag check on a worker thread"""
+        await asyncio.get_running_loop().run_in_executor(None, self._check)
+
+    async def _run(self):
+        while True:
+            try:
+                await self.check()
+            except Exception as e:
+                print(f"Replica check error: {e}")
+            await asyncio.sleep(self.interval)
+
+    def start(self):
+        """Start checking in the background on the running event loop"""
+        if self._task is None and self.enabled:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        """Cancel the background task and close replica connections"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        for connection in self._connections.values():
+            connection.close()
+        self._connections.clear()
+        for replica in self.replicas:
+            replica.close()
+
+    def stats(self):
+        """
+        Routing state and per-server counters for this worker
+
+        Returns:
+            dict: Settings, fallbacks, and per server: reads routed there,
+                calls, errors, latency and (replicas) lag and pool usage
+        """
+        with self._lock:
+            reads = dict(self._reads)
+            fallbacks = dict(self._fallbacks)
+            calls = {name: list(values) for name, values in self._calls.items()}
+
+        def target(name, server):
+            count, errors, total, longest, last_error = calls[name]
+            return {
+                "server": server,
+                "reads": reads[name],
+                "calls": count,
+                "errors": errors,
+                "avg_ms": round(total / count * 1000, 3) if count else None,
+                "max_ms": round(longest * 1000, 3),
+                "last_error": last_error
+            }
+
+        targets = {"primary": dict(target("primary", _server(self.primary_dsn)), error=self.primary_error)}
+        for replica in self.replicas:
+            lag = replica.lag_now()
+            if lag is None:
+                status = "unavailable"
+            else:
+                status = "lagging" if lag > self.max_lag else "serving"
+            targets[replica.name] = dict(
+                target(replica.name, _server(replica.dsn)),
+                status=status,
+                lag_seconds=round(lag, 3) if lag is not None else None,
+                error=replica.error,
+                pool=replica.pool_stats()
+            )
+        return {
+            "max_lag": self.max_lag,
+            "check_interval": self.interval,
+            "fallbacks": fallbacks,
+            "targets": targets
+        }
+
+
+class ReadRoutingMiddleware:
+    """
+    Pure ASGI middleware giving GET and HEAD requests a ReadRoute
+
+    Database reads made while serving them (async_database.fetch_*,
+    stream_rows, copy_out) may go to a replica, all to the same one; every
+    other request, and everything outside requests (flushes, health
+    checks, warm-up), stays on the primary.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] not in ("GET", "HEAD"):
+            await self.app(scope, receive, send)
+            return
+        token = reading.set(ReadRoute())
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            reading.reset(token)
+
+
+# Replicas from DATABASE_REPLICA_URLS; REPLICA_MAX_LAG in seconds
+replica_router = ReplicaRouter(
+    [url.strip() for url in os.getenv('DATABASE_REPLICA_URLS', '').split(",") if url.strip()],
+    os.getenv('DATABASE_URL'),
+    max_lag=float(os.getenv('REPLICA_MAX_LAG', '1')),
+    interval=float(os.getenv('REPLICA_CHECK_INTERVAL', '0.25')),
+    timeout=float(os.getenv('REPLICA_CHECK_TIMEOUT', '2'))
+)
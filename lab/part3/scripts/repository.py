@@ -0,0 +1,1112 @@
+"""
+Item Repository Module
+One interface for item storage, with the pooled PostgreSQL backend and an
+embedded SQLite backend for small sites and offline benchmarks
+
+DATABASE_URL picks the backend: postgresql://... (or any libpq DSN) uses
+PostgreSQL, sqlite:///relative/path.db or sqlite:////absolute/path.db
+uses a local SQLite file, created on first use.
+"""
+
+import asyncio
+import functools
+import os
+import queue
+import sqlite3
+import threading
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+from app.async_database import (
+    copy_out, db_session, fetch_all, fetch_one, fetch_rows, ping_primary, run_in_db, stream_rows,
+    shutdown_executor, warm_up_connections
+)
+from app.bulk import copy_items
+from app.cache import item_cache
+from app.coalesce import SingleFlight
+from app.database import get_pool, pool_stats, slow_queries, statements
+from app.queries import (
+    FOLD_INVENTORY_STATS, ITEM_COLUMNS, LOCK_ITEMS_BY_IDS, LOW_STOCK_THRESHOLD, MAX_QUANTITY, PRICE_BUCKET_EDGES,
+    SELECT_ITEM_BY_ID, SELECT_ITEMS_BY_IDS, SELECT_ITEMS_VERSION, SELECT_INVENTORY_STATS, SELECT_LOW_STOCK_ITEMS,
+    SELECT_PRICE_BUCKET_EDGES, UPDATE_ITEM, UPDATE_ITEM_IF_VERSION, UPDATE_ITEM_QUANTITY, build_export_query, build_items_query, build_quantity_update,
+    escape_like
+)
+
+# ITEM_LOOKUP_COALESCING=0 gives every item lookup its own query
+ITEM_LOOKUP_COALESCING = os.getenv('ITEM_LOOKUP_COALESCING', '1') != '0'
+
+# Items per UPDATE ... FROM (VALUES ...) statement of a quantity flush
+QUANTITY_UPDATE_CHUNK = 1000
+
+_ITEM_KEYS = tuple(name.strip() for name in ITEM_COLUMNS.split(","))
+
+
+class VersionConflict(Exception):
+    """The item exists, but not at any of the versions an update required"""
+
+    def __init__(self, current):
+        """
+        Args:
+            current: The item's row as read right after the update missed
+        """
+        super().__init__(f"item {current['id']} is at version {current['version']}")
+        self.current = current
+
+
+class ItemRepository(ABC):
+    """
+    Item storage used by the API
+
+    Rows come back in the shapes the endpoints already use: single items
+    as dictionaries keyed by column, lists as tuples in ITEM_COLUMNS order
+    (for RowEncoder). Every method that touches storage is a coroutine
+    and never blocks the event loop. A backend must implement every
+    abstract method, or it cannot be created.
+    """
+
+    # Backend name, reported in /stats
+    name = None
+
+    # Whether other processes' writes are announced (LISTEN/NOTIFY), so
+    # cached items can be dropped as soon as they change
+    notifies_changes = False
+
+    def __init__(self):
+        # Concurrent lookups of one ID share a query; a lookup started
+        # before a cache invalidation is not shared with later ones
+        self.item_lookups = SingleFlight(
+            "get_item", enabled=ITEM_LOOKUP_COALESCING, generation=item_cache.generation
+        )
+
+    @abstractmethod
+    async def open(self):
+        """Connect and get ready to serve"""
+
+    async def warm_up(self):
+        """
+        Open connections and do per-connection setup before traffic arrives
+
+        Returns:
+            int: Connections warmed up
+        """
+        await self.open()
+        return 0
+
+    @abstractmethod
+    async def close(self):
+        """Release connections and threads"""
+
+    @abstractmethod
+    async def ping(self, timeout=None):
+        """
+        Run a trivial query; raises if storage is unreachable
+
+        Args:
+            timeout: Seconds the query may hold a connection and thread
+                (None: the backend's usual limits)
+        """
+
+    @abstractmethod
+    def pool_stats(self):
+        """
+        Connection usage of this worker, for health and metrics
+
+        Returns:
+            dict: size, max_size, in_use, idle, waits and timeouts of the
+                connections requests queue for, plus backend details
+        """
+
+    async def get_item(self, item_id):
+        """
+        One item; concurrent lookups of the same ID run a single query
+
+        Returns:
+            dict: Item row (shared between callers, do not modify), or
+                None if it does not exist
+        """
+        return await self.item_lookups.do(item_id, self._fetch_item, item_id)
+
+    @abstractmethod
+    async def _fetch_item(self, item_id):
+        """
+        Returns:
+            dict: Item row, or None if it does not exist
+        """
+
+    @abstractmethod
+    async def get_items(self, ids):
+        """
+        Returns:
+            list: Item rows (dictionaries) for the IDs that exist, any order
+        """
+
+    @abstractmethod
+    async def list_items(self, after_id=None, limit=None, filters=None):
+        """
+        Items ordered by ID (see queries.build_items_query for filters)
+
+        Returns:
+            list: Rows as tuples in ITEM_COLUMNS order
+        """
+
+    @abstractmethod
+    def stream_items(self, after_id=None, limit=None, filters=None, batch_size=1000):
+        """
+        Like list_items, but yields batches so memory use stays flat
+
+        Returns:
+            async iterator: Lists of up to batch_size tuple rows
+        """
+
+    @abstractmethod
+    def export_items(self, format, filters=None):
+        """
+        Every matching item, encoded by the database, ordered by ID
+
+        CSV has a header line and one line per item; NDJSON one JSON
+        object per line. No per-row Python objects are built.
+
+        Args:
+            format: "csv" or "ndjson"
+            filters: Same filters as list_items
+
+        Returns:
+            async iterator: Chunks of bytes
+        """
+
+    @abstractmethod
+    async def items_version(self):
+        """
+        Returns:
+            dict: version (changes on every write) and last_modified
+        """
+
+    @abstractmethod
+    def bulk_writer(self):
+        """
+        Async context manager for loading items in one transaction
+
+        The writer has insert(items) -> rows written and commit(). Leaving
+        the block without commit() rolls everything back.
+        """
+
+    @abstractmethod
+    async def update_item(self, item_id, item, versions=None):
+        """
+        Replace an item's fields, optionally only at a known version
+
+        Nothing is locked between the client's read and this write: the
+        UPDATE simply matches no row if someone else got there first.
+
+        Args:
+            item: ItemBase with the new field values
+            versions: Versions the row must still be at (None: any)
+
+        Returns:
+            dict: The updated row (with its new version), or None if the
+                item does not exist
+
+        Raises:
+            VersionConflict: The item is at another version; carries the
+                row read on the write connection right after the miss,
+                never a shared or cached lookup
+        """
+
+    @abstractmethod
+    async def update_quantity(self, item_id, delta):
+        """
+        Add delta to one item's quantity right away
+
+        Returns:
+            int: New quantity, or None if the item does not exist or the
+                quantity would drop below zero
+        """
+
+    @abstractmethod
+    async def apply_quantity_deltas(self, changes):
+        """
+        Apply many quantity changes in one transaction
+
+        Each item's deltas are summed and all items are updated by one
+        statement. An item whose total would drop below zero instead gets
+        its deltas one at a time, in order, skipping those that do not fit.
+
+        Args:
+            changes: List of (item_id, [delta, ...]), one entry per item
+
+        Returns:
+            dict: item_id -> one entry per delta: the item's quantity after
+                the statement that applied it, or None if it was rejected
+        """
+
+    @abstractmethod
+    async def inventory_stats(self):
+        """
+        Returns:
+            list: Per price bucket totals (see queries.SELECT_INVENTORY_STATS)
+        """
+
+    async def price_bucket_edges(self):
+        """
+        Returns:
+            list: Ascending price bucket edges as floats
+        """
+        return [float(edge) for edge in PRICE_BUCKET_EDGES]
+
+    async def fold_inventory_stats(self):
+        """
+        Returns:
+            int: Pending aggregate changes folded (0 if nothing to do)
+        """
+        return 0
+
+    @abstractmethod
+    async def low_stock_items(self, threshold, limit):
+        """
+        Returns:
+            list: Tuple rows with quantity < threshold, lowest first
+        """
+
+
+def _fold(connection):
+    cursor = connection.cursor()
+    try:
+        statements.execute(cursor, FOLD_INVENTORY_STATS)
+        folded = cursor.fetchone()["folded"]
+        connection.commit()
+        return folded
+    finally:
+        cursor.close()
+
+
+def _quantity_results(changes, applied, apply_one):
+    """
+    Per-delta outcomes of a quantity flush
+
+    Args:
+        changes: List of (item_id, [delta, ...])
+        applied: item_id -> new quantity for items whose summed delta fit
+        apply_one: apply_one(item_id, delta) -> new quantity or None, for
+            the items whose sum did not fit
+
+    Returns:
+        dict: See ItemRepository.apply_quantity_deltas
+    """
+    results = {}
+    for item_id, deltas in changes:
+        if item_id in applied:
+            results[item_id] = [applied[item_id]] * len(deltas)
+        else:
+            results[item_id] = [apply_one(item_id, delta) for delta in deltas]
+    return results
+
+
+def _update_item(connection, item_id, item, versions):
+    """Run the update; return (updated row, current row if it missed)"""
+    fields = (item.name, item.description, item.price, item.quantity, item_id)
+    cursor = connection.cursor()
+    try:
+        if versions is None:
+            statements.execute(cursor, UPDATE_ITEM, fields)
+        else:
+            statements.execute(cursor, UPDATE_ITEM_IF_VERSION, fields + (list(versions),))
+        row = cursor.fetchone()
+        current = None
+        if row is None and versions is not None:
+            # A new statement sees every commit up to now, including the
+            # edit the UPDATE lost to (or the delete)
+            statements.execute(cursor, SELECT_ITEM_BY_ID, (item_id,))
+            current = cursor.fetchone()
+        connection.commit()
+        return row, current
+    finally:
+        cursor.close()
+
+
+def _update_quantity(connection, item_id, delta):
+    cursor = connection.cursor()
+    try:
+        statements.execute(cursor, UPDATE_ITEM_QUANTITY, (delta, item_id, delta))
+        row = cursor.fetchone()
+        connection.commit()
+        return row["quantity"] if row else None
+    finally:
+        cursor.close()
+
+
+def _apply_quantity_deltas(connection, changes):
+    totals = sorted((item_id, sum(deltas)) for item_id, deltas in changes)
+    cursor = connection.cursor()
+
+    def apply_one(item_id, delta):
+        statements.execute(cursor, UPDATE_ITEM_QUANTITY, (delta, item_id, delta))
+        row = cursor.fetchone()
+        return row["quantity"] if row else None
+
+    try:
+        statements.execute(cursor, LOCK_ITEMS_BY_IDS, ([item_id for item_id, _ in totals],))
+        applied = {}
+        for start in range(0, len(totals), QUANTITY_UPDATE_CHUNK):
+            chunk = totals[start:start + QUANTITY_UPDATE_CHUNK]
+            statements.execute(cursor, build_quantity_update(len(chunk)), [value for pair in chunk for value in pair])
+            applied.update((row["id"], row["quantity"]) for row in cursor.fetchall())
+        results = _quantity_results(changes, applied, apply_one)
+        connection.commit()
+        return results
+    finally:
+        cursor.close()
+
+
+class _PostgresBulkWriter:
+    """Bulk writer on one pooled connection, loading with COPY"""
+
+    async def __aenter__(self):
+        self._session_context = db_session()
+        self._session = await self._session_context.__aenter__()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        return await self._session_context.__aexit__(exc_type, exc, tb)
+
+    async def insert(self, items):
+        return await self._session.run(copy_items, items)
+
+    async def commit(self):
+        await self._session.commit()
+
+
+class PostgresItemRepository(ItemRepository):
+    """Items in PostgreSQL through the per-worker pool and database threads"""
+
+    name = "postgres"
+    notifies_changes = True
+
+    def __init__(self):
+        super().__init__()
+        self._edges = None
+
+    async def open(self):
+        await asyncio.get_running_loop().run_in_executor(None, get_pool().open)
+
+    async def warm_up(self):
+        return await warm_up_connections(get_pool().min_size)
+
+    async def close(self):
+        shutdown_executor()
+        slow_queries.close()
+        get_pool().close()
+
+    async def ping(self, timeout=None):
+        if timeout is None:
+            await fetch_one("SELECT 1")
+        else:
+            await ping_primary(timeout)
+
+    def pool_stats(self):
+        return pool_stats()
+
+    async def _fetch_item(self, item_id):
+        return await fetch_one(SELECT_ITEM_BY_ID, (item_id,))
+
+    async def get_items(self, ids):
+        return await fetch_all(SELECT_ITEMS_BY_IDS, (list(ids),))
+
+    async def list_items(self, after_id=None, limit=None, filters=None):
+        query, params = build_items_query(after_id=after_id, limit=limit, filters=filters)
+        return await fetch_rows(query, params)
+
+    def stream_items(self, after_id=None, limit=None, filters=None, batch_size=1000):
+        query, params = build_items_query(after_id=after_id, limit=limit, filters=filters)
+        return stream_rows(query, params, batch_size)
+
+    def export_items(self, format, filters=None):
+        return copy_out(*build_export_query(format, filters))
+
+    async def items_version(self):
+        return await fetch_one(SELECT_ITEMS_VERSION)
+
+    def bulk_writer(self):
+        return _PostgresBulkWriter()
+
+    async def update_item(self, item_id, item, versions=None):
+        row, current = await run_in_db(_update_item, item_id, item, versions)
+        if current is not None:
+            raise VersionConflict(current)
+        return row
+
+    async def update_quantity(self, item_id, delta):
+        return await run_in_db(_update_quantity, item_id, delta)
+
+    async def apply_quantity_deltas(self, changes):
+        return await run_in_db(_apply_quantity_deltas, changes)
+
+    async def inventory_stats(self):
+        return await fetch_all(SELECT_INVENTORY_STATS)
+
+    async def price_bucket_edges(self):
+        # The SQL function is IMMUTABLE, so read it once per process
+        if self._edges is None:
+            row = await fetch_one(SELECT_PRICE_BUCKET_EDGES)
+            self._edges = [float(edge) for edge in row["edges"]]
+        return self._edges
+
+    async def fold_inventory_stats(self):
+        return await run_in_db(_fold)
+
+    async def low_stock_items(self, threshold, limit):
+        return await fetch_rows(SELECT_LOW_STOCK_ITEMS, (threshold, limit))
+
+
+# SQLite timestamps are ISO 8601 text in UTC (millisecond precision when
+# set by SQLite itself); created_at is naive like the PostgreSQL column
+_SQLITE_NOW = "strftime('%Y-%m-%dT%H:%M:%f', 'now')"
+
+
+def _sqlite_bucket(column):
+    """SQL expression for a price's histogram bucket (width_bucket rules)"""
+    cases = " ".join(f"WHEN {column} < {edge} THEN {number}" for number, edge in enumerate(PRICE_BUCKET_EDGES))
+    return f"(CASE {cases} ELSE {len(PRICE_BUCKET_EDGES)} END)"
+
+
+def _sqlite_stats_upsert(row, sign):
+    """Trigger statement adding (sign=+1) or removing a row from items_stats"""
+    return f"""
+        INSERT INTO items_stats (bucket, item_count, total_quantity, total_value, price_sum, low_stock_count)
+        VALUES ({_sqlite_bucket(row + '.price')}, {sign}, {sign} * {row}.quantity,
+                {sign} * {row}.price * {row}.quantity, {sign} * {row}.price,
+                {sign} * ({row}.quantity < {LOW_STOCK_THRESHOLD}))
+        ON CONFLICT (bucket) DO UPDATE SET
+            item_count = item_count + excluded.item_count,
+            total_quantity = total_quantity + excluded.total_quantity,
+            total_value = total_value + excluded.total_value,
+            price_sum = price_sum + excluded.price_sum,
+            low_stock_count = low_stock_count + excluded.low_stock_count;"""
+
+
+SQLITE_SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS items (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name TEXT NOT NULL CHECK (length(name) <= 100),
+    description TEXT,
+    price REAL NOT NULL CHECK (price > 0),
+    quantity INTEGER NOT NULL CHECK (quantity >= 0),
+    created_at TEXT NOT NULL DEFAULT ({_SQLITE_NOW}),
+    updated_at TEXT NOT NULL DEFAULT ({_SQLITE_NOW}),
+    version INTEGER NOT NULL DEFAULT 1
+);
+
+CREATE INDEX IF NOT EXISTS idx_items_name ON items (name);
+CREATE INDEX IF NOT EXISTS idx_items_created_at ON items (created_at);
+CREATE INDEX IF NOT EXISTS idx_items_low_stock ON items (quantity, id) WHERE quantity < {LOW_STOCK_THRESHOLD};
+
+-- AFTER triggers run too late for RETURNING, so statements that return
+-- the row set version and updated_at themselves and skip this one
+CREATE TRIGGER IF NOT EXISTS items_touch_updated_at
+AFTER UPDATE ON items WHEN NEW.version = OLD.version
+BEGIN
+    UPDATE items SET updated_at = {_SQLITE_NOW}, version = OLD.version + 1 WHERE id = NEW.id;
+END;
+
+CREATE TABLE IF NOT EXISTS items_version (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    version INTEGER NOT NULL DEFAULT 0,
+    last_modified TEXT NOT NULL DEFAULT ({_SQLITE_NOW})
+);
+
+INSERT OR IGNORE INTO items_version (id) VALUES (1);
+
+CREATE TRIGGER IF NOT EXISTS items_bump_version_insert AFTER INSERT ON items
+BEGIN
+    UPDATE items_version SET version = version + 1, last_modified = {_SQLITE_NOW} WHERE id = 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS items_bump_version_update AFTER UPDATE ON items
+BEGIN
+    UPDATE items_version SET version = version + 1, last_modified = {_SQLITE_NOW} WHERE id = 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS items_bump_version_delete AFTER DELETE ON items
+BEGIN
+    UPDATE items_version SET version = version + 1, last_modified = {_SQLITE_NOW} WHERE id = 1;
+END;
+
+-- One writer at a time, so row triggers keep the totals exact without
+-- the delta table PostgreSQL needs
+CREATE TABLE IF NOT EXISTS items_stats (
+    bucket INTEGER PRIMARY KEY,
+    item_count INTEGER NOT NULL DEFAULT 0,
+    total_quantity INTEGER NOT NULL DEFAULT 0,
+    total_value REAL NOT NULL DEFAULT 0,
+    price_sum REAL NOT NULL DEFAULT 0,
+    low_stock_count INTEGER NOT NULL DEFAULT 0
+);
+
+CREATE TRIGGER IF NOT EXISTS items_stats_insert AFTER INSERT ON items
+BEGIN{_sqlite_stats_upsert('NEW', 1)}
+END;
+
+CREATE TRIGGER IF NOT EXISTS items_stats_update AFTER UPDATE OF price, quantity ON items
+BEGIN{_sqlite_stats_upsert('OLD', -1)}{_sqlite_stats_upsert('NEW', 1)}
+END;
+
+CREATE TRIGGER IF NOT EXISTS items_stats_delete AFTER DELETE ON items
+BEGIN{_sqlite_stats_upsert('OLD', -1)}
+END;
+"""
+
+SQLITE_SELECT_ITEM_BY_ID = f"SELECT {ITEM_COLUMNS} FROM items WHERE id = ?"
+
+SQLITE_SELECT_ITEMS_VERSION = "SELECT version, last_modified FROM items_version WHERE id = 1"
+
+SQLITE_SELECT_INVENTORY_STATS = """
+    SELECT bucket, item_count, total_quantity, total_value, price_sum, low_stock_count, 0 AS pending
+    FROM items_stats
+    ORDER BY bucket
+"""
+
+SQLITE_SELECT_LOW_STOCK_ITEMS = f"""
+    SELECT {ITEM_COLUMNS}
+    FROM items
+    WHERE quantity < {LOW_STOCK_THRESHOLD} AND quantity < ?
+    ORDER BY quantity, id
+    LIMIT ?
+"""
+
+def _sqlite_csv_text(column):
+    """
+    SQL expression quoting a text column the way COPY ... CSV does: only
+    when empty (so it differs from NULL, which stays unquoted and empty)
+    or when it holds a comma, a quote or a line break
+    """
+    return f"""
+        CASE WHEN {column} = '' OR instr({column}, ',') OR instr({column}, '"')
+                  OR instr({column}, char(10)) OR instr({column}, char(13))
+             THEN '"' || replace({column}, '"', '""') || '"'
+             ELSE {column} END
+    """
+
+
+def _sqlite_csv_timestamp(column):
+    """SQL expression printing a stored timestamp like PostgreSQL (no trailing fractional zeros)"""
+    text = f"replace({column}, 'T', ' ')"
+    return f"CASE WHEN instr({column}, '.') THEN rtrim(rtrim({text}, '0'), '.') ELSE {text} END"
+
+
+# One export line per item, built in SQL. CSV lines are byte for byte
+# what PostgreSQL's COPY ... CSV writes for the same rows; NDJSON lines
+# carry the same values
+SQLITE_EXPORT_LINES = {
+    "csv": f"""
+        id || ',' || {_sqlite_csv_text('name')} || ',' || coalesce({_sqlite_csv_text('description')}, '') || ','
+        || printf('%.2f', price) || ',' || quantity || ','
+        || {_sqlite_csv_timestamp('created_at')} || ',' || {_sqlite_csv_timestamp('updated_at')} || '+00' || ','
+        || version
+    """,
+    "ndjson": """
+        json_object('id', id, 'name', name, 'description', description, 'price', price,
+                    'quantity', quantity, 'created_at', created_at, 'updated_at', updated_at || '+00:00',
+                    'version', version)
+    """
+}
+
+SQLITE_EXPORT_HEADERS = {"csv": ITEM_COLUMNS.replace(" ", "") + "\n", "ndjson": ""}
+
+SQLITE_INSERT_ITEM = "INSERT INTO items (name, description, price, quantity, created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?)"
+
+SQLITE_UPDATE_ITEM = f"""
+    UPDATE items SET name = ?, description = ?, price = ?, quantity = ?, updated_at = ?, version = version + 1
+    WHERE id = ?{{version_condition}}
+    RETURNING {ITEM_COLUMNS}
+"""
+
+SQLITE_UPDATE_ITEM_QUANTITY = f"""
+    UPDATE items SET quantity = quantity + ?
+    WHERE id = ? AND quantity + ? BETWEEN 0 AND {MAX_QUANTITY}
+    RETURNING quantity
+"""
+
+
+def _sqlite_quantity_update(count):
+    """SQLite version of queries.build_quantity_update (? placeholders)"""
+    values = ", ".join(["(?, ?)"] * count)
+    return f"""
+        UPDATE items SET quantity = items.quantity + v.delta
+        FROM (SELECT column1 AS id, column2 AS delta FROM (VALUES {values})) AS v
+        WHERE items.id = v.id AND items.quantity + v.delta BETWEEN 0 AND {MAX_QUANTITY}
+        RETURNING id, quantity
+    """
+
+
+# Largest number of ? parameters used in one IN (...) list
+SQLITE_MAX_IN_PARAMS = 500
+
+
+def _sqlite_timestamp(value):
+    """Filter value as stored text: naive UTC, microsecond ISO 8601"""
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value.isoformat(timespec="microseconds")
+
+
+def build_sqlite_items_query(after_id=None, limit=None, filters=None):
+    """
+    SQLite version of queries.build_items_query (same filters, same order)
+
+    Returns:
+        tuple: (sql, params) with ? placeholders
+    """
+    filters = filters or {}
+    conditions = []
+    params = []
+
+    if after_id is not None:
+        conditions.append("id > ?")
+        params.append(after_id)
+
+    if filters.get("name_prefix") is not None:
+        # Case-sensitive prefix as a range, so idx_items_name is used
+        conditions.append("name >= ? AND name < ?")
+        params.extend([filters["name_prefix"], filters["name_prefix"] + "\U0010ffff"])
+    if filters.get("name_contains") is not None:
+        # LIKE ignores case (ASCII only) in SQLite
+        conditions.append("name LIKE ? ESCAPE '\\'")
+        params.append("%" + escape_like(filters["name_contains"]) + "%")
+    if filters.get("created_after") is not None:
+        conditions.append("created_at >= ?")
+        params.append(_sqlite_timestamp(filters["created_after"]))
+    if filters.get("created_before") is not None:
+        conditions.append("created_at < ?")
+        params.append(_sqlite_timestamp(filters["created_before"]))
+
+    bounds = (
+        ("min_price", "price >= ?"),
+        ("max_price", "price <= ?"),
+        ("min_quantity", "quantity >= ?"),
+        ("max_quantity", "quantity <= ?")
+    )
+    for key, condition in bounds:
+        if filters.get(key) is not None:
+            conditions.append(condition)
+            params.append(filters[key])
+
+    sql = f"SELECT {ITEM_COLUMNS} FROM items"
+    if conditions:
+        sql += " WHERE " + " AND ".join(conditions)
+    sql += " ORDER BY id"
+    if limit is not None:
+        sql += " LIMIT ?"
+        params.append(limit)
+
+    return sql, tuple(params)
+
+
+def _utc(text):
+    return datetime.fromisoformat(text).replace(tzinfo=timezone.utc)
+
+
+def _item_row(row):
+    """SQLite row -> tuple with the same Python types psycopg2 returns"""
+    return row[:5] + (datetime.fromisoformat(row[5]), _utc(row[6])) + row[7:]
+
+
+class _SQLiteBulkWriter:
+    """Bulk writer holding the SQLite write transaction"""
+
+    def __init__(self, repository):
+        self._repository = repository
+        self._committed = False
+
+    async def __aenter__(self):
+        await self._repository._write_lock().acquire()
+        try:
+            await self._repository._write(_sqlite_begin)
+        except BaseException:
+            self._repository._write_lock().release()
+            raise
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        # Not awaited: a cancelled request must still end the transaction.
+        # The writer thread runs jobs in order, so the next BEGIN waits.
+        if not self._committed:
+            self._repository._write_executor().submit(_sqlite_rollback, self._repository._writer)
+        self._repository._write_lock().release()
+        return False
+
+    async def insert(self, items):
+        return await self._repository._write(_sqlite_insert, items)
+
+    async def commit(self):
+        await self._repository._write(_sqlite_commit)
+        self._committed = True
+
+
+def _sqlite_upgrade(connection):
+    """Bring a database file created before the version column up to SQLITE_SCHEMA"""
+    columns = [row[1] for row in connection.execute("PRAGMA table_info(items)")]
+    if columns and "version" not in columns:
+        connection.execute("ALTER TABLE items ADD COLUMN version INTEGER NOT NULL DEFAULT 1")
+        # Re-created by SQLITE_SCHEMA with the version bump
+        connection.execute("DROP TRIGGER IF EXISTS items_touch_updated_at")
+
+
+def _sqlite_begin(connection):
+    # IMMEDIATE takes the write lock now, so the transaction never fails
+    # halfway through on another process's write
+    connection.execute("BEGIN IMMEDIATE")
+
+
+def _sqlite_commit(connection):
+    connection.execute("COMMIT")
+
+
+def _sqlite_rollback(connection):
+    if connection.in_transaction:
+        connection.execute("ROLLBACK")
+
+
+def _sqlite_insert(connection, items):
+    now = datetime.now(timezone.utc).replace(tzinfo=None).isoformat(timespec="microseconds")
+    connection.executemany(SQLITE_INSERT_ITEM, [
+        (item.name, item.description, item.price, item.quantity, now, now) for item in items
+    ])
+    return len(items)
+
+
+class SQLiteItemRepository(ItemRepository):
+    """
+    Items in an embedded SQLite database file
+
+    The file uses WAL journaling, so readers never wait for the writer.
+    Reads share a fixed set of read-only connections, one per reader
+    thread, so a reader thread never waits for a connection. A stream
+    holds its connection between batches, so it opens its own and runs on
+    separate stream threads; an open stream can never starve ordinary
+    reads, or be starved by them. Writes go through a single connection on
+    its own thread, one transaction at a time, since SQLite allows one
+    writer. Worker processes each open their own connections to the same
+    file, and SQLite's file locks (with busy_timeout) order their writes.
+    """
+
+    name = "sqlite"
+
+    def __init__(self, path, readers=4, busy_timeout=5.0):
+        """
+        Args:
+            path: Database file, created with the schema if missing
+            readers: Read connections (and reader threads) per process, and
+                stream threads shared by open streams
+            busy_timeout: Seconds to wait for another process's write lock
+        """
+        super().__init__()
+        self.path = path
+        self.readers = readers
+        self.busy_timeout = busy_timeout
+        self._pid = None
+        self._open_lock = threading.Lock()
+        self._readers = None
+        self._writer = None
+        self._read_pool = None
+        self._stream_pool = None
+        self._write_pool = None
+        self._lock = None
+
+        # Statistics
+        self._read_waits = 0
+        self._writes_running = 0
+        self._streams_open = 0
+
+    def _connect(self, read_only):
+        connection = sqlite3.connect(self.path, timeout=self.busy_timeout, isolation_level=None,
+                                     check_same_thread=False)
+        connection.execute("PRAGMA synchronous = NORMAL")
+        if read_only:
+            connection.execute("PRAGMA query_only = 1")
+        return connection
+
+    def _ensure_open(self):
+        """Open this process's connections and threads on first use"""
+        pid = os.getpid()
+        if self._pid == pid:
+            return
+        with self._open_lock:
+            if self._pid == pid:
+                return
+            writer = self._connect(read_only=False)
+            writer.execute("PRAGMA journal_mode = WAL")
+            _sqlite_upgrade(writer)
+            writer.executescript(SQLITE_SCHEMA)
+            readers = queue.SimpleQueue()
+            for _ in range(self.readers):
+                readers.put(self._connect(read_only=True))
+            self._writer = writer
+            self._readers = readers
+            self._read_pool = ThreadPoolExecutor(max_workers=self.readers, thread_name_prefix="sqlite-read")
+            self._stream_pool = ThreadPoolExecutor(max_workers=self.readers, thread_name_prefix="sqlite-stream")
+            self._write_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="sqlite-write")
+            self._lock = None
+            self._pid = pid
+
+    def _write_executor(self):
+        self._ensure_open()
+        return self._write_pool
+
+    def _write_lock(self):
+        # Created on first use so it belongs to the running event loop;
+        # opening first, since a first open resets the lock
+        self._ensure_open()
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        return self._lock
+
+    def _call_reader(self, func, args):
+        connection = self._readers.get()
+        try:
+            return func(connection, *args)
+        finally:
+            self._readers.put(connection)
+
+    async def _read(self, func, *args):
+        """Run func(read connection, *args) on a reader thread"""
+        self._ensure_open()
+        if self._readers.empty():
+            self._read_waits += 1
+        return await asyncio.get_running_loop().run_in_executor(self._read_pool, self._call_reader, func, args)
+
+    async def _open_stream(self):
+        """Open a read connection of a stream's own, on a stream thread"""
+        self._ensure_open()
+        return await asyncio.get_running_loop().run_in_executor(self._stream_pool, self._connect, True)
+
+    async def _write(self, func, *args):
+        """Run func(write connection, *args) on the writer thread"""
+        self._ensure_open()
+        self._writes_running += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._write_pool, func, self._writer, *args)
+        finally:
+            self._writes_running -= 1
+
+    async def open(self):
+        await asyncio.get_running_loop().run_in_executor(None, self._ensure_open)
+
+    async def warm_up(self):
+        await self.open()
+        # Touch every read connection so each has parsed the schema
+        await asyncio.gather(*(self._read(_sqlite_fetch_one, "SELECT COUNT(*) FROM items_version", ())
+                               for _ in range(self.readers)))
+        return self.readers + 1
+
+    async def close(self):
+        if self._pid != os.getpid():
+            return
+        self._read_pool.shutdown(wait=True)
+        self._stream_pool.shutdown(wait=True)
+        self._write_pool.shutdown(wait=True)
+        while not self._readers.empty():
+            self._readers.get().close()
+        self._writer.close()
+        self._pid = None
+
+    async def ping(self, timeout=None):
+        # Readers never wait on locks in WAL mode, so there is nothing to bound
+        await self._read(_sqlite_fetch_one, "SELECT 1", ())
+
+    def pool_stats(self):
+        # The pool is the read connections; the writer and open streams
+        # have connections of their own and never wait for a reader
+        size = self.readers if self._pid == os.getpid() else 0
+        idle = self._readers.qsize() if size else 0
+        return {
+            "size": size,
+            "max_size": self.readers,
+            "in_use": size - idle,
+            "idle": idle,
+            "waits": self._read_waits,
+            "timeouts": 0,
+            "writes_in_progress": self._writes_running,
+            "streams_open": self._streams_open
+        }
+
+    async def _fetch_item(self, item_id):
+        row = await self._read(_sqlite_fetch_one, SQLITE_SELECT_ITEM_BY_ID, (item_id,))
+        return dict(zip(_ITEM_KEYS, _item_row(row))) if row else None
+
+    async def get_items(self, ids):
+        rows = await self._read(_sqlite_fetch_in, list(ids))
+        return [dict(zip(_ITEM_KEYS, _item_row(row))) for row in rows]
+
+    async def list_items(self, after_id=None, limit=None, filters=None):
+        query, params = build_sqlite_items_query(after_id=after_id, limit=limit, filters=filters)
+        rows = await self._read(_sqlite_fetch_all, query, params)
+        return [_item_row(row) for row in rows]
+
+    async def stream_items(self, after_id=None, limit=None, filters=None, batch_size=1000):
+        query, params = build_sqlite_items_query(after_id=after_id, limit=limit, filters=filters)
+        loop = asyncio.get_running_loop()
+        # One connection (and its WAL snapshot) for the whole stream
+        connection = await self._open_stream()
+        cursor = None
+        self._streams_open += 1
+        try:
+            cursor = await loop.run_in_executor(self._stream_pool, connection.execute, query, params)
+            while True:
+                rows = await loop.run_in_executor(self._stream_pool, cursor.fetchmany, batch_size)
+                if not rows:
+                    break
+                yield [_item_row(row) for row in rows]
+        finally:
+            self._streams_open -= 1
+            # Not awaited: a cancelled request must still close the connection
+            self._stream_pool.submit(_sqlite_close_stream, connection, cursor)
+
+    async def export_items(self, format, filters=None, batch_size=1000):
+        # SQLite has no COPY: each round trip joins the lines of the next
+        # batch_size items into one string inside SQLite. The LIMIT keeps
+        # the subquery from being flattened, so its ORDER BY holds.
+        loop = asyncio.get_running_loop()
+        # A connection of its own, like stream_items, held across batches
+        connection = await self._open_stream()
+        self._streams_open += 1
+        try:
+            # One read transaction, so every batch sees the same snapshot
+            await loop.run_in_executor(self._stream_pool, connection.execute, "BEGIN")
+            if SQLITE_EXPORT_HEADERS[format]:
+                yield SQLITE_EXPORT_HEADERS[format].encode()
+            after_id = None
+            while True:
+                query, params = build_sqlite_items_query(after_id=after_id, limit=batch_size, filters=filters)
+                last_id, lines = await loop.run_in_executor(
+                    self._stream_pool, _sqlite_fetch_one, connection,
+                    f"SELECT max(id), group_concat({SQLITE_EXPORT_LINES[format]}, char(10)) FROM ({query})", params
+                )
+                if lines is None:
+                    break
+                yield (lines + "\n").encode()
+                after_id = last_id
+        finally:
+            self._streams_open -= 1
+            # Not awaited: a cancelled request must still close the connection
+            self._stream_pool.submit(_sqlite_close_stream, connection, None)
+
+    async def items_version(self):
+        version, last_modified = await self._read(_sqlite_fetch_one, SQLITE_SELECT_ITEMS_VERSION, ())
+        return {"version": version, "last_modified": _utc(last_modified)}
+
+    def bulk_writer(self):
+        return _SQLiteBulkWriter(self)
+
+    async def update_item(self, item_id, item, versions=None):
+        async with self._write_lock():
+            row, current = await self._write(_sqlite_update_item, item_id, item, versions)
+        if current is not None:
+            raise VersionConflict(dict(zip(_ITEM_KEYS, _item_row(current))))
+        return dict(zip(_ITEM_KEYS, _item_row(row))) if row else None
+
+    async def update_quantity(self, item_id, delta):
+        # The lock keeps this out of a bulk writer's open transaction
+        async with self._write_lock():
+            return await self._write(_sqlite_update_quantity, item_id, delta)
+
+    async def apply_quantity_deltas(self, changes):
+        async with self._write_lock():
+            return await self._write(_sqlite_apply_quantity_deltas, changes)
+
+    async def inventory_stats(self):
+        rows = await self._read(_sqlite_fetch_all, SQLITE_SELECT_INVENTORY_STATS, ())
+        keys = ("bucket", "item_count", "total_quantity", "total_value", "price_sum", "low_stock_count", "pending")
+        return [dict(zip(keys, row)) for row in rows]
+
+    async def low_stock_items(self, threshold, limit):
+        rows = await self._read(_sqlite_fetch_all, SQLITE_SELECT_LOW_STOCK_ITEMS, (threshold, limit))
+        return [_item_row(row) for row in rows]
+
+
+def _sqlite_update_item(connection, item_id, item, versions):
+    now = datetime.now(timezone.utc).replace(tzinfo=None).isoformat(timespec="microseconds")
+    params = [item.name, item.description, item.price, item.quantity, now, item_id]
+    condition = ""
+    if versions is not None:
+        versions = list(versions)[:SQLITE_MAX_IN_PARAMS]
+        condition = f" AND version IN ({', '.join(['?'] * len(versions))})" if versions else " AND 0"
+        params.extend(versions)
+    row = connection.execute(SQLITE_UPDATE_ITEM.format(version_condition=condition), params).fetchone()
+    current = None
+    if row is None and versions is not None:
+        current = connection.execute(SQLITE_SELECT_ITEM_BY_ID, (item_id,)).fetchone()
+    return row, current
+
+
+def _sqlite_update_quantity(connection, item_id, delta):
+    row = connection.execute(SQLITE_UPDATE_ITEM_QUANTITY, (delta, item_id, delta)).fetchone()
+    return row[0] if row else None
+
+
+def _sqlite_apply_quantity_deltas(connection, changes):
+    totals = [(item_id, sum(deltas)) for item_id, deltas in changes]
+    _sqlite_begin(connection)
+    try:
+        applied = {}
+        step = SQLITE_MAX_IN_PARAMS // 2
+        for start in range(0, len(totals), step):
+            chunk = totals[start:start + step]
+            applied.update(connection.execute(
+                _sqlite_quantity_update(len(chunk)), [value for pair in chunk for value in pair]
+            ).fetchall())
+        results = _quantity_results(changes, applied, functools.partial(_sqlite_update_quantity, connection))
+        _sqlite_commit(connection)
+        return results
+    except BaseException:
+        _sqlite_rollback(connection)
+        raise
+
+
+def _sqlite_fetch_one(connection, query, params):
+    return connection.execute(query, params).fetchone()
+
+
+def _sqlite_fetch_all(connection, query, params):
+    return connection.execute(query, params).fetchall()
+
+
+def _sqlite_fetch_in(connection, ids):
+    """Rows for a list of IDs, in chunks that fit SQLite's parameter limit"""
+    rows = []
+    for start in range(0, len(ids), SQLITE_MAX_IN_PARAMS):
+        chunk = ids[start:start + SQLITE_MAX_IN_PARAMS]
+        placeholders = ", ".join("?" * len(chunk))
+        rows.extend(connection.execute(
+            f"SELECT {ITEM_COLUMNS} FROM items WHERE id IN ({placeholders})", chunk
+        ).fetchall())
+    return rows
+
+
+def _sqlite_close_stream(connection, cursor):
+    """Close a stream's connection, ending its read transaction"""
+    if cursor is not None:
+        cursor.close()
+    connection.close()
+
+
+def create_repository(url):
+    """
+    Pick the backend for a DATABASE_URL
+
+    Args:
+        url: sqlite:///path for SQLite, anything else for PostgreSQL
+
+    Returns:
+        ItemRepository: Backend instance (connections open lazily)
+    """
+    if url and url.startswith("sqlite:///"):
+        return SQLiteItemRepository(
+            url[len("sqlite:///"):],
+            readers=int(os.getenv('SQLITE_READERS', '4')),
+            busy_timeout=float(os.getenv('SQLITE_BUSY_TIMEOUT', '5'))
+        )
+    return PostgresItemRepository()
+
+
+# Storage used by the API, chosen from DATABASE_URL
+repository = create_repository(os.getenv('DATABASE_URL'))
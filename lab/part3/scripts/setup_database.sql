@@ -27,13 +27,239 @@ CREATE TABLE IF NOT EXISTS items (
     description TEXT,
     price DECIMAL(10, 2) NOT NULL CHECK (price > 0),
     quantity INTEGER NOT NULL CHECK (quantity >= 0),
-    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    version INTEGER NOT NULL DEFAULT 1
 );
 
+-- Upgrading an existing database:
+-- ALTER TABLE items ADD COLUMN updated_at TIMESTAMPTZ NOT NULL DEFAULT CURRENT_TIMESTAMP;
+-- ALTER TABLE items ADD COLUMN version INTEGER NOT NULL DEFAULT 1;
+-- DROP INDEX idx_items_name; (then re-create it as below)
+
 -- Create index for faster queries
-CREATE INDEX idx_items_name ON items(name);
+-- varchar_pattern_ops lets GET /items?name_prefix= use the index for
+-- LIKE 'prefix%' in any database locale (a plain index only does so
+-- under the C collation)
+CREATE INDEX idx_items_name ON items(name varchar_pattern_ops);
 CREATE INDEX idx_items_created_at ON items(created_at);
 
+-- Optional: trigram index for GET /items?name_contains= (ILIKE '%text%').
+-- Skipped if the pg_trgm extension (postgresql-contrib) is not installed.
+DO $$
+BEGIN
+    IF EXISTS (SELECT 1 FROM pg_available_extensions WHERE name = 'pg_trgm') THEN
+        CREATE EXTENSION IF NOT EXISTS pg_trgm;
+        CREATE INDEX IF NOT EXISTS idx_items_name_trgm ON items USING gin (name gin_trgm_ops);
+    END IF;
+END
+$$;
+
+-- Notify the API's item cache when a row changes or is deleted
+-- (INSERT is skipped: a new ID cannot already be cached, and bulk loads
+-- would otherwise send one notification per row)
+CREATE OR REPLACE FUNCTION notify_item_changed() RETURNS trigger AS $$
+BEGIN
+    PERFORM pg_notify('items_changed', OLD.id::text);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER items_notify_changed
+    AFTER UPDATE OR DELETE ON items
+    FOR EACH ROW EXECUTE FUNCTION notify_item_changed();
+
+-- Keep updated_at current and bump the row version on every UPDATE, so
+-- no write path can forget to. The API derives each item's ETag from the
+-- version, and PUT /items/{id} only writes while it still matches
+CREATE OR REPLACE FUNCTION touch_item_updated_at() RETURNS trigger AS $$
+BEGIN
+    NEW.updated_at := clock_timestamp();
+    NEW.version := OLD.version + 1;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER items_touch_updated_at
+    BEFORE UPDATE ON items
+    FOR EACH ROW EXECUTE FUNCTION touch_item_updated_at();
+
+-- Table-wide version for GET /items ETags. Every writing statement bumps
+-- one of 8 counters (picked by backend PID) so concurrent writers rarely
+-- wait on the same row; readers use SUM(version).
+CREATE TABLE IF NOT EXISTS items_version (
+    shard SMALLINT PRIMARY KEY,
+    version BIGINT NOT NULL DEFAULT 0,
+    last_modified TIMESTAMPTZ NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+
+INSERT INTO items_version (shard)
+SELECT generate_series(0, 7)
+ON CONFLICT DO NOTHING;
+
+CREATE OR REPLACE FUNCTION bump_items_version() RETURNS trigger AS $$
+BEGIN
+    UPDATE items_version
+    SET version = version + 1, last_modified = clock_timestamp()
+    WHERE shard = pg_backend_pid() % 8;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER items_bump_version
+    AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON items
+    FOR EACH STATEMENT EXECUTE FUNCTION bump_items_version();
+
+-- Inventory analytics (GET /analytics/*), maintained incrementally.
+-- items_stats holds one row of totals per price bucket. Writers never
+-- update it directly: statement triggers append per-bucket deltas
+-- computed from the transition tables (one row per bucket per
+-- statement, so a 50k-row COPY adds at most 10), and the API folds the
+-- deltas into items_stats every few seconds with fold_items_stats().
+-- Reads sum items_stats plus pending deltas, which costs the same
+-- however many items there are.
+
+-- Price histogram bucket edges (width_bucket). Counting edges from 0, as
+-- analytics.histogram does: bucket 0 holds prices below edges[0], bucket n
+-- prices in [edges[n-1], edges[n]) and the last bucket everything above
+CREATE OR REPLACE FUNCTION items_price_bucket_edges() RETURNS NUMERIC[] AS $$
+    SELECT ARRAY[10, 50, 100, 500, 1000, 5000, 10000, 50000, 100000]::NUMERIC[]
+$$ LANGUAGE sql IMMUTABLE;
+
+CREATE OR REPLACE FUNCTION items_price_bucket(price NUMERIC) RETURNS SMALLINT AS $$
+    SELECT width_bucket(price, items_price_bucket_edges())::SMALLINT
+$$ LANGUAGE sql IMMUTABLE;
+
+-- Low stock means quantity < 20 (LOW_STOCK_THRESHOLD in queries.py);
+-- the partial index serves GET /analytics/low-stock without a scan
+CREATE INDEX IF NOT EXISTS idx_items_low_stock ON items (quantity, id) WHERE quantity < 20;
+
+CREATE TABLE IF NOT EXISTS items_stats (
+    bucket SMALLINT PRIMARY KEY,
+    item_count BIGINT NOT NULL DEFAULT 0,
+    total_quantity BIGINT NOT NULL DEFAULT 0,
+    total_value NUMERIC NOT NULL DEFAULT 0,
+    price_sum NUMERIC NOT NULL DEFAULT 0,
+    low_stock_count BIGINT NOT NULL DEFAULT 0
+);
+
+CREATE TABLE IF NOT EXISTS items_stats_delta (
+    id BIGSERIAL PRIMARY KEY,
+    bucket SMALLINT NOT NULL,
+    item_count BIGINT NOT NULL,
+    total_quantity BIGINT NOT NULL,
+    total_value NUMERIC NOT NULL,
+    price_sum NUMERIC NOT NULL,
+    low_stock_count BIGINT NOT NULL
+);
+
+CREATE OR REPLACE FUNCTION record_items_stats_delta() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        INSERT INTO items_stats_delta (bucket, item_count, total_quantity, total_value, price_sum, low_stock_count)
+        SELECT items_price_bucket(price), count(*), sum(quantity), sum(price * quantity), sum(price),
+               count(*) FILTER (WHERE quantity < 20)
+        FROM new_rows
+        GROUP BY 1;
+    ELSIF TG_OP = 'DELETE' THEN
+        INSERT INTO items_stats_delta (bucket, item_count, total_quantity, total_value, price_sum, low_stock_count)
+        SELECT items_price_bucket(price), -count(*), -sum(quantity), -sum(price * quantity), -sum(price),
+               -count(*) FILTER (WHERE quantity < 20)
+        FROM old_rows
+        GROUP BY 1;
+    ELSE
+        -- New rows count +1, old rows -1; buckets that did not change cancel out
+        INSERT INTO items_stats_delta (bucket, item_count, total_quantity, total_value, price_sum, low_stock_count)
+        SELECT bucket, item_count, total_quantity, total_value, price_sum, low_stock_count
+        FROM (
+            SELECT bucket, sum(sign) AS item_count, sum(sign * quantity) AS total_quantity,
+                   sum(sign * price * quantity) AS total_value, sum(sign * price) AS price_sum,
+                   COALESCE(sum(sign) FILTER (WHERE quantity < 20), 0) AS low_stock_count
+            FROM (
+                SELECT items_price_bucket(price) AS bucket, 1 AS sign, price, quantity FROM new_rows
+                UNION ALL
+                SELECT items_price_bucket(price), -1, price, quantity FROM old_rows
+            ) AS changes
+            GROUP BY bucket
+        ) AS totals
+        WHERE item_count <> 0 OR total_quantity <> 0 OR total_value <> 0
+           OR price_sum <> 0 OR low_stock_count <> 0;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Transition tables need one trigger per event
+CREATE TRIGGER items_stats_insert
+    AFTER INSERT ON items REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION record_items_stats_delta();
+CREATE TRIGGER items_stats_update
+    AFTER UPDATE ON items REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION record_items_stats_delta();
+CREATE TRIGGER items_stats_delete
+    AFTER DELETE ON items REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION record_items_stats_delta();
+
+-- Move committed deltas into items_stats. Every API worker calls this
+-- periodically; the advisory lock lets only one of them do the work.
+CREATE OR REPLACE FUNCTION fold_items_stats() RETURNS BIGINT AS $$
+DECLARE
+    folded BIGINT;
+BEGIN
+    IF NOT pg_try_advisory_xact_lock(hashtext('fold_items_stats')) THEN
+        RETURN 0;
+    END IF;
+    WITH moved AS (
+        DELETE FROM items_stats_delta RETURNING *
+    ), totals AS (
+        SELECT bucket, count(*) AS deltas, sum(item_count) AS item_count, sum(total_quantity) AS total_quantity,
+               sum(total_value) AS total_value, sum(price_sum) AS price_sum, sum(low_stock_count) AS low_stock_count
+        FROM moved
+        GROUP BY bucket
+    ), applied AS (
+        INSERT INTO items_stats AS s (bucket, item_count, total_quantity, total_value, price_sum, low_stock_count)
+        SELECT bucket, item_count, total_quantity, total_value, price_sum, low_stock_count FROM totals
+        ON CONFLICT (bucket) DO UPDATE SET
+            item_count = s.item_count + EXCLUDED.item_count,
+            total_quantity = s.total_quantity + EXCLUDED.total_quantity,
+            total_value = s.total_value + EXCLUDED.total_value,
+            price_sum = s.price_sum + EXCLUDED.price_sum,
+            low_stock_count = s.low_stock_count + EXCLUDED.low_stock_count
+    )
+    SELECT COALESCE(sum(deltas), 0) INTO folded FROM totals;
+    RETURN folded;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Recompute everything from items (initial load, TRUNCATE, or a check)
+CREATE OR REPLACE FUNCTION rebuild_items_stats() RETURNS void AS $$
+BEGIN
+    LOCK TABLE items IN SHARE MODE;
+    DELETE FROM items_stats_delta;
+    DELETE FROM items_stats;
+    INSERT INTO items_stats (bucket, item_count, total_quantity, total_value, price_sum, low_stock_count)
+    SELECT items_price_bucket(price), count(*), sum(quantity), sum(price * quantity), sum(price),
+           count(*) FILTER (WHERE quantity < 20)
+    FROM items
+    GROUP BY 1;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION reset_items_stats() RETURNS trigger AS $$
+BEGIN
+    DELETE FROM items_stats_delta;
+    DELETE FROM items_stats;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER items_stats_truncate
+    AFTER TRUNCATE ON items
+    FOR EACH STATEMENT EXECUTE FUNCTION reset_items_stats();
+
+-- Upgrading an existing database: run this section, then
+-- SELECT rebuild_items_stats();
+
 -- ========================================
 -- 4. Insert Sample Data
 -- ========================================
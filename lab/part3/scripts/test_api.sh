@@ -27,8 +27,10 @@ echo ""
 
 # Test 2: Health check
 echo -e "${YELLOW}Test 2: Health Check${NC}"
-echo "GET /health"
-curl -s "${API_URL}/health" | python3 -m json.tool
+echo "GET /health/live"
+curl -s "${API_URL}/health/live" | python3 -m json.tool
+echo "GET /health/ready"
+curl -s "${API_URL}/health/ready" | python3 -m json.tool
 echo ""
 echo "---"
 echo ""
@@ -0,0 +1,119 @@
+"""
+Query Plan Tests
+Seeds a large copy of the items table and verifies with EXPLAIN that the
+GET /items filters are answered by index scans
+
+The copy is a temporary table that shadows items for this session only,
+with the same indexes as the real table, so the real data is untouched.
+Skipped unless DATABASE_URL points at a PostgreSQL server.
+
+Usage (from the project directory, with .env configured):
+    python -m pytest app/test_query_plans.py
+    QUERY_PLAN_ROWS=100000 python -m pytest app/test_query_plans.py
+"""
+
+import os
+from datetime import datetime
+
+import pytest
+
+from app.database import get_db_connection, close_db_connection
+from app.queries import build_items_query
+
+# Rows in the seeded copy; the planner only prefers indexes on a large table
+QUERY_PLAN_ROWS = int(os.getenv('QUERY_PLAN_ROWS', '500000'))
+
+# (description, after_id, limit, filters, index that must appear in the plan)
+CHECKS = [
+    ("first page", None, 50, {}, "items_pkey"),
+    ("deep keyset page", 250000, 50, {}, "items_pkey"),
+    ("name prefix", None, None, {"name_prefix": "Item 12345"}, "idx_items_name"),
+    ("name substring", None, None, {"name_contains": "m 4242"}, "idx_items_name_trgm"),
+    ("created_at range", None, None,
+     {"created_after": datetime(2025, 3, 1), "created_before": datetime(2025, 3, 2)},
+     "idx_items_created_at"),
+    ("created_at range + price bounds", None, None,
+     {"created_after": datetime(2025, 3, 1), "created_before": datetime(2025, 3, 2),
+      "min_price": 100, "max_price": 200},
+     "idx_items_created_at")
+]
+
+
+def plan_indexes(node):
+    """Collect every index name used anywhere in an EXPLAIN (FORMAT JSON) plan"""
+    names = set()
+    if "Index Name" in node:
+        names.add(node["Index Name"])
+    for child in node.get("Plans", []):
+        names |= plan_indexes(child)
+    return names
+
+
+def seed(cursor, rows):
+    """Create and fill a temporary items table with the real table's indexes"""
+    cursor.execute("""
+        CREATE TEMP TABLE items
+        (LIKE public.items INCLUDING DEFAULTS INCLUDING CONSTRAINTS)
+    """)
+    cursor.execute("""
+        INSERT INTO pg_temp.items (id, name, description, price, quantity, created_at)
+        SELECT g, 'Item ' || g, 'Seeded row ' || g, 1 + (g %% 5000), g %% 300,
+               TIMESTAMP '2025-01-01' + (g %% 365) * INTERVAL '1 day' + (g %% 86400) * INTERVAL '1 second'
+        FROM generate_series(1, %s) AS g
+    """, (rows,))
+
+    # Recreate the real table's indexes (same names) on the copy
+    cursor.execute("""
+        SELECT indexname, indexdef FROM pg_indexes
+        WHERE schemaname = 'public' AND tablename = 'items'
+    """)
+    for row in cursor.fetchall():
+        name, definition = row["indexname"], row["indexdef"]
+        if name == "items_pkey":
+            cursor.execute("ALTER TABLE pg_temp.items ADD CONSTRAINT items_pkey PRIMARY KEY (id)")
+        else:
+            cursor.execute(definition.replace(" ON public.items ", " ON pg_temp.items "))
+    cursor.execute("ANALYZE pg_temp.items")
+
+    cursor.execute("""
+        SELECT c.relname FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid
+        WHERE i.indrelid = 'pg_temp.items'::regclass
+    """)
+    return {row["relname"] for row in cursor.fetchall()}
+
+
+@pytest.fixture(scope="module")
+def seeded():
+    """(cursor on the seeded copy, index names it has)"""
+    url = os.getenv('DATABASE_URL')
+    if not url or url.startswith("sqlite:///"):
+        pytest.skip("DATABASE_URL does not point at a PostgreSQL server")
+    try:
+        connection = get_db_connection()
+    except Exception as e:
+        pytest.skip(f"no database: {e}")
+    try:
+        cursor = connection.cursor()
+        yield cursor, seed(cursor, QUERY_PLAN_ROWS)
+    finally:
+        # Temporary table and indexes disappear with the rollback
+        connection.rollback()
+        close_db_connection(connection)
+
+
+@pytest.mark.parametrize(
+    "after_id, limit, filters, index",
+    [check[1:] for check in CHECKS],
+    ids=[check[0] for check in CHECKS]
+)
+def test_filter_uses_index(seeded, after_id, limit, filters, index):
+    cursor, available = seeded
+    if index not in available:
+        pytest.skip(f"{index} does not exist")
+    query, params = build_items_query(after_id=after_id, limit=limit, filters=filters)
+    cursor.execute("EXPLAIN (FORMAT JSON) " + query, params)
+    used = plan_indexes(cursor.fetchone()["QUERY PLAN"][0]["Plan"])
+    if index not in used:
+        cursor.execute("EXPLAIN " + query, params)
+        plan = "\n".join(row["QUERY PLAN"] for row in cursor.fetchall())
+        pytest.fail(f"expected {index}, plan uses {sorted(used) or 'no index'}:\n{plan}")
@@ -0,0 +1,281 @@
+"""
+Repository Contract Tests
+Runs the same tests against every item repository backend, so the
+PostgreSQL and SQLite implementations behave the same for the API
+
+SQLite runs on a temporary file and always runs. PostgreSQL uses
+DATABASE_URL and is skipped unless it points at a server: the tests
+insert rows tagged with a random name prefix and delete them again at
+the end, so point it at a development database.
+
+Usage (from the project directory, with .env configured):
+    python -m pytest app/test_repositories.py
+    python -m pytest app/test_repositories.py -k sqlite     # no server needed
+"""
+
+import asyncio
+import csv
+import io
+import json
+import os
+import secrets
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from app.async_database import run_in_db
+from app.benchmark_repositories import _delete_tagged
+from app.models import ItemBase
+from app.queries import ITEM_COLUMNS, PRICE_BUCKET_EDGES
+from app.repository import PostgresItemRepository, SQLiteItemRepository, VersionConflict
+
+KEYS = tuple(name.strip() for name in ITEM_COLUMNS.split(","))
+
+
+def sample_items(tag):
+    """Items inserted by the checks; names all start with tag"""
+    return [
+        ItemBase(name=f"{tag} Alpha", description="first", price=5.25, quantity=3),
+        ItemBase(name=f"{tag} beta", description=None, price=75.0, quantity=40),
+        ItemBase(name=f"{tag} Gamma 100%", description="with_wildcards", price=2500.0, quantity=0)
+    ]
+
+
+async def totals(repository):
+    rows = await repository.inventory_stats()
+    return (sum(row["item_count"] for row in rows), sum(row["total_quantity"] for row in rows),
+            sum(row["low_stock_count"] for row in rows))
+
+
+def contract_checks(repository, tag):
+    """
+    The checks every backend must pass, in order
+
+    Later checks use the rows and IDs the insert check leaves in `state`.
+
+    Returns:
+        list: (description, coroutine function) pairs
+    """
+    state = {}
+    items = sample_items(tag)
+    prefix = {"name_prefix": tag}
+
+    async def ping():
+        await repository.ping()
+
+    async def insert_and_commit():
+        state["version"] = await repository.items_version()
+        state["totals"] = await totals(repository)
+        async with repository.bulk_writer() as writer:
+            written = await writer.insert(items[:2])
+            written += await writer.insert(items[2:])
+            await writer.commit()
+        assert written == 3, f"insert reported {written} rows, expected 3"
+        rows = await repository.list_items(filters=prefix)
+        assert len(rows) == 3, f"{len(rows)} rows after commit, expected 3"
+        state["ids"] = [row[0] for row in rows]
+
+    async def rollback_without_commit():
+        async with repository.bulk_writer() as writer:
+            await writer.insert([ItemBase(name=f"{tag} rolled back", price=1, quantity=1)])
+        rows = await repository.list_items(filters={"name_prefix": f"{tag} rolled"})
+        assert rows == [], "rows of an uncommitted bulk load are visible"
+
+    async def version_changes():
+        version = await repository.items_version()
+        assert version["version"] != state["version"]["version"], "version did not change after a write"
+        stamp = version["last_modified"]
+        assert isinstance(stamp, datetime) and stamp.tzinfo is not None, "last_modified is not an aware datetime"
+
+    async def list_rows():
+        rows = await repository.list_items(filters=prefix)
+        assert [row[0] for row in rows] == sorted(row[0] for row in rows), "rows are not ordered by id"
+        for row, item in zip(rows, items):
+            assert len(row) == len(KEYS), f"row has {len(row)} columns, expected {len(KEYS)}"
+            assert ((row[1], row[2], float(row[3]), row[4]) ==
+                    (item.name, item.description, item.price, item.quantity)), f"row {row} does not match {item}"
+            assert isinstance(row[5], datetime) and row[5].tzinfo is None, "created_at is not a naive datetime"
+            assert isinstance(row[6], datetime) and row[6].tzinfo is not None, "updated_at is not an aware datetime"
+            assert row[7] == 1, f"new row is at version {row[7]}, expected 1"
+
+    async def get_one():
+        item = await repository.get_item(state["ids"][0])
+        assert isinstance(item, dict) and tuple(item) == KEYS, f"get_item returned {item!r}"
+        assert item["name"] == items[0].name, "get_item returned the wrong row"
+        assert await repository.get_item(0) is None, "get_item(0) is not None"
+
+    async def get_many():
+        found = await repository.get_items(state["ids"] + [0])
+        assert sorted(row["id"] for row in found) == sorted(state["ids"]), "get_items returned the wrong rows"
+
+    async def keyset_pages():
+        first = await repository.list_items(limit=2, filters=prefix)
+        rest = await repository.list_items(after_id=first[-1][0], limit=2, filters=prefix)
+        assert [row[0] for row in first + rest] == state["ids"], "pages do not add up to the full list"
+
+    async def filters():
+        cases = [
+            ({"name_prefix": f"{tag} b"}, [1]),
+            ({"name_prefix": f"{tag} B"}, []),
+            ({"name_contains": f"{tag} ALPHA"}, [0]),
+            ({"name_contains": "100%"}, [2]),
+            ({"name_contains": "_"}, []),
+            ({"min_price": 5.25, "max_price": 75}, [0, 1]),
+            ({"min_quantity": 1, "max_quantity": 3}, [0]),
+            ({"created_after": datetime.now(timezone.utc) - timedelta(hours=1)}, [0, 1, 2]),
+            ({"created_before": datetime.now(timezone.utc) - timedelta(hours=1)}, [])
+        ]
+        for extra, expected in cases:
+            rows = await repository.list_items(filters=dict(prefix, **extra) if "name_prefix" not in extra else extra)
+            got = [state["ids"].index(row[0]) for row in rows if row[0] in state["ids"]]
+            assert got == expected, f"filter {extra} matched {got}, expected {expected}"
+
+    async def stream_batches():
+        batches = [batch async for batch in repository.stream_items(filters=prefix, batch_size=2)]
+        assert [len(batch) for batch in batches] == [2, 1], f"batch sizes {[len(b) for b in batches]}, expected [2, 1]"
+        stream = repository.stream_items(filters=prefix, batch_size=1)
+        await stream.__anext__()
+        await stream.aclose()
+        assert len(await repository.list_items(filters=prefix)) == 3, "repository unusable after a closed stream"
+
+    async def export():
+        filters = dict(prefix, max_price=100)
+        text = b"".join([chunk async for chunk in repository.export_items("csv", filters)]).decode()
+        rows = list(csv.reader(io.StringIO(text)))
+        assert tuple(rows[0]) == KEYS, f"CSV header {rows[0]}"
+        assert ([(int(row[0]), row[1], row[2] or None, float(row[3]), int(row[4])) for row in rows[1:]] ==
+                [(state["ids"][i], items[i].name, items[i].description, items[i].price, items[i].quantity)
+                 for i in (0, 1)]), f"CSV rows {rows[1:]}"
+        text = b"".join([chunk async for chunk in repository.export_items("ndjson", prefix)]).decode()
+        objects = [json.loads(line) for line in text.splitlines()]
+        assert [tuple(obj) for obj in objects] == [KEYS] * 3, "NDJSON keys differ from the item columns"
+        assert [obj["id"] for obj in objects] == state["ids"], "NDJSON rows are not the inserted items in ID order"
+        assert objects[2]["name"] == items[2].name and objects[1]["description"] is None, "NDJSON values differ"
+        stream = repository.export_items("ndjson", prefix)
+        await stream.__anext__()
+        await stream.aclose()
+        assert await repository.get_item(state["ids"][0]) is not None, "repository unusable after a closed export"
+
+    async def analytics():
+        await repository.fold_inventory_stats()
+        count, quantity, low = await totals(repository)
+        before = state["totals"]
+        assert count - before[0] == 3, f"item_count grew by {count - before[0]}, expected 3"
+        assert quantity - before[1] == 43, f"total_quantity grew by {quantity - before[1]}, expected 43"
+        assert low - before[2] == 2, f"low_stock_count grew by {low - before[2]}, expected 2"
+        edges = await repository.price_bucket_edges()
+        assert edges == [float(edge) for edge in PRICE_BUCKET_EDGES], f"bucket edges {edges}"
+
+    async def low_stock():
+        rows = await repository.low_stock_items(20, 100000)
+        ours = [row[0] for row in rows if row[0] in state["ids"]]
+        assert ours == [state["ids"][2], state["ids"][0]], f"low stock order {ours}"
+        quantities = [row[4] for row in rows]
+        assert quantities == sorted(quantities), "low stock rows are not ordered by quantity"
+        rows = await repository.low_stock_items(1, 100000)
+        assert all(row[4] < 1 for row in rows), "threshold not applied"
+
+    async def quantities():
+        first, second, third = state["ids"]
+        results = await repository.apply_quantity_deltas([
+            (first, [-1, -1]), (second, [-30, -30, 5]), (third, [-1]), (0, [1])
+        ])
+        # first: the sum fits; second: applied one by one, the second -30
+        # rejected; third would go negative; item 0 does not exist
+        expected = {first: [1, 1], second: [10, None, 15], third: [None], 0: [None]}
+        assert results == expected, f"apply_quantity_deltas returned {results}, expected {expected}"
+        assert await repository.update_quantity(third, 2) == 2, "update_quantity did not apply"
+        assert await repository.update_quantity(third, -5) is None, "update_quantity took quantity below zero"
+        found = {row["id"]: row["quantity"] for row in await repository.get_items(state["ids"])}
+        assert found == {first: 1, second: 15, third: 2}, f"stored quantities {found}"
+        # Every applied change bumps the version, rejected ones do not
+        versions = {row["id"]: row["version"] for row in await repository.get_items(state["ids"])}
+        assert versions == {first: 2, second: 3, third: 2}, f"versions after quantity updates {versions}"
+
+    async def conditional_updates():
+        first = state["ids"][0]
+        before = await repository.get_item(first)
+        change = ItemBase(name=f"{tag} Alpha edited", description="edited", price=6.5, quantity=4)
+        updated = await repository.update_item(first, change, [before["version"]])
+        assert updated is not None and tuple(updated) == KEYS, f"update_item returned {updated!r}"
+        assert updated["version"] == before["version"] + 1, f"version {updated['version']} after one update"
+        assert ((updated["name"], updated["description"], float(updated["price"]), updated["quantity"]) ==
+                (change.name, change.description, change.price, change.quantity)), f"updated row {updated}"
+        assert updated["updated_at"] > before["updated_at"], "updated_at did not move"
+        for stale in ([before["version"]], []):
+            with pytest.raises(VersionConflict) as conflict:
+                await repository.update_item(first, change, stale)
+            current = conflict.value.current["version"]
+            assert current == updated["version"], f"conflict reported version {current}"
+        assert await repository.update_item(0, change, [1]) is None, "conditional update of a missing item returned a row"
+        assert await repository.update_item(0, change) is None, "update of a missing item returned a row"
+        forced = await repository.update_item(first, change)
+        assert forced is not None and forced["version"] == before["version"] + 2, "unconditional update not applied"
+        assert (await repository.get_item(first))["version"] == forced["version"], "stored version differs"
+
+    return [
+        ("ping", ping),
+        ("bulk insert + commit", insert_and_commit),
+        ("bulk insert without commit rolls back", rollback_without_commit),
+        ("version changes on write", version_changes),
+        ("list rows and types", list_rows),
+        ("get_item", get_one),
+        ("get_items", get_many),
+        ("keyset pagination", keyset_pages),
+        ("filters", filters),
+        ("streaming", stream_batches),
+        ("export", export),
+        ("inventory stats", analytics),
+        ("low stock list", low_stock),
+        ("quantity updates", quantities),
+        ("conditional updates", conditional_updates)
+    ]
+
+
+# Later checks need the rows these leave behind
+PREREQUISITES = ("ping", "bulk insert + commit")
+
+CHECKS = [description for description, _ in contract_checks(None, "")]
+
+
+@pytest.fixture(scope="module")
+def loop():
+    loop = asyncio.new_event_loop()
+    yield loop
+    loop.close()
+
+
+@pytest.fixture(scope="module", params=["postgres", "sqlite"])
+def backend(request, loop, tmp_path_factory):
+    """(checks by description, failed prerequisites) for one opened backend"""
+    tag = f"test-{secrets.token_hex(4)}"
+    if request.param == "postgres":
+        url = os.getenv('DATABASE_URL')
+        if not url or url.startswith("sqlite:///"):
+            pytest.skip("DATABASE_URL does not point at a PostgreSQL server")
+        repository = PostgresItemRepository()
+    else:
+        repository = SQLiteItemRepository(str(tmp_path_factory.mktemp("sqlite") / "items.db"))
+
+    loop.run_until_complete(repository.open())
+    try:
+        yield dict(contract_checks(repository, tag)), set()
+    finally:
+        try:
+            if request.param == "postgres":
+                loop.run_until_complete(run_in_db(_delete_tagged, tag))
+        finally:
+            loop.run_until_complete(repository.close())
+
+
+@pytest.mark.parametrize("check", CHECKS)
+def test_contract(loop, backend, check):
+    checks, failed = backend
+    if failed:
+        pytest.skip(f"depends on {', '.join(sorted(failed))}, which failed")
+    try:
+        loop.run_until_complete(checks[check]())
+    except BaseException:
+        if check in PREREQUISITES:
+            failed.add(check)
+        raise
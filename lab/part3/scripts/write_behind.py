@@ -0,0 +1,269 @@
+"""
+Write-Behind Module
+Buffers item quantity changes in memory, summed per item, and writes them
+in one statement per flush instead of one UPDATE per request
+"""
+
+import asyncio
+import os
+import time
+
+from app.cache import item_cache
+from app.metrics import metrics
+from app.repository import repository
+
+
+class WriteBacklogFull(Exception):
+    """Too many changes are waiting for a flush; the caller should retry"""
+
+
+class _Pending:
+    """Changes to one item since the last flush, in arrival order"""
+
+    def __init__(self):
+        self.deltas = []
+        self.waiters = []
+
+    @property
+    def total(self):
+        return sum(self.deltas)
+
+
+class QuantityWriter:
+    """
+    Write-behind buffer for PATCH /items/{id}/quantity
+
+    Changes are summed per item and written every `interval` seconds (or
+    as soon as `max_items` items are waiting) with
+    repository.apply_quantity_deltas(), so a thousand checkouts of one
+    item cost one row update. The guarded UPDATE keeps quantity >= 0: a
+    change that does not fit is rejected at flush time, and callers that
+    wait for the flush learn which.
+
+    A buffered change reaches the database within one interval plus the
+    flush itself. stop() writes whatever is still buffered, so a clean
+    shutdown loses nothing. Only used from the event loop thread.
+    """
+
+    def __init__(self, interval=0.05, max_items=1000, max_pending=100000):
+        """
+        Args:
+            interval: Seconds between flushes (0 writes every change at once)
+            max_items: Flush early when this many items have changes waiting
+            max_pending: Refuse new changes while this many are buffered
+        """
+        self.interval = interval
+        self.max_items = max_items
+        self.max_pending = max_pending
+        self._pending = {}
+        self._pending_changes = 0
+        self._task = None
+        self._wake = None
+        self._flush_lock = None
+
+        # Statistics
+        self._flushes = 0
+        self._items_flushed = 0
+        self._applied = 0
+        self._rejected = 0
+        self._failures = 0
+        self._last_flush_seconds = None
+        self._max_flush_seconds = 0.0
+        self.error = None
+
+    @property
+    def enabled(self):
+        return self.interval > 0
+
+    def pending(self, item_id):
+        """Sum of the changes to item_id waiting for the next flush"""
+        entry = self._pending.get(item_id)
+        return entry.total if entry else 0
+
+    def add(self, item_id, delta, wait=False):
+        """
+        Buffer a change to an item's quantity
+
+        Args:
+            item_id: Item to change
+            delta: Amount to add (negative to take stock)
+            wait: Return a future for the outcome
+
+        Returns:
+            asyncio.Future: With wait, resolves to the quantity after the
+                flush that applied the change, or None if it was rejected.
+                Cancelling it does not withdraw the change. Without wait,
+                None.
+
+        Raises:
+            WriteBacklogFull: If max_pending changes are already waiting
+        """
+        if self._pending_changes >= self.max_pending:
+            raise WriteBacklogFull(f"{self._pending_changes} quantity changes waiting for a flush")
+        entry = self._pending.get(item_id)
+        if entry is None:
+            entry = self._pending[item_id] = _Pending()
+        future = asyncio.get_running_loop().create_future() if wait else None
+        entry.deltas.append(delta)
+        entry.waiters.append(future)
+        self._pending_changes += 1
+        if len(self._pending) >= self.max_items and self._wake is not None:
+            self._wake.set()
+        return future
+
+    async def apply(self, item_id, delta):
+        """
+        Write one change right away, bypassing the buffer
+
+        Returns:
+            int: New quantity, or None if the change was rejected
+        """
+        quantity = await repository.update_quantity(item_id, delta)
+        item_cache.invalidate(item_id)
+        self._count([quantity])
+        return quantity
+
+    async def flush(self):
+        """
+        Write every buffered change now
+
+        On a database error, changes whose callers wait for the outcome
+        fail with that error; the others go back into the buffer for the
+        next flush.
+
+        Returns:
+            int: Changes written (applied or rejected)
+        """
+        if self._flush_lock is None:
+            self._flush_lock = asyncio.Lock()
+        async with self._flush_lock:
+            if not self._pending:
+                return 0
+            batch, self._pending = self._pending, {}
+            count = sum(len(entry.deltas) for entry in batch.values())
+            self._pending_changes -= count
+
+            start = time.perf_counter()
+            try:
+                results = await repository.apply_quantity_deltas(
+                    [(item_id, entry.deltas) for item_id, entry in batch.items()]
+                )
+            except Exception as e:
+                self._failures += 1
+                self.error = str(e) or type(e).__name__
+                print(f"Quantity flush error: {self.error}")
+                self._requeue(batch, e)
+                return 0
+            elapsed = time.perf_counter() - start
+
+            self._flushes += 1
+            self._items_flushed += len(batch)
+            self._last_flush_seconds = elapsed
+            self._max_flush_seconds = max(self._max_flush_seconds, elapsed)
+            self.error = None
+            metrics.observe("quantity_flush_duration_seconds", (), elapsed)
+
+            for item_id, entry in batch.items():
+                item_cache.invalidate(item_id)
+                quantities = results[item_id]
+                self._count(quantities)
+                for quantity, future in zip(quantities, entry.waiters):
+                    if future is not None and not future.done():
+                        future.set_result(quantity)
+            return count
+
+    def _count(self, quantities):
+        rejected = quantities.count(None)
+        applied = len(quantities) - rejected
+        self._applied += applied
+        self._rejected += rejected
+        if applied:
+            metrics.inc("quantity_changes_total", (("outcome", "applied"),), applied)
+        if rejected:
+            metrics.inc("quantity_changes_total", (("outcome", "rejected"),), rejected)
+
+    def _requeue(self, batch, error):
+        """Put a failed batch's unwaited changes back, ahead of newer ones"""
+        newer, self._pending = self._pending, {}
+        for item_id, entry in batch.items():
+            kept = _Pending()
+            for delta, future in zip(entry.deltas, entry.waiters):
+                if future is None:
+                    kept.deltas.append(delta)
+                    kept.waiters.append(None)
+                elif not future.done():
+                    future.set_exception(error)
+            if kept.deltas:
+                self._pending[item_id] = kept
+                self._pending_changes += len(kept.deltas)
+        for item_id, entry in newer.items():
+            merged = self._pending.setdefault(item_id, _Pending())
+            merged.deltas.extend(entry.deltas)
+            merged.waiters.extend(entry.waiters)
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            # Shielded: stopping must not abandon a batch mid-write
+            await asyncio.shield(self.flush())
+
+    def start(self):
+        """Start flushing in the background on the running event loop"""
+        if self._task is None and self.enabled:
+            self._wake = asyncio.Event()
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self, attempts=3):
+        """
+        Stop the background task and write everything still buffered
+
+        Args:
+            attempts: Flushes to try before giving up on a failing database
+        """
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        for attempt in range(attempts):
+            await self.flush()
+            if not self._pending:
+                return
+            await asyncio.sleep(0.5 * (attempt + 1))
+        lost = {item_id: entry.total for item_id, entry in self._pending.items()}
+        print(f"Quantity changes not written at shutdown (item ID: delta): {lost}")
+
+    def stats(self):
+        """
+        Write-behind counters for this worker
+
+        Returns:
+            dict: Buffered changes, flushes and their outcomes
+        """
+        return {
+            "interval": self.interval,
+            "pending_items": len(self._pending),
+            "pending_changes": self._pending_changes,
+            "flushes": self._flushes,
+            "items_flushed": self._items_flushed,
+            "applied": self._applied,
+            "rejected": self._rejected,
+            "failed_flushes": self._failures,
+            "last_flush_ms": round(self._last_flush_seconds * 1000, 3) if self._last_flush_seconds is not None else None,
+            "max_flush_ms": round(self._max_flush_seconds * 1000, 3),
+            "error": self.error
+        }
+
+
+# QUANTITY_FLUSH_INTERVAL=0 writes every change with its own UPDATE
+quantity_writer = QuantityWriter(
+    interval=float(os.getenv('QUANTITY_FLUSH_INTERVAL', '0.05')),
+    max_items=int(os.getenv('QUANTITY_FLUSH_MAX_ITEMS', '1000')),
+    max_pending=int(os.getenv('QUANTITY_MAX_PENDING', '100000'))
+)